@@ -0,0 +1,122 @@
+"""
+Benchmark dei profili di encoding (encode_profiles.PROFILES).
+
+Per ogni profilo:
+- genera la sorgente quasi-lossless del background procedurale (stesso seed,
+  con la grana del profilo, come fa la pipeline) lunga --seconds
+- la codifica con i parametri del profilo (due passate se previste)
+- riporta dimensione, tempo di encode e tempo di upload stimato a --uplink-mbps
+
+La grana fa parte del profilo, quindi le sorgenti non sono le stesse. Due SSIM:
+- SSIM: contro UN riferimento comune a tutti i profili (grana storica, quella
+  di 'quality'): quanto il video caricato si allontana dal look storico, grana
+  ridotta compresa; e' la colonna da confrontare tra profili
+- SSIM enc: contro la sorgente del profilo stesso, solo la perdita dell'encoder
+
+Uso:
+    python benchmarks/bench_encode_profiles.py
+    python benchmarks/bench_encode_profiles.py --seconds 20 --uplink-mbps 10 --profiles quality shorts
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import backgrounds  # noqa: E402
+import encode_profiles  # noqa: E402
+
+
+def _run(cmd: list[str]) -> str:
+    p = subprocess.run(cmd, capture_output=True, text=True)
+    if p.returncode != 0:
+        raise RuntimeError(f"Command failed: {' '.join(cmd)}\n{p.stderr}")
+    return p.stderr
+
+
+def _reference(tmp: Path, seconds: float, grain: int, width: int, height: int, fps: int, seed: int) -> Path:
+    ref = tmp / f"ref_grain{grain}.mkv"
+    if ref.exists():
+        return ref
+    _run([
+        "ffmpeg", "-y",
+        "-f", "lavfi",
+        "-i", backgrounds.procedural_background_source(seed, seconds, width, height, fps),
+        "-vf", backgrounds.procedural_background_vf(seed, width, height, fps, grain=grain),
+        "-c:v", "libx264", "-preset", "ultrafast", "-qp", "0",
+        "-pix_fmt", "yuv420p",
+        str(ref),
+    ])
+    return ref
+
+
+def _ssim(encoded: Path, ref: Path) -> float:
+    err = _run(["ffmpeg", "-i", str(encoded), "-i", str(ref), "-lavfi", "ssim", "-f", "null", "-"])
+    m = re.search(r"All:([0-9.]+)", err)
+    return float(m.group(1)) if m else float("nan")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark profili di encoding")
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--uplink-mbps", type=float, default=20.0)
+    ap.add_argument("--width", type=int, default=1080)
+    ap.add_argument("--height", type=int, default=1920)
+    ap.add_argument("--fps", type=int, default=30)
+    ap.add_argument("--seed", type=int, default=12345)
+    ap.add_argument("--profiles", nargs="*", default=[p for p in encode_profiles.PROFILES if p != "preview"])
+    args = ap.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench_encode_"))
+    rows = []
+    try:
+        common_grain = encode_profiles.PROFILES["quality"].grain
+        common = _reference(tmp, args.seconds, common_grain, args.width, args.height, args.fps, args.seed)
+        for name in args.profiles:
+            profile = encode_profiles.get_profile(name)
+            src = _reference(tmp, args.seconds, profile.grain, args.width, args.height, args.fps, args.seed)
+            out = tmp / f"{name}.mp4"
+
+            t0 = time.perf_counter()
+            encode_profiles.encode(
+                _run,
+                head=["ffmpeg", "-y", "-i", str(src)],
+                tail=["-movflags", "+faststart"],
+                out_path=out,
+                profile=profile,
+            )
+            enc_s = time.perf_counter() - t0
+
+            size = out.stat().st_size
+            mbps = size * 8 / 1e6 / args.seconds
+            upload_s = size * 8 / (args.uplink_mbps * 1e6)
+            rows.append((name, profile.grain, size, mbps, enc_s, _ssim(out, common), _ssim(out, src), upload_s))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    print(f"{args.width}x{args.height}@{args.fps} {args.seconds:.0f}s, uplink {args.uplink_mbps:.0f} Mbps, "
+          f"SSIM vs riferimento comune a grana {common_grain}")
+    print(f"{'profile':10s} {'grain':>5s} {'size MB':>9s} {'Mbps':>7s} {'encode s':>9s} {'SSIM':>7s} "
+          f"{'SSIM enc':>9s} {'upload s':>9s}")
+    for name, grain, size, mbps, enc_s, ssim, ssim_enc, up_s in rows:
+        print(f"{name:10s} {grain:5d} {size / 1e6:9.2f} {mbps:7.2f} {enc_s:9.2f} {ssim:7.4f} "
+              f"{ssim_enc:9.4f} {up_s:9.2f}")
+
+    # Bytes shipped relative to the historical CRF 18 profile.
+    base = next((r for r in rows if r[0] == "quality"), None)
+    if base:
+        for name, _grain, size, *_ in rows:
+            if name != "quality":
+                print(f"[Monday] {name}: {size / base[2]:.2f}x i byte di 'quality'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark I/O: intermedi della pipeline su build/ (disco) vs scratch (tmpfs).
+
+Scrive e rilegge file delle stesse dimensioni degli intermedi di un run tipico
+(bg_{seed}.mp4, video_base.mp4, frasi MP3, voice_extracted.wav, audio_trimmed.wav),
+con fsync come farebbe ffmpeg alla chiusura, e riporta il tempo per ciascuna root.
+
+Uso:
+    python benchmarks/bench_scratch.py
+    python benchmarks/bench_scratch.py --repeat 5 --disk /mnt/ci-disk
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import scratch  # noqa: E402
+
+
+MB = 1024 * 1024
+
+# Dimensioni tipiche di un run da 60 s a 1080x1920 CRF 18.
+INTERMEDIATES = [
+    ("bg.mp4", 45 * MB),
+    ("video_base.mp4", 46 * MB),
+    ("voice_extracted.wav", 6 * MB),
+    ("audio_trimmed.wav", 6 * MB),
+] + [(f"phrase_{i:03d}.mp3", 40 * 1024) for i in range(12)]
+
+
+def _write_read(root: Path) -> tuple[float, float]:
+    work = root / f"bench_scratch_{os.getpid()}"
+    work.mkdir(parents=True, exist_ok=True)
+    block = os.urandom(MB)
+    try:
+        t0 = time.perf_counter()
+        for name, size in INTERMEDIATES:
+            with (work / name).open("wb") as f:
+                left = size
+                while left > 0:
+                    n = min(left, MB)
+                    f.write(block[:n])
+                    left -= n
+                f.flush()
+                os.fsync(f.fileno())
+        t_write = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        for name, _ in INTERMEDIATES:
+            with (work / name).open("rb") as f:
+                while f.read(4 * MB):
+                    pass
+        t_read = time.perf_counter() - t0
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return t_write, t_read
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark I/O scratch vs build/")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--disk", type=Path, default=scratch.BUILD_DIR, help="root su disco persistente")
+    args = ap.parse_args()
+
+    roots = [("disk", args.disk)]
+    tmp_root = scratch.scratch_root()
+    if tmp_root != args.disk:
+        roots.append(("scratch", tmp_root))
+    else:
+        print("[Monday] Nessuna scratch tmpfs disponibile: misuro solo il disco.")
+
+    total_mb = sum(s for _, s in INTERMEDIATES) / MB
+    print(f"[Monday] Intermedi per run: {len(INTERMEDIATES)} file, {total_mb:.1f} MB")
+
+    best: dict[str, float] = {}
+    for label, root in roots:
+        runs = [_write_read(root) for _ in range(args.repeat)]
+        w = min(r[0] for r in runs)
+        r = min(r[1] for r in runs)
+        best[label] = w + r
+        print(f"{label:8s} {str(root):30s} write+fsync {w * 1000:8.1f} ms  read {r * 1000:8.1f} ms")
+
+    if "scratch" in best:
+        saved = best["disk"] - best["scratch"]
+        print(f"[Monday] I/O risparmiato per run: {saved * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Upload in streaming (MP4 frammentato, sessione resumable a lunghezza ignota)
+contro l'upload a file finito, su fake_youtube.py.
+
+L'encode misurato e' quello vero della pipeline: subtitles.add_burned_in_subtitles
+(burn dei sottotitoli col profilo scelto, GOP di default di x264, +faststart)
+su una clip sintetica gia' muxata (lavfi, preparata fuori dal tempo misurato,
+come il mux che precede il burn). Il risultato viene caricato con banda limitata
+a --mbps (token bucket di upload_control):
+- sequential: burn su file, poi upload resumable del file
+- stream:     burn con final_run -> stream_upload.encode_and_upload(fragmented_pipe(...)),
+              come main.py con STREAM_UPLOAD=1
+
+Verifica: il server restituisce byte e sha256 di quello che ha ricevuto, che
+devono coincidere con il file scritto in locale; il file frammentato deve
+passare mp4check.validate_mp4 (la stessa validazione che precede la chiusura
+della sessione). Riporta il tempo totale encode+upload delle due modalita'.
+
+Uso:
+    python benchmarks/bench_stream_upload.py
+    python benchmarks/bench_stream_upload.py --seconds 30 --mbps 10 --transport requests
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import encode_profiles  # noqa: E402
+import fake_youtube  # noqa: E402
+import mp4check  # noqa: E402
+import stream_upload  # noqa: E402
+import subtitles  # noqa: E402
+import transport  # noqa: E402
+import upload_control  # noqa: E402
+
+BODY = {"snippet": {"title": "bench"}, "status": {"privacyStatus": "private"}}
+
+
+def _make_http(name: str):
+    if name == "requests":
+        import requests
+
+        return transport.RequestsHttp(transport.tune_session(requests.Session()))
+    from googleapiclient.http import build_http
+
+    return build_http()
+
+
+def _make_source(out: Path, seconds: float, width: int, height: int, fps: int) -> None:
+    """Video+audio gia' muxati, l'input del burn finale (fuori dal tempo misurato)."""
+    subprocess.run([
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc2=s={width}x{height}:r={fps}:d={seconds}",
+        "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=48000:duration={seconds}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-crf", "18", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-b:a", "128k",
+        "-shortest",
+        str(out),
+    ], check=True)
+
+
+def _make_ass(out: Path, seconds: float) -> None:
+    """Una riga di sottotitolo al secondo, formato degli ASS della pipeline (PlayRes 1080x1920)."""
+    def ts(t: float) -> str:
+        return f"{int(t // 3600)}:{int(t // 60) % 60:02d}:{t % 60:05.2f}"
+
+    lines = [
+        "[Script Info]", "ScriptType: v4.00+", "PlayResX: 1080", "PlayResY: 1920", "",
+        "[V4+ Styles]",
+        "Format: Name, Fontname, Fontsize, PrimaryColour, Alignment, MarginV",
+        "Style: Default,DejaVu Sans,62,&H00FFFFFF,2,160", "",
+        "[Events]",
+        "Format: Layer, Start, End, Style, Text",
+    ]
+    lines += [f"Dialogue: 0,{ts(i)},{ts(i + 1)},Default,parola {i}" for i in range(int(seconds))]
+    out.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def _upload_file(path: Path, http, url: str, rate: float) -> dict:
+    """Upload resumable di un file gia' completo, stessi chunk e tetto dello streaming."""
+    controller = upload_control.ChunkController.from_env()
+    bucket = upload_control.TokenBucket(rate) if rate > 0 else None
+    session = stream_upload.ResumableSession.start(http, BODY, url)
+    total = path.stat().st_size
+    offset = 0
+    with path.open("rb") as f:
+        while True:
+            f.seek(offset)
+            data = f.read(controller.chunk_size)
+            if bucket is not None:
+                bucket.consume(len(data))
+            t0 = time.perf_counter()
+            final = offset + len(data) >= total
+            committed, response = session.send(data, offset, total if final else None)
+            controller.record(max(len(data), 1), time.perf_counter() - t0)
+            if response is not None:
+                return response
+            offset = committed
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _check(mode: str, path: Path, response: dict, args: argparse.Namespace) -> None:
+    got = response["fake"]
+    size = path.stat().st_size
+    if got["bytes"] != size or got["sha256"] != _sha256(path):
+        raise SystemExit(f"{mode}: il server ha ricevuto {got['bytes']} byte ({got['sha256'][:12]}), "
+                         f"il file locale e' di {size} byte")
+    res = mp4check.validate_mp4(path, expected_size=(args.width, args.height), expected_duration=args.seconds)
+    if not res.ok:
+        raise SystemExit(f"{mode}: validazione fallita: {res.errors}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Upload in streaming vs upload a file finito")
+    ap.add_argument("--seconds", type=float, default=20)
+    ap.add_argument("--width", type=int, default=1080)
+    ap.add_argument("--height", type=int, default=1920)
+    ap.add_argument("--fps", type=int, default=30)
+    ap.add_argument("--profile", default="shorts")
+    ap.add_argument("--mbps", type=float, default=20.0, help="banda di upload simulata (megabit/s)")
+    ap.add_argument("--transport", choices=transport.TRANSPORTS, default="requests")
+    args = ap.parse_args()
+
+    srv = fake_youtube.serve()
+    url = f"{srv.base_url}/upload/youtube/v3/videos"
+    rate = args.mbps * 1e6 / 8
+    http = _make_http(args.transport)
+    results: dict[str, float] = {}
+
+    profile = encode_profiles.get_profile(args.profile)
+    with tempfile.TemporaryDirectory(prefix="bench_stream_upload_") as tmp:
+        src = Path(tmp) / "muxed.mp4"
+        ass = Path(tmp) / "subs.ass"
+        _make_source(src, args.seconds, args.width, args.height, args.fps)
+        _make_ass(ass, args.seconds)
+
+        seq = Path(tmp) / "sequential.mp4"
+        t0 = time.perf_counter()
+        subtitles.add_burned_in_subtitles(src, ass, output_dir=Path(tmp), output_name=seq.name, profile=profile)
+        t_enc = time.perf_counter() - t0
+        response = _upload_file(seq, http, url, rate)
+        results["sequential"] = time.perf_counter() - t0
+        _check("sequential", seq, response, args)
+        print(f"sequential: encode {t_enc:.2f}s + upload {results['sequential'] - t_enc:.2f}s "
+              f"= {results['sequential']:.2f}s ({seq.stat().st_size / 1e6:.1f} MB)")
+
+        frag = Path(tmp) / "stream.mp4"
+        streamed: dict = {}
+        t0 = time.perf_counter()
+        subtitles.add_burned_in_subtitles(
+            src, ass, output_dir=Path(tmp), output_name=frag.name, profile=profile,
+            final_run=lambda cmd: streamed.update(stream_upload.encode_and_upload(
+                stream_upload.fragmented_pipe(cmd),
+                Path(cmd[-1]),
+                http,
+                BODY,
+                url=url,
+                media_seconds=args.seconds,
+                bucket=upload_control.TokenBucket(rate) if rate > 0 else None,
+            )),
+        )
+        results["stream"] = time.perf_counter() - t0
+        _check("stream", frag, streamed, args)
+        print(f"stream:     {results['stream']:.2f}s ({frag.stat().st_size / 1e6:.1f} MB), "
+              f"server: {streamed['fake']['bytes']} byte, sha256 ok")
+
+    print(f"\nguadagno: {results['sequential'] - results['stream']:.2f}s "
+          f"({(1 - results['stream'] / results['sequential']) * 100:.0f}%), server {srv.stats.snapshot()}")
+    srv.shutdown()
+
+
+if __name__ == "__main__":
+    main()
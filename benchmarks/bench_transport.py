@@ -0,0 +1,112 @@
+"""
+Benchmark del trasporto HTTP per l'upload: httplib2 (storico) vs requests in pool.
+
+Contro un endpoint finto locale (fake_youtube.py) esegue, per ogni trasporto,
+--uploads upload multipart da --size-mb MB seguiti ciascuno da un thumbnails.set,
+come fa uploader.upload_video, e riporta tempo, throughput e connessioni aperte.
+Gli oggetti http sono costruiti come nel client vero: build_http() +
+AuthorizedHttp per httplib2, transport.RequestsHttp per requests.
+
+"requests" lascia l'autotuning TCP del kernel (default di transport.py),
+"requests+buf" fissa SO_SNDBUF/SO_RCVBUF a --socket-buffer-kb come faceva il
+vecchio default: la colonna sndbuf riporta il valore effettivo letto dal socket.
+
+Uso:
+    python benchmarks/bench_transport.py
+    python benchmarks/bench_transport.py --size-mb 50 --uploads 5
+    python benchmarks/bench_transport.py --transports requests requests+buf --socket-buffer-kb 8192
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import socket
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import fake_youtube  # noqa: E402
+import transport  # noqa: E402
+
+BOUNDARY = "===============bench=="
+VARIANTS = ("httplib2", "requests", "requests+buf")
+
+
+def _multipart(video: bytes) -> bytes:
+    meta = b'{"snippet": {"title": "bench"}, "status": {"privacyStatus": "private"}}'
+    return b"".join([
+        f"--{BOUNDARY}\r\nContent-Type: application/json\r\n\r\n".encode(), meta,
+        f"\r\n--{BOUNDARY}\r\nContent-Type: video/mp4\r\n\r\n".encode(), video,
+        f"\r\n--{BOUNDARY}--".encode(),
+    ])
+
+
+def _make_http(name: str):
+    from google.auth.credentials import AnonymousCredentials
+
+    if name == "requests":
+        return transport.authorized_http(AnonymousCredentials(), "requests")
+    import google_auth_httplib2
+    from googleapiclient.http import build_http
+
+    return google_auth_httplib2.AuthorizedHttp(AnonymousCredentials(), http=build_http())
+
+
+def _sndbuf(http) -> int | None:
+    """SO_SNDBUF effettivo di una connessione del pool (solo trasporto requests)."""
+    session = getattr(http, "session", None)
+    if session is None:
+        return None
+    for pool in session.get_adapter("http://").poolmanager.pools.values():
+        for conn in list(pool.pool.queue):
+            sock = getattr(conn, "sock", None) if conn is not None else None
+            if sock is not None:
+                return sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF)
+    return None
+
+
+def _bench(name: str, base: str, body: bytes, uploads: int, buffer_kb: int) -> tuple[float, int | None]:
+    os.environ["YT_SOCKET_BUFFER_KB"] = str(buffer_kb if name == "requests+buf" else 0)
+    http = _make_http(name.split("+")[0])
+    headers = {"Content-Type": f'multipart/related; boundary="{BOUNDARY}"', "Content-Length": str(len(body))}
+    t0 = time.perf_counter()
+    for _ in range(uploads):
+        resp, _ = http.request(f"{base}/upload/youtube/v3/videos?uploadType=multipart&part=snippet,status",
+                               method="POST", body=body, headers=headers)
+        if resp.status != 200:
+            raise RuntimeError(f"{name}: HTTP {resp.status}")
+        resp, _ = http.request(f"{base}/upload/youtube/v3/thumbnails/set?videoId=x",
+                               method="POST", body=b"\xff\xd8" * 1024, headers={"Content-Type": "image/jpeg"})
+    return time.perf_counter() - t0, _sndbuf(http)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark trasporto upload")
+    ap.add_argument("--size-mb", type=float, default=20.0)
+    ap.add_argument("--uploads", type=int, default=5)
+    ap.add_argument("--transports", nargs="*", default=list(VARIANTS), choices=VARIANTS)
+    ap.add_argument("--socket-buffer-kb", type=int, default=4096, help="buffer fisso di requests+buf")
+    args = ap.parse_args()
+
+    body = _multipart(os.urandom(int(args.size_mb * 1024 * 1024)))
+    print(f"{args.uploads} upload da {args.size_mb:.0f} MB (+ thumbnail) verso fake YouTube")
+    print(f"{'transport':13s} {'tempo s':>8s} {'MB/s':>8s} {'conn':>5s} {'req':>5s} {'sndbuf':>9s}")
+    for name in args.transports:
+        srv = fake_youtube.serve()
+        try:
+            elapsed, sndbuf = _bench(name, srv.base_url, body, args.uploads, args.socket_buffer_kb)
+            st = srv.stats.snapshot()
+        finally:
+            srv.shutdown()
+            srv.server_close()
+        mbps = st["bytes_received"] / 1e6 / elapsed
+        buf = "-" if sndbuf is None else f"{sndbuf // 1024}K"
+        print(f"{name:13s} {elapsed:8.2f} {mbps:8.1f} {st['connections']:5d} {st['requests']:5d} {buf:>9s}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Benchmark di uploader.upload_video contro fake_youtube.py, senza toccare YouTube.
+
+Esegue il codice vero (client discovery, MediaFileUpload, upload_control) con
+YT_API_ENDPOINT sul server finto e un token.json finto gia' valido (nessun
+refresh), per ogni combinazione di trasporto e modalita' di chunk:
+- simple:   upload multipart in un colpo (UPLOAD_ADAPTIVE=0, storico)
+- <N>:      resumable a chunk fissi di N KiB (min = max = iniziale = N)
+- adaptive: resumable con la dimensione scelta da upload_control
+
+Il server simula latenza, banda e guasti (503 / connessioni chiuse a meta')
+con un seed fisso: ogni combinazione vede la stessa sequenza di guasti.
+Per combinazione riporta upload riusciti, tempo medio per upload, MB/s utili,
+guasti incontrati e overhead dei retry (byte ricevuti dal server oltre a quelli
+del video).
+
+Uso:
+    python benchmarks/bench_upload.py
+    python benchmarks/bench_upload.py --size-mb 50 --bandwidth-mbps 40 --latency-ms 60 \\
+        --error-rate 0.05 --drop-rate 0.02 --chunks simple 1024 8192 adaptive
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import fake_youtube  # noqa: E402
+import transport  # noqa: E402
+import uploader  # noqa: E402
+
+FAKE_TOKEN = {
+    "token": "fake-access-token",
+    "refresh_token": "fake-refresh-token",
+    "client_id": "fake.apps.googleusercontent.com",
+    "client_secret": "fake",
+    "expiry": "2099-01-01T00:00:00Z",
+}
+
+_MODE_ENV = ("UPLOAD_ADAPTIVE", "UPLOAD_CHUNK_MIN_KB", "UPLOAD_CHUNK_MAX_KB", "UPLOAD_CHUNK_INITIAL_KB")
+
+
+def _set_mode(mode: str) -> None:
+    for k in _MODE_ENV:
+        os.environ.pop(k, None)
+    if mode == "simple":
+        os.environ["UPLOAD_ADAPTIVE"] = "0"
+        return
+    os.environ["UPLOAD_ADAPTIVE"] = "1"
+    if mode != "adaptive":
+        for k in _MODE_ENV[1:]:
+            os.environ[k] = mode
+
+
+def _bench(name: str, mode: str, video: Path, token: Path, args: argparse.Namespace) -> dict:
+    srv = fake_youtube.serve(faults=fake_youtube.faults_from_args(args))
+    os.environ["YT_API_ENDPOINT"] = srv.base_url
+    _set_mode(mode)
+    times: list[float] = []
+    failures: list[str] = []
+    try:
+        for _ in range(args.uploads):
+            t0 = time.perf_counter()
+            try:
+                uploader.upload_video(
+                    video, title="bench", description="bench", privacy_status="private",
+                    token_file=token, transport_name=name,
+                )
+            except Exception as e:  # noqa: BLE001 - a failed upload is a data point
+                failures.append(type(e).__name__)
+                continue
+            times.append(time.perf_counter() - t0)
+        st = srv.stats.snapshot()
+    finally:
+        srv.shutdown()
+        srv.server_close()
+
+    useful = video.stat().st_size * len(times)
+    return {
+        "transport": name,
+        "mode": mode,
+        "ok": len(times),
+        "failures": failures,
+        "seconds": statistics.mean(times) if times else float("nan"),
+        "mb_s": useful / 1e6 / sum(times) if times else 0.0,
+        "faults": st["errors_injected"] + st["drops_injected"],
+        "overhead_pct": (st["bytes_received"] - useful) / useful * 100 if useful else float("nan"),
+        "connections": st["connections"],
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark di upload_video contro fake YouTube")
+    ap.add_argument("--size-mb", type=float, default=20.0)
+    ap.add_argument("--uploads", type=int, default=3)
+    ap.add_argument("--transports", nargs="*", default=list(transport.TRANSPORTS))
+    ap.add_argument("--chunks", nargs="*", default=["simple", "1024", "8192", "adaptive"],
+                    help="simple | adaptive | dimensione fissa in KiB (multipla di 256)")
+    ap.add_argument("--latency-ms", type=float, default=30.0)
+    ap.add_argument("--bandwidth-mbps", type=float, default=100.0, help="0 = nessun limite")
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--drop-rate", type=float, default=0.0)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", action="store_true", help="righe JSON invece della tabella")
+    args = ap.parse_args()
+
+    # Random bytes: mp4check would reject them, and it's not what's measured here.
+    os.environ["VALIDATE_DEEP"] = "0"
+    os.environ["METRICS"] = "0"
+
+    with tempfile.TemporaryDirectory(prefix="bench_upload_") as tmp:
+        video = Path(tmp) / "video.mp4"
+        video.write_bytes(os.urandom(int(args.size_mb * 1024 * 1024)))
+        token = Path(tmp) / "token.json"
+        token.write_text(json.dumps(FAKE_TOKEN), encoding="utf-8")
+
+        if not args.json:
+            print(f"{args.uploads} upload da {args.size_mb:.0f} MB, latenza {args.latency_ms:.0f} ms, "
+                  f"banda {args.bandwidth_mbps or 'illimitata'} Mbit/s, "
+                  f"errori {args.error_rate:.0%}, drop {args.drop_rate:.0%}")
+            print(f"{'transport':10s} {'chunk':>9s} {'ok':>5s} {'s/upload':>9s} {'MB/s':>7s} "
+                  f"{'guasti':>7s} {'overhead':>9s} {'conn':>5s}")
+        for name in args.transports:
+            for mode in args.chunks:
+                r = _bench(name, mode, video, token, args)
+                if args.json:
+                    print(json.dumps(r))
+                    continue
+                print(f"{name:10s} {mode:>9s} {r['ok']:>2d}/{args.uploads:<2d} {r['seconds']:9.2f} "
+                      f"{r['mb_s']:7.1f} {r['faults']:7d} {r['overhead_pct']:8.1f}% {r['connections']:5d}")
+                if r["failures"]:
+                    print(f"{'':21s}falliti: {', '.join(r['failures'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""
+Endpoint YouTube finto, in locale, per i benchmark del trasporto di upload.
+
+Implementa solo quello che usa uploader.py:
+- POST /upload/youtube/v3/videos      (uploadType=multipart) -> {"id": ...}
+- POST /upload/youtube/v3/videos      (uploadType=resumable) -> Location della sessione
+- PUT  sessione, Content-Range: bytes a-b/N | a-b/* | */N | */*  -> 308 + Range, o
+  alla fine {"id": ..., "fake": {"bytes", "sha256"}} (per verificare cosa e' arrivato)
+- POST /upload/youtube/v3/thumbnails/set                     -> {}
+HTTP/1.1 con keep-alive: conta connessioni aperte, richieste e byte ricevuti,
+cosi' il benchmark vede quante connessioni il client riusa.
+
+Condizioni di rete simulate (Faults), solo sulle richieste di upload video:
+- latency: ritardo prima di ogni risposta
+- bandwidth: banda in ingresso condivisa da tutte le connessioni (come un uplink)
+- error_rate: probabilita' di un 503 backendError (body letto e scartato)
+- drop_rate: probabilita' che la connessione venga chiusa a meta' body
+Con lo stesso seed la sequenza dei guasti e' la stessa.
+
+Uso:
+    python benchmarks/fake_youtube.py --port 8765
+    python benchmarks/fake_youtube.py --latency-ms 80 --bandwidth-mbps 20 --error-rate 0.05
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import itertools
+import json
+import random
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Resumable uploads: every chunk but the last must be a multiple of this.
+CHUNK_QUANTUM = 256 * 1024
+
+
+@dataclass
+class Faults:
+    latency_s: float = 0.0
+    bandwidth: float = 0.0  # bytes/s, 0 = unlimited
+    error_rate: float = 0.0
+    drop_rate: float = 0.0
+    seed: int = 0
+
+
+class Stats:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.bytes_received = 0
+        self.sessions = 0
+        self.errors_injected = 0
+        self.drops_injected = 0
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "connections": self.connections,
+                "requests": self.requests,
+                "bytes_received": self.bytes_received,
+                "sessions": self.sessions,
+                "errors_injected": self.errors_injected,
+                "drops_injected": self.drops_injected,
+            }
+
+
+class Session:
+    """Upload resumable in corso: solo i byte in ordine vengono accettati."""
+
+    def __init__(self) -> None:
+        self.received = 0
+        self.sha256 = hashlib.sha256()
+        self.video_id: str | None = None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "FakeYouTube"
+
+    def setup(self) -> None:
+        super().setup()
+        with self.server.stats.lock:
+            self.server.stats.connections += 1
+
+    def log_message(self, format: str, *args) -> None:  # noqa: A002
+        pass
+
+    def _read_body(self, sink=None, limit: int | None = None) -> int:
+        remaining = int(self.headers.get("Content-Length") or 0)
+        if limit is not None:
+            remaining = min(remaining, limit)
+        # Small blocks when throttled, so pacing is smooth.
+        block = 64 * 1024 if self.server.faults.bandwidth > 0 else 1024 * 1024
+        total = 0
+        while remaining > 0:
+            chunk = self.rfile.read(min(remaining, block))
+            if not chunk:
+                break
+            self.server.pace(len(chunk))
+            if sink is not None:
+                sink(chunk)
+            total += len(chunk)
+            remaining -= len(chunk)
+        return total
+
+    def _inject(self) -> bool:
+        """Guasto simulato per questa richiesta di upload; True se la risposta e' gia' andata."""
+        fault = self.server.roll()
+        if fault == "drop":
+            self._count(self._read_body(limit=int(self.headers.get("Content-Length") or 0) // 2))
+            self.close_connection = True
+            try:
+                self.connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            return True
+        if fault == "error":
+            self._count(self._read_body())
+            self._reply(503, {"error": {"code": 503, "message": "Backend Error",
+                                        "errors": [{"reason": "backendError"}]}})
+            return True
+        return False
+
+    def _reply(self, status: int, payload: dict | None, headers: dict[str, str] | None = None) -> None:
+        if self.server.faults.latency_s > 0:
+            time.sleep(self.server.faults.latency_s)
+        data = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        if payload is not None:
+            self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _count(self, n: int) -> None:
+        with self.server.stats.lock:
+            self.server.stats.requests += 1
+            self.server.stats.bytes_received += n
+
+    def do_POST(self) -> None:
+        url = urlsplit(self.path)
+        path = url.path
+        if path.endswith("/youtube/v3/videos") and self._inject():
+            return
+        self._count(self._read_body())
+
+        if path.endswith("/youtube/v3/videos") and parse_qs(url.query).get("uploadType") == ["resumable"]:
+            upload_id = self.server.new_session()
+            host, port = self.server.server_address[:2]
+            location = f"http://{host}:{port}{path}?uploadType=resumable&upload_id={upload_id}"
+            self._reply(200, None, {"Location": location})
+        elif path.endswith("/youtube/v3/videos"):
+            self._reply(200, {"kind": "youtube#video", "id": f"fake{next(self.server.ids):06d}"})
+        elif path.endswith("/youtube/v3/thumbnails/set"):
+            self._reply(200, {"kind": "youtube#thumbnailSetResponse", "items": []})
+        else:
+            self._reply(404, {"error": {"code": 404, "message": f"not found: {path}"}})
+
+    def do_PUT(self) -> None:
+        upload_id = (parse_qs(urlsplit(self.path).query).get("upload_id") or [""])[0]
+        session = self.server.sessions.get(upload_id)
+        if session is None:
+            self._count(self._read_body())
+            self._reply(404, {"error": {"code": 404, "message": "upload session not found"}})
+            return
+        if self._inject():
+            return
+
+        # "bytes 0-262143/*", "bytes 262144-300000/300001", "bytes */300001", "bytes */*"
+        spec = (self.headers.get("Content-Range") or "").replace("bytes", "", 1).strip()
+        rng, _, total_s = spec.partition("/")
+        total = None if total_s in ("", "*") else int(total_s)
+        start = None if rng in ("", "*") else int(rng.split("-", 1)[0])
+        length = int(self.headers.get("Content-Length") or 0)
+
+        if start is not None and start != session.received:
+            # Out of order (e.g. a retry of data we already have): drop it, report what we hold.
+            self._count(self._read_body())
+        elif start is not None and total is None and length % CHUNK_QUANTUM:
+            self._count(self._read_body())
+            self._reply(400, {"error": {"code": 400, "message": "chunk not a multiple of 256 KiB"}})
+            return
+        else:
+            self._count(self._read_body(session.sha256.update))
+            session.received += length
+
+        if total is not None and session.received == total:
+            if session.video_id is None:
+                session.video_id = f"fake{next(self.server.ids):06d}"
+            self._reply(200, {
+                "kind": "youtube#video",
+                "id": session.video_id,
+                "fake": {"bytes": session.received, "sha256": session.sha256.hexdigest()},
+            })
+            return
+        headers = {"Range": f"bytes=0-{session.received - 1}"} if session.received else {}
+        self._reply(308, None, headers)
+
+
+class FakeYouTube(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, faults: Faults | None = None):
+        super().__init__((host, port), _Handler)
+        self.faults = faults or Faults()
+        self._rng = random.Random(self.faults.seed)
+        self._link_lock = threading.Lock()
+        self._link_free = 0.0
+        self.stats = Stats()
+        self.ids = itertools.count(1)
+        self.sessions: dict[str, Session] = {}
+        self._session_ids = itertools.count(1)
+
+    def new_session(self) -> str:
+        with self.stats.lock:
+            self.stats.sessions += 1
+            upload_id = f"up{next(self._session_ids):06d}"
+            self.sessions[upload_id] = Session()
+        return upload_id
+
+    def roll(self) -> str | None:
+        """None | "error" | "drop" per la prossima richiesta di upload."""
+        with self.stats.lock:
+            r = self._rng.random()
+            if r < self.faults.drop_rate:
+                self.stats.drops_injected += 1
+                return "drop"
+            if r < self.faults.drop_rate + self.faults.error_rate:
+                self.stats.errors_injected += 1
+                return "error"
+        return None
+
+    def pace(self, n: int) -> None:
+        """Ritarda la lettura come se n byte passassero da un link di faults.bandwidth."""
+        if self.faults.bandwidth <= 0:
+            return
+        with self._link_lock:
+            now = time.monotonic()
+            self._link_free = max(self._link_free, now) + n / self.faults.bandwidth
+            wait = self._link_free - now
+        if wait > 0:
+            time.sleep(wait)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def serve(host: str = "127.0.0.1", port: int = 0, faults: Faults | None = None) -> FakeYouTube:
+    """Avvia il server in un thread daemon e lo restituisce (shutdown() per fermarlo)."""
+    srv = FakeYouTube(host, port, faults)
+    threading.Thread(target=srv.serve_forever, name="fake-youtube", daemon=True).start()
+    return srv
+
+
+def faults_from_args(args: argparse.Namespace) -> Faults:
+    return Faults(
+        latency_s=args.latency_ms / 1000,
+        bandwidth=args.bandwidth_mbps * 1e6 / 8,
+        error_rate=args.error_rate,
+        drop_rate=args.drop_rate,
+        seed=args.seed,
+    )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Endpoint YouTube finto")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--bandwidth-mbps", type=float, default=0.0, help="0 = nessun limite")
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--drop-rate", type=float, default=0.0)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    srv = FakeYouTube(args.host, args.port, faults_from_args(args))
+    print(f"fake YouTube su {srv.base_url}")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Costo per filtro dei nostri filtergraph ffmpeg.
+
+Per ogni catena (background procedurale, quality, burn dei sottotitoli) esegue
+la catena su una clip sintetica (lavfi, nessun encode: output -f null) e misura
+con -benchmark (utime+stime = CPU, rtime = wall):
+
+- prefix (default): prefissi crescenti [f1], [f1,f2], ...; costo di fi =
+  t(prefisso i) - t(prefisso i-1). Il prefisso vuoto misura la sola sorgente.
+- drop: catena intera meno un filtro alla volta; costo di fi = t(tutto) - t(senza fi)
+  (utile quando un filtro cambia il lavoro dei successivi, es. zoompan o scale)
+
+Ogni misura e' la mediana di --repeats run. Con --threads 1 (default) i filtri
+girano su un solo thread: i costi sono confrontabili tra loro.
+
+La catena "still" non e' per filtro: confronta i modi di far girare un
+background IMMAGINE in quality.apply_quality_pipeline (-loop 1 che decodifica
+il PNG a ogni frame, contro decodifica unica + filtro loop; look statico per
+frame contro PNG precalcolato), input PNG 1080x1920 come quello in cache.
+
+Uso:
+    python benchmarks/profile_filters.py
+    python benchmarks/profile_filters.py --chains background --frames 120 --mode drop
+    python benchmarks/profile_filters.py --chains still
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import backgrounds  # noqa: E402
+import quality  # noqa: E402
+import subtitles  # noqa: E402
+import tts_timestamps  # noqa: E402
+
+_BENCH_RE = re.compile(r"bench: utime=([0-9.]+)s stime=([0-9.]+)s rtime=([0-9.]+)s")
+
+
+def _measure(source: str | list[str], filters: list[str], frames: int, threads: int, repeats: int) -> tuple[float, float]:
+    """
+    (cpu_s, wall_s) mediani per far passare `frames` frame dalla catena.
+    source: grafo lavfi, oppure gli argomenti di input gia' pronti (es. ["-loop", "1", "-i", png]).
+    """
+    inputs = ["-f", "lavfi", "-i", source] if isinstance(source, str) else source
+    cmd = ["ffmpeg", "-hide_banner", "-nostats", "-benchmark", "-filter_threads", str(threads), *inputs]
+    if filters:
+        cmd += ["-vf", ",".join(filters)]
+    cmd += ["-frames:v", str(frames), "-f", "null", "-"]
+
+    cpu, wall = [], []
+    for _ in range(repeats):
+        p = subprocess.run(cmd, capture_output=True, text=True)
+        if p.returncode != 0:
+            raise RuntimeError(f"Command failed: {' '.join(cmd)}\n{p.stderr}")
+        m = _BENCH_RE.search(p.stderr)
+        if not m:
+            raise RuntimeError(f"-benchmark output non trovato:\n{p.stderr[-500:]}")
+        cpu.append(float(m.group(1)) + float(m.group(2)))
+        wall.append(float(m.group(3)))
+    return statistics.median(cpu), statistics.median(wall)
+
+
+def _chains(tmp: Path, seconds: float, width: int, height: int, fps: int, seed: int) -> dict[str, tuple[str, list[str]]]:
+    ass = tmp / "profile.ass"
+    segs = []
+    t = 0.0
+    while t < seconds:
+        segs.append(tts_timestamps.Segment(len(segs), "The report was signed by nobody at all", t, t + 1.5))
+        t += 1.5
+    tts_timestamps.write_ass_subtitles(segs, ass, width=width, height=height)
+
+    return {
+        "background": (
+            backgrounds.procedural_background_source(seed, seconds, width, height, fps),
+            backgrounds.procedural_background_filters(seed, width, height, fps),
+        ),
+        "quality": (
+            # Landscape source: scale+crop do real work, as with stock footage.
+            f"testsrc2=s=1920x1080:r={fps}:d={seconds}",
+            quality.quality_filters(width, height, fps),
+        ),
+        "subtitles": (
+            f"color=c=0x203040:s={width}x{height}:r={fps}:d={seconds},format=yuv420p",
+            [subtitles.subtitles_filter(ass)],
+        ),
+    }
+
+
+def _label(f: str) -> str:
+    return f.split("=", 1)[0]
+
+
+def profile(name: str, source: str, filters: list[str], args: argparse.Namespace) -> None:
+    frames = args.frames
+    base_cpu, base_wall = _measure(source, [], frames, args.threads, args.repeats)
+    rows: list[tuple[str, float, float]] = []
+
+    if args.mode == "prefix":
+        prev_cpu, prev_wall = base_cpu, base_wall
+        for i in range(1, len(filters) + 1):
+            cpu, wall = _measure(source, filters[:i], frames, args.threads, args.repeats)
+            rows.append((_label(filters[i - 1]), cpu - prev_cpu, wall - prev_wall))
+            prev_cpu, prev_wall = cpu, wall
+        total_cpu, total_wall = prev_cpu, prev_wall
+    else:
+        total_cpu, total_wall = _measure(source, filters, frames, args.threads, args.repeats)
+        for i, f in enumerate(filters):
+            cpu, wall = _measure(source, filters[:i] + filters[i + 1:], frames, args.threads, args.repeats)
+            rows.append((_label(f), total_cpu - cpu, total_wall - wall))
+
+    chain_cpu = max(total_cpu - base_cpu, 1e-9)
+    print(f"\n== {name} ({args.mode}, {frames} frame, filter_threads={args.threads})")
+    print(f"{'filtro':12s} {'CPU ms/frame':>13s} {'wall ms/frame':>14s} {'quota':>7s}")
+    print(f"{'(sorgente)':12s} {base_cpu / frames * 1e3:13.3f} {base_wall / frames * 1e3:14.3f} {'':>7s}")
+    for label, cpu, wall in rows:
+        print(f"{label:12s} {cpu / frames * 1e3:13.3f} {wall / frames * 1e3:14.3f} {cpu / chain_cpu * 100:6.1f}%")
+    print(f"{'totale':12s} {total_cpu / frames * 1e3:13.3f} {total_wall / frames * 1e3:14.3f}")
+
+
+def compare_still(tmp: Path, args: argparse.Namespace) -> None:
+    w, h, fps = args.width, args.height, args.fps
+    src = tmp / "still_src.png"
+    baked = tmp / "still_baked.png"
+    # Landscape stock-like image, and its static look rendered once (what the cache holds).
+    subprocess.run(["ffmpeg", "-y", "-v", "error", "-f", "lavfi", "-i", "testsrc2=s=1920x1080",
+                    "-frames:v", "1", str(src)], check=True)
+    subprocess.run(["ffmpeg", "-y", "-v", "error", "-i", str(src), "-vf", ",".join(quality.static_filters(w, h)),
+                    "-frames:v", "1", str(baked)], check=True)
+
+    dynamic = quality.dynamic_filters(fps)
+    variants = [
+        ("-loop 1, catena completa", ["-loop", "1", "-i", str(src)], quality.quality_filters(w, h, fps)),
+        ("-loop 1, PNG precalcolato", ["-loop", "1", "-i", str(baked)], ["format=yuv420p", *dynamic]),
+        ("loop, catena completa", ["-i", str(src)], quality.still_filters(w, h, fps)),
+        ("loop, PNG precalcolato", ["-i", str(baked)], quality.still_filters(w, h, fps, precomputed=True)),
+    ]
+    frames = args.frames
+    print(f"\n== still ({frames} frame, filter_threads={args.threads})")
+    print(f"{'variante':28s} {'CPU ms/frame':>13s} {'wall ms/frame':>14s}")
+    for label, inputs, filters in variants:
+        cpu, wall = _measure(inputs, filters, frames, args.threads, args.repeats)
+        print(f"{label:28s} {cpu / frames * 1e3:13.3f} {wall / frames * 1e3:14.3f}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Profiler per filtro dei filtergraph ffmpeg")
+    ap.add_argument("--chains", nargs="*", default=["background", "quality", "subtitles", "still"])
+    ap.add_argument("--mode", choices=["prefix", "drop"], default="prefix")
+    ap.add_argument("--frames", type=int, default=90)
+    ap.add_argument("--repeats", type=int, default=3)
+    ap.add_argument("--threads", type=int, default=1)
+    ap.add_argument("--width", type=int, default=1080)
+    ap.add_argument("--height", type=int, default=1920)
+    ap.add_argument("--fps", type=int, default=30)
+    ap.add_argument("--seed", type=int, default=12345)
+    args = ap.parse_args()
+
+    seconds = args.frames / args.fps + 1
+    with tempfile.TemporaryDirectory(prefix="profile_filters_") as tmp:
+        chains = _chains(Path(tmp), seconds, args.width, args.height, args.fps, args.seed)
+        for name in args.chains:
+            if name == "still":
+                compare_still(Path(tmp), args)
+                continue
+            source, filters = chains[name]
+            profile(name, source, filters, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+Pool di account YouTube (un token OAuth per canale) e dispatcher parallelo.
+
+Un solo uploadLimitExceeded non deve fermare tutta la pubblicazione: ogni canale
+ha il suo token e il suo stato di limite, e i video in coda vanno al primo canale
+che ha ancora capacita', in parallelo (un thread per account).
+
+Layout (ACCOUNTS_DIR, default src/accounts/):
+    accounts/<canale>/token.json           obbligatorio
+    accounts/<canale>/client_secret.json   opzionale (default src/client_secret.json)
+    accounts/<canale>/account.json         opzionale: {"daily_limit": 6, "enabled": true}
+    accounts/<canale>/state.json           scritto qui: upload del giorno, limite
+
+Senza sottocartelle si usa l'account storico (src/token.json).
+Il giorno di quota e' quello del Pacific Time (reset a mezzanotte PT, come YouTube).
+
+Uso:
+    python src/accounts.py list
+    python src/accounts.py upload build/a.mp4 build/b.mp4 --privacy private
+"""
+
+from __future__ import annotations
+
+import argparse
+import fcntl
+import json
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator
+from zoneinfo import ZoneInfo
+
+import metrics
+
+
+SRC_DIR = Path(__file__).resolve().parent
+ACCOUNTS_DIR = Path(os.getenv("ACCOUNTS_DIR") or (SRC_DIR / "accounts"))
+DEFAULT_TOKEN_FILE = SRC_DIR / "token.json"
+DEFAULT_CLIENT_SECRET_FILE = SRC_DIR / "client_secret.json"
+
+QUOTA_TZ = ZoneInfo("America/Los_Angeles")
+
+
+def _default_daily_limit() -> int:
+    return int(os.getenv("ACCOUNT_DAILY_LIMIT", "6") or "6")
+
+
+def _quota_day() -> str:
+    return datetime.now(QUOTA_TZ).strftime("%Y-%m-%d")
+
+
+@dataclass
+class Account:
+    name: str
+    token_file: Path
+    client_secret_file: Path
+    state_file: Path
+    daily_limit: int
+
+    @contextmanager
+    def _locked_state(self) -> Iterator[dict]:
+        """Stato del giorno corrente, sotto flock (watcher e cron possono girare insieme)."""
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        lock_path = self.state_file.with_name(f".{self.state_file.name}.lock")
+        with lock_path.open("a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                state = json.loads(self.state_file.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                state = {}
+            if state.get("day") != _quota_day():
+                state = {"day": _quota_day(), "uploads": 0, "limited": False}
+            yield state
+            tmp = self.state_file.with_name(f".{self.state_file.name}.tmp")
+            tmp.write_text(json.dumps(state), encoding="utf-8")
+            os.replace(tmp, self.state_file)
+
+    def state(self) -> dict:
+        with self._locked_state() as state:
+            return dict(state)
+
+    def has_capacity(self) -> bool:
+        with self._locked_state() as state:
+            return not state["limited"] and state["uploads"] < self.daily_limit
+
+    def reserve(self) -> bool:
+        """Prenota uno slot di upload per oggi; False se l'account e' pieno."""
+        with self._locked_state() as state:
+            if state["limited"] or state["uploads"] >= self.daily_limit:
+                return False
+            state["uploads"] += 1
+            return True
+
+    def release(self) -> None:
+        """Restituisce uno slot prenotato (upload fallito prima di arrivare a YouTube)."""
+        with self._locked_state() as state:
+            state["uploads"] = max(0, state["uploads"] - 1)
+
+    def mark_limited(self) -> None:
+        """YouTube ha risposto uploadLimitExceeded/quotaExceeded: fermo fino al reset PT."""
+        with self._locked_state() as state:
+            state["limited"] = True
+            state["uploads"] = max(0, state["uploads"] - 1)
+
+
+def _load_account(d: Path) -> Account | None:
+    token = d / "token.json"
+    if not token.exists():
+        return None
+    try:
+        cfg = json.loads((d / "account.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        cfg = {}
+    if cfg.get("enabled") is False:
+        return None
+    secret = d / "client_secret.json"
+    return Account(
+        name=d.name,
+        token_file=token,
+        client_secret_file=secret if secret.exists() else DEFAULT_CLIENT_SECRET_FILE,
+        state_file=d / "state.json",
+        daily_limit=int(cfg.get("daily_limit") or _default_daily_limit()),
+    )
+
+
+def load_accounts(accounts_dir: Path | None = None) -> list[Account]:
+    accounts_dir = accounts_dir or ACCOUNTS_DIR
+    found: list[Account] = []
+    if accounts_dir.is_dir():
+        for d in sorted(p for p in accounts_dir.iterdir() if p.is_dir()):
+            acc = _load_account(d)
+            if acc is not None:
+                found.append(acc)
+    if not found:
+        found.append(Account(
+            name="default",
+            token_file=DEFAULT_TOKEN_FILE,
+            client_secret_file=DEFAULT_CLIENT_SECRET_FILE,
+            state_file=accounts_dir / ".default_state.json",
+            daily_limit=_default_daily_limit(),
+        ))
+    return found
+
+
+@dataclass
+class UploadJob:
+    video_path: Path
+    title: str
+    description: str
+    tags: list[str] = field(default_factory=list)
+    privacy_status: str = "public"
+    thumbnail_path: Path | None = None
+    expected_duration: float | None = None
+
+
+@dataclass
+class UploadOutcome:
+    job: UploadJob
+    account: str = ""
+    video_id: str = ""
+    error: str = ""
+
+
+def _worker(account: Account, jobs: queue.Queue, results: list[UploadOutcome], lock: threading.Lock) -> None:
+    import uploader
+
+    while True:
+        if not account.reserve():
+            return
+        try:
+            job: UploadJob = jobs.get_nowait()
+        except queue.Empty:
+            account.release()
+            return
+
+        try:
+            vid = uploader.upload_video(
+                video_path=str(job.video_path),
+                title=job.title,
+                description=job.description,
+                tags=job.tags,
+                privacy_status=job.privacy_status,
+                thumbnail_path=str(job.thumbnail_path) if job.thumbnail_path else None,
+                expected_duration=job.expected_duration,
+                token_file=account.token_file,
+                client_secret_file=account.client_secret_file,
+                raise_on_limit=True,
+            )
+        except uploader.UploadLimitExceeded:
+            print(f"[Monday] accounts: {account.name} ha raggiunto il limite, job rimesso in coda.")
+            account.mark_limited()
+            jobs.put(job)
+            return
+        except Exception as e:
+            account.release()
+            with lock:
+                results.append(UploadOutcome(job, account.name, error=f"{type(e).__name__}: {e}"))
+            continue
+
+        if vid:
+            metrics.inc("uploads_total", 1, {"account": account.name})
+        else:
+            # Rejected before reaching YouTube (e.g. invalid file): no slot used.
+            account.release()
+        with lock:
+            results.append(UploadOutcome(job, account.name, video_id=vid, error="" if vid else "upload rifiutato"))
+
+
+def dispatch(jobs: list[UploadJob], accounts: list[Account] | None = None) -> list[UploadOutcome]:
+    """
+    Distribuisce i job sugli account con capacita', un thread per account.
+
+    Un job respinto per limite torna in coda e lo prende un altro account; quelli
+    rimasti quando tutti gli account sono pieni escono con error="nessun account
+    disponibile".
+    """
+    accounts = accounts if accounts is not None else load_accounts()
+    pending: queue.Queue = queue.Queue()
+    for job in jobs:
+        pending.put(job)
+
+    results: list[UploadOutcome] = []
+    lock = threading.Lock()
+
+    # Accounts that free up after a requeue still have running peers, so loop
+    # until either the queue is drained or nobody has capacity left.
+    while not pending.empty():
+        ready = [a for a in accounts if a.has_capacity()]
+        if not ready:
+            break
+        threads = [
+            threading.Thread(target=_worker, args=(a, pending, results, lock), name=f"upload-{a.name}")
+            for a in ready
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    while not pending.empty():
+        results.append(UploadOutcome(pending.get_nowait(), error="nessun account disponibile"))
+    return results
+
+
+def _cmd_list() -> None:
+    for a in load_accounts():
+        st = a.state()
+        flag = " LIMITATO" if st["limited"] else ""
+        print(f"{a.name:20s} {st['uploads']}/{a.daily_limit} oggi ({st['day']} PT){flag}  token={a.token_file}")
+
+
+def _cmd_upload(args: argparse.Namespace) -> None:
+    jobs = [
+        UploadJob(
+            video_path=Path(v),
+            title=Path(v).stem,
+            description=args.description,
+            tags=args.tags,
+            privacy_status=args.privacy,
+        )
+        for v in args.videos
+    ]
+    failed = False
+    for r in dispatch(jobs):
+        if r.video_id:
+            print(f"[Monday] {r.job.video_path} -> {r.account}: {r.video_id}")
+        else:
+            failed = True
+            print(f"[Monday] {r.job.video_path} NON caricato ({r.account or '-'}): {r.error}")
+    metrics.flush(success=not failed)
+    if failed:
+        raise SystemExit(1)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Pool di account YouTube")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list", help="account, upload di oggi e limiti")
+    up = sub.add_parser("upload", help="carica i video sugli account con capacita'")
+    up.add_argument("videos", nargs="+")
+    up.add_argument("--description", default="#shorts")
+    up.add_argument("--tags", nargs="*", default=["shorts", "deadpan", "story"])
+    up.add_argument("--privacy", default="public")
+    args = ap.parse_args()
+
+    if args.cmd == "list":
+        _cmd_list()
+    else:
+        _cmd_upload(args)
+
+
+if __name__ == "__main__":
+    main()
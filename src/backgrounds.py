@@ -2,16 +2,17 @@ from __future__ import annotations
 
 import os
 import shlex
-import subprocess
 from pathlib import Path
 
+import supervise
+
 
 ROOT_DIR = Path(__file__).resolve().parent.parent
 BUILD_DIR = ROOT_DIR / "build"
 
 
-def _run(cmd: list[str]) -> str:
-    p = subprocess.run(cmd, capture_output=True, text=True)
+def _run(cmd: list[str], media_seconds: float | None = None) -> str:
+    p = supervise.run(cmd, media_seconds=media_seconds)
     if p.returncode != 0:
         raise RuntimeError(
             "FFmpeg failed:\n"
@@ -46,12 +47,63 @@ def _rand_hex_color(seed: int) -> str:
     return f"#{rr:02x}{gg:02x}{bb:02x}"
 
 
+def procedural_background_source(seed: int, duration_s: float, width: int, height: int, fps: int) -> str:
+    """lavfi source (solid base color) for the procedural background."""
+    return f"color=c={_rand_hex_color(seed)}:s={width}x{height}:r={fps}:d={duration_s}"
+
+
+def procedural_background_filters(
+    seed: int,
+    width: int = 1080,
+    height: int = 1920,
+    fps: int = 30,
+    frame_offset: int = 0,
+    grain: int = 18,
+) -> list[str]:
+    """
+    Filters of the procedural background, in order (one entry per filter).
+
+    `frame_offset` shifts the zoompan motion (driven by the output frame number `on`)
+    so a segment rendered on its own starts exactly where the previous one ended.
+    `grain` is the noise strength: temporal grain is what costs the most bits.
+    The grain pattern is seeded too, so one seed always gives the same frames.
+    """
+    on = f"(on+{frame_offset})" if frame_offset else "on"
+    return [
+        f"noise=alls={grain}:allf=t+u:all_seed={seed & 0x7FFFFFFF}",
+        "gblur=sigma=8",
+        "eq=contrast=1.20:brightness=0.03:saturation=1.30",
+        f"hue=h={(seed % 40) - 20}",
+        "vignette",
+        f"zoompan=z='min(1.14,1.0+0.0012*{on})':"
+        f"x='iw/2-(iw/zoom/2)+sin({on}/29)*24':"
+        f"y='ih/2-(ih/zoom/2)+cos({on}/37)*20':"
+        f"d=1:s={width}x{height}:fps={fps}",
+        "format=yuv420p",
+    ]
+
+
+def procedural_background_vf(
+    seed: int,
+    width: int = 1080,
+    height: int = 1920,
+    fps: int = 30,
+    frame_offset: int = 0,
+    grain: int = 18,
+) -> str:
+    """Filter chain of the procedural background (see procedural_background_filters)."""
+    return ",".join(procedural_background_filters(seed, width, height, fps, frame_offset, grain))
+
+
 def generate_procedural_background(
     duration_s: float,
     seed: int | None = None,
     width: int = 1080,
     height: int = 1920,
     fps: int = 30,
+    out_path: Path | None = None,
+    gop: int | None = None,
+    grain: int = 18,
 ) -> Path:
     """
     Procedural cinematic background video (MP4):
@@ -59,39 +111,34 @@ def generate_procedural_background(
     - texture (noise) + blur
     - gentle contrast/sat + tiny brightness
     - vignette + slow motion (zoompan)
+
+    `gop` forces a fixed keyframe interval (frames, no scene-cut keyframes), so the
+    file can later be trimmed with a keyframe-aligned stream copy.
     """
     BUILD_DIR.mkdir(parents=True, exist_ok=True)
 
     if seed is None:
         seed = int.from_bytes(os.urandom(4), "little")
 
-    out_path = BUILD_DIR / f"bg_{seed}.mp4"
-    base = _rand_hex_color(seed)
-
-    vf = (
-        "noise=alls=18:allf=t+u,"
-        "gblur=sigma=8,"
-        "eq=contrast=1.20:brightness=0.03:saturation=1.30,"
-        f"hue=h={(seed % 40) - 20},"
-        "vignette,"
-        "zoompan=z='min(1.14,1.0+0.0012*on)':"
-        "x='iw/2-(iw/zoom/2)+sin(on/29)*24':"
-        "y='ih/2-(ih/zoom/2)+cos(on/37)*20':"
-        f"d=1:s={width}x{height}:fps={fps},"
-        "format=yuv420p"
-    )
+    if out_path is None:
+        out_path = BUILD_DIR / f"bg_{seed}.mp4"
+
+    gop_args: list[str] = []
+    if gop:
+        gop_args = ["-g", str(gop), "-keyint_min", str(gop), "-sc_threshold", "0"]
 
     _run([
         "ffmpeg", "-y",
         "-f", "lavfi",
-        "-i", f"color=c={base}:s={width}x{height}:r={fps}:d={duration_s}",
-        "-vf", vf,
+        "-i", procedural_background_source(seed, duration_s, width, height, fps),
+        "-vf", procedural_background_vf(seed, width, height, fps, grain=grain),
         "-c:v", "libx264",
         "-preset", "veryfast",
         "-crf", "18",
         "-pix_fmt", "yuv420p",
+        *gop_args,
         str(out_path),
-    ])
+    ], media_seconds=duration_s)
 
     return out_path
 
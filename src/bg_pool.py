@@ -0,0 +1,245 @@
+"""
+Warm pool di background procedurali pre-renderizzati.
+
+Il cron gira alle 15/19/23 UTC: invece di aspettare generate_procedural_background
+a ogni run, teniamo N background "pieni" (es. 65 s, GOP fisso e corto) in una
+cartella pool, riempita quando la macchina e' idle. Al render se ne prende uno,
+lo si taglia alla durata dell'audio con stream copy allineato ai keyframe e lo si
+elimina dal pool (nessun visual ripetuto).
+
+Uso:
+    python src/bg_pool.py status
+    python src/bg_pool.py fill --target 4
+    python src/bg_pool.py fill --daemon --interval 300
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import re
+import shlex
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import backgrounds
+import supervise
+
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+BUILD_DIR = ROOT_DIR / "build"
+POOL_DIR = Path(os.getenv("BG_POOL_DIR") or (BUILD_DIR / "bg_pool"))
+
+POOL_DURATION_S = 65.0
+GOP_SECONDS = 1
+
+_ENTRY_RE = re.compile(r"^pool_(?P<seed>\d+)_(?P<w>\d+)x(?P<h>\d+)_(?P<fps>\d+)fps_(?P<dur>\d+)s\.mp4$")
+
+
+def _run(cmd: list[str], media_seconds: float | None = None) -> str:
+    p = supervise.run(cmd, media_seconds=media_seconds)
+    if p.returncode != 0:
+        raise RuntimeError(
+            "FFmpeg failed:\n"
+            f"CMD: {' '.join(shlex.quote(c) for c in cmd)}\n"
+            f"STDOUT:\n{p.stdout}\n"
+            f"STDERR:\n{p.stderr}\n"
+        )
+    return p.stdout.strip()
+
+
+def _entry_name(seed: int, width: int, height: int, fps: int, duration_s: float) -> str:
+    return f"pool_{seed}_{width}x{height}_{fps}fps_{int(duration_s)}s.mp4"
+
+
+def list_entries(width: int = 1080, height: int = 1920, fps: int = 30) -> list[Path]:
+    """Ready entries matching the format, oldest first."""
+    if not POOL_DIR.exists():
+        return []
+    out: list[Path] = []
+    for p in POOL_DIR.iterdir():
+        m = _ENTRY_RE.match(p.name)
+        if not m:
+            continue
+        if (int(m["w"]), int(m["h"]), int(m["fps"])) != (width, height, fps):
+            continue
+        out.append(p)
+    return sorted(out, key=lambda p: p.stat().st_mtime)
+
+
+def _machine_is_idle() -> bool:
+    """Load average per core below BG_POOL_IDLE_LOAD (default 0.5)."""
+    threshold = float(os.getenv("BG_POOL_IDLE_LOAD", "0.5") or "0.5")
+    try:
+        load1 = os.getloadavg()[0]
+    except OSError:
+        return True
+    return load1 / max(1, os.cpu_count() or 1) < threshold
+
+
+def _wait_for_idle(max_wait_s: float, poll_s: float = 15.0) -> bool:
+    """Aspetta fino a max_wait_s che la macchina torni idle. True se lo e'."""
+    deadline = time.monotonic() + max_wait_s
+    while not _machine_is_idle():
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(poll_s)
+    return True
+
+
+def fill(
+    target: int,
+    duration_s: float = POOL_DURATION_S,
+    width: int = 1080,
+    height: int = 1920,
+    fps: int = 30,
+    only_when_idle: bool = True,
+    wait_idle_s: float = 0.0,
+) -> int:
+    """
+    Riempie il pool fino a `target` entry. Ritorna quante ne ha create.
+    Un solo filler alla volta (flock); ogni entry e' scritta su file temporaneo
+    e poi rinominata, quindi take() non vede mai file a meta'.
+    wait_idle_s: con macchina occupata aspetta fino a tanto che torni idle
+    invece di rinunciare subito (il refill lanciato dal run parte mentre il
+    render di quel run e' ancora in corso).
+    """
+    import fcntl
+
+    POOL_DIR.mkdir(parents=True, exist_ok=True)
+    lock_path = POOL_DIR / ".fill.lock"
+    created = 0
+
+    with lock_path.open("w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            print("[Monday] bg_pool: un altro fill e' gia' in corso.")
+            return 0
+
+        while len(list_entries(width, height, fps)) < target:
+            if only_when_idle and not _wait_for_idle(wait_idle_s):
+                print("[Monday] bg_pool: macchina occupata, rimando il fill.")
+                break
+
+            seed = int.from_bytes(os.urandom(4), "little")
+            final = POOL_DIR / _entry_name(seed, width, height, fps, duration_s)
+            tmp = POOL_DIR / f".tmp_{seed}.mp4"
+            try:
+                backgrounds.generate_procedural_background(
+                    duration_s=duration_s,
+                    seed=seed,
+                    width=width,
+                    height=height,
+                    fps=fps,
+                    out_path=tmp,
+                    gop=GOP_SECONDS * fps,
+                )
+                os.replace(tmp, final)
+            finally:
+                tmp.unlink(missing_ok=True)
+            created += 1
+            print(f"[Monday] bg_pool: pronto {final.name}")
+
+    return created
+
+
+def take(
+    duration_s: float,
+    out_path: Path,
+    width: int = 1080,
+    height: int = 1920,
+    fps: int = 30,
+) -> Path | None:
+    """
+    Prende il background piu' vecchio dal pool e lo taglia a `duration_s`
+    (arrotondato al keyframe successivo) con stream copy. L'entry viene rimossa.
+    Ritorna None se il pool e' vuoto: il chiamante genera al volo.
+    """
+    for entry in list_entries(width, height, fps):
+        m = _ENTRY_RE.match(entry.name)
+        if m is None or float(m["dur"]) < duration_s:
+            continue
+
+        # Claim atomico: due run concorrenti non prendono mai la stessa entry.
+        claimed = entry.with_name(f".claimed_{os.getpid()}_{entry.name}")
+        try:
+            os.rename(entry, claimed)
+        except FileNotFoundError:
+            continue
+
+        try:
+            cut = min(float(m["dur"]), math.ceil(duration_s / GOP_SECONDS) * GOP_SECONDS)
+            out_path.parent.mkdir(parents=True, exist_ok=True)
+            _run([
+                "ffmpeg", "-y",
+                "-i", str(claimed),
+                "-t", f"{cut:.3f}",
+                "-c", "copy",
+                "-an",
+                str(out_path),
+            ], media_seconds=cut)
+        finally:
+            claimed.unlink(missing_ok=True)
+
+        print(f"[Monday] bg_pool: usato {entry.name} (taglio {cut:.0f}s)")
+        return out_path
+
+    return None
+
+
+def spawn_refill(target: int | None = None) -> None:
+    """
+    Lancia un fill a bassa priorita' staccato dal processo corrente. Il fill
+    aspetta (BG_POOL_IDLE_WAIT secondi, default 900) che il render del run
+    che l'ha lanciato finisca e il load torni sotto soglia.
+    """
+    if target is None:
+        target = int(os.getenv("BG_POOL_SIZE", "3") or "3")
+    wait = os.getenv("BG_POOL_IDLE_WAIT", "900") or "900"
+    subprocess.Popen(
+        [sys.executable, str(Path(__file__).resolve()), "fill", "--target", str(target), "--wait-idle", wait],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+        preexec_fn=lambda: os.nice(19),
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Warm pool di background pre-renderizzati")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p_fill = sub.add_parser("fill", help="riempi il pool (solo se la macchina e' idle)")
+    p_fill.add_argument("--target", type=int, default=int(os.getenv("BG_POOL_SIZE", "3") or "3"))
+    p_fill.add_argument("--duration", type=float, default=POOL_DURATION_S)
+    p_fill.add_argument("--ignore-idle", action="store_true")
+    p_fill.add_argument("--wait-idle", type=float, default=0.0,
+                        help="secondi di attesa che la macchina torni idle prima di rinunciare")
+    p_fill.add_argument("--daemon", action="store_true", help="ricontrolla ogni --interval secondi")
+    p_fill.add_argument("--interval", type=float, default=300.0)
+
+    sub.add_parser("status", help="mostra le entry pronte")
+
+    args = ap.parse_args(argv)
+
+    if args.cmd == "status":
+        entries = list_entries()
+        print(f"[Monday] bg_pool: {len(entries)} entry in {POOL_DIR}")
+        for e in entries:
+            print(f"  {e.name} ({e.stat().st_size} byte)")
+        return
+
+    while True:
+        fill(args.target, duration_s=args.duration, only_when_idle=not args.ignore_idle,
+             wait_idle_s=args.wait_idle)
+        if not args.daemon:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+Bulk mover parallelo e deduplicante: files_to_upload -> uploaded.
+
+- hash SHA-256 in un thread pool con letture a blocchi (streaming, RAM costante)
+- i file il cui contenuto e' gia' in uploaded/ (indice hash persistente,
+  ricalcolato solo per file nuovi o modificati: chiave nome+size+mtime) vanno
+  in duplicates/ (o vengono cancellati con --delete-duplicates): non restano in
+  files_to_upload a farsi ri-hashare a ogni run
+- spostamento senza mai sovrascrivere: il nome di destinazione si prende con
+  os.link (fallisce se esiste gia', atomico anche tra worker paralleli), poi si
+  rimuove la sorgente; tra filesystem diversi copia su file temporaneo + fsync
+  e poi link
+- log strutturato JSONL (una riga per file) accanto al vecchio log.txt
+
+Uso:
+    python src/bulk_mover.py
+    python src/bulk_mover.py --workers 16 --delete-duplicates
+"""
+
+from __future__ import annotations
+
+import argparse
+import errno
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator
+
+import config
+
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+HASH_BLOCK = 1024 * 1024
+INDEX_NAME = ".hash_index.json"
+
+
+def resolve_folder(folder: str) -> Path:
+    p = Path(folder)
+    return p if p.is_absolute() else ROOT_DIR / p
+
+
+@dataclass
+class MoveResult:
+    name: str
+    sha256: str
+    size: int
+    status: str  # moved | duplicate | error
+    dest: str = ""
+    error: str = ""
+    seconds: float = 0.0
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        while True:
+            block = f.read(HASH_BLOCK)
+            if not block:
+                break
+            h.update(block)
+    return h.hexdigest()
+
+
+def _stat_key(p: Path) -> str:
+    st = p.stat()
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def load_uploaded_index(uploaded: Path, pool: ThreadPoolExecutor) -> dict[str, str]:
+    """
+    Ritorna {sha256: nome} dei file gia' in uploaded/.
+    L'indice su disco evita di ri-hashare a ogni run: si ricalcola solo cio' che e' cambiato.
+    """
+    index_path = uploaded / INDEX_NAME
+    try:
+        cached = json.loads(index_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        cached = {}
+
+    files = [p for p in uploaded.iterdir() if p.is_file() and not p.name.startswith(".")]
+    entries: dict[str, dict] = {}
+    stale: list[Path] = []
+    for p in files:
+        old = cached.get(p.name)
+        if old and old.get("key") == _stat_key(p):
+            entries[p.name] = old
+        else:
+            stale.append(p)
+
+    for p, digest in zip(stale, pool.map(file_sha256, stale)):
+        entries[p.name] = {"key": _stat_key(p), "sha256": digest}
+
+    if stale or len(entries) != len(cached):
+        _write_json_atomic(index_path, entries)
+
+    return {e["sha256"]: name for name, e in entries.items()}
+
+
+def _write_json_atomic(path: Path, data: dict) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data, indent=1), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _candidates(dest_dir: Path, name: str) -> Iterator[Path]:
+    """name, poi name_1, name_2, ... (stesso nome ma contenuto diverso)."""
+    yield dest_dir / name
+    stem, suffix = Path(name).stem, Path(name).suffix
+    i = 1
+    while True:
+        yield dest_dir / f"{stem}_{i}{suffix}"
+        i += 1
+
+
+def _link_free(src: Path, dest_dir: Path, name: str) -> Path:
+    """
+    Collega src al primo nome libero in dest_dir e lo ritorna.
+
+    exists() + os.replace sarebbe una TOCTOU tra worker paralleli (un altro
+    processo prende il nome in mezzo e viene sovrascritto): os.link fallisce
+    con EEXIST invece di sovrascrivere, quindi il nome e' nostro o si passa
+    al successivo. Filesystem senza hard link: segnaposto O_EXCL + os.replace.
+    """
+    for dest in _candidates(dest_dir, name):
+        try:
+            os.link(src, dest)
+            return dest
+        except FileExistsError:
+            continue
+        except OSError as e:
+            if e.errno not in (errno.EPERM, errno.EOPNOTSUPP, errno.ENOSYS):
+                raise
+        try:
+            os.close(os.open(dest, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            continue
+        os.replace(src, dest)
+        return dest
+    raise AssertionError("unreachable")
+
+
+def _fsync_dir(path: Path) -> None:
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_move(src: Path, dest_dir: Path, name: str | None = None) -> Path:
+    """Sposta src in dest_dir senza sovrascrivere nulla; ritorna la destinazione."""
+    name = name or src.name
+    try:
+        dest = _link_free(src, dest_dir, name)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        tmp = dest_dir / f".{name}.{os.getpid()}.{threading.get_ident()}.part"
+        try:
+            with src.open("rb") as fin, tmp.open("wb") as fout:
+                shutil.copyfileobj(fin, fout, length=HASH_BLOCK)
+                fout.flush()
+                os.fsync(fout.fileno())
+            shutil.copystat(src, tmp)
+            dest = _link_free(tmp, dest_dir, name)
+        finally:
+            tmp.unlink(missing_ok=True)
+        _fsync_dir(dest_dir)
+    if src.exists():  # gone already if the no-hardlink fallback renamed it
+        src.unlink()
+    return dest
+
+
+def move_all(
+    workers: int | None = None,
+    delete_duplicates: bool = False,
+    source: Path | None = None,
+    uploaded: Path | None = None,
+    log_path: Path | None = None,
+    duplicates: Path | None = None,
+) -> list[MoveResult]:
+    source = source or resolve_folder(config.FILES_FOLDER)
+    uploaded = uploaded or resolve_folder(config.UPLOADED_FOLDER)
+    duplicates = duplicates or resolve_folder(config.DUPLICATES_FOLDER)
+    log_path = log_path or resolve_folder(config.LOG_JSONL)
+    workers = workers or min(32, (os.cpu_count() or 1) * 4)
+
+    source.mkdir(parents=True, exist_ok=True)
+    uploaded.mkdir(parents=True, exist_ok=True)
+
+    files = sorted(p for p in source.iterdir() if p.is_file() and not p.name.startswith("."))
+    started = time.perf_counter()
+    results: list[MoveResult] = []
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        known = load_uploaded_index(uploaded, pool)
+
+        hashes = list(pool.map(file_sha256, files))
+
+        # Moves are cheap renames: done serially so name collisions and
+        # duplicates inside the same batch are resolved deterministically.
+        for p, digest in zip(files, hashes):
+            t0 = time.perf_counter()
+            size = p.stat().st_size
+            if digest in known:
+                # Out of files_to_upload either way, or every run re-hashes it.
+                try:
+                    if delete_duplicates:
+                        p.unlink(missing_ok=True)
+                    else:
+                        duplicates.mkdir(parents=True, exist_ok=True)
+                        atomic_move(p, duplicates)
+                except OSError as e:
+                    results.append(MoveResult(
+                        name=p.name, sha256=digest, size=size, status="error",
+                        error=str(e), seconds=time.perf_counter() - t0,
+                    ))
+                    continue
+                results.append(MoveResult(
+                    name=p.name, sha256=digest, size=size, status="duplicate",
+                    dest=known[digest], seconds=time.perf_counter() - t0,
+                ))
+                continue
+            try:
+                dest = atomic_move(p, uploaded)
+            except OSError as e:
+                results.append(MoveResult(
+                    name=p.name, sha256=digest, size=size, status="error",
+                    error=str(e), seconds=time.perf_counter() - t0,
+                ))
+                continue
+            known[digest] = dest.name
+            results.append(MoveResult(
+                name=p.name, sha256=digest, size=size, status="moved",
+                dest=dest.name, seconds=time.perf_counter() - t0,
+            ))
+
+        # Refresh the index with what we just moved in.
+        load_uploaded_index(uploaded, pool)
+
+    _append_jsonl(log_path, results)
+
+    moved = sum(1 for r in results if r.status == "moved")
+    dup = sum(1 for r in results if r.status == "duplicate")
+    err = sum(1 for r in results if r.status == "error")
+    print(
+        f"[Monday] Bulk move: {moved} spostati, {dup} duplicati, {err} errori "
+        f"in {time.perf_counter() - started:.2f}s"
+    )
+    return results
+
+
+def _append_jsonl(log_path: Path, results: list[MoveResult]) -> None:
+    if not results:
+        return
+    ts = datetime.now(timezone.utc).isoformat()
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    with log_path.open("a", encoding="utf-8") as f:
+        for r in results:
+            f.write(json.dumps({"ts": ts, **asdict(r)}, ensure_ascii=False) + "\n")
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Sposta files_to_upload -> uploaded (parallelo, dedup)")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--delete-duplicates", action="store_true",
+                    help="cancella i duplicati invece di spostarli in duplicates/")
+    args = ap.parse_args(argv)
+    move_all(workers=args.workers, delete_duplicates=args.delete_duplicates)
+
+
+if __name__ == "__main__":
+    main()
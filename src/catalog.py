@@ -0,0 +1,397 @@
+"""
+Catalogo SQLite dei video prodotti: una riga per run, con indici.
+
+La pipeline registra a fine run (anche se l'upload fallisce) quello che c'e'
+nel run_manifest.json: seed, hash dello script, titolo, profilo, dimensioni,
+sha256 del file finale, id e stato dell'upload, durate degli stadi (anche in
+una tabella a parte, per i report di costo). Cosi' "e' gia' stato caricato?",
+"quanto costa il render con il profilo X?" o "i run di ieri non caricati"
+diventano query indicizzate invece di grep nei log del CI.
+
+Chiave di una riga: entry_id = "<run_id>:<sha256[:16]>" del file finale. In
+replay il run_id dipende solo dal seed radice: lo stesso --seed su uno script o
+un audio diversi produce un altro video, che deve finire in un'altra riga;
+rigirare lo stesso replay (stesso file) aggiorna invece la stessa.
+
+Stati dell'upload: uploaded | not_uploaded (limite account, id vuoto) |
+failed (eccezione) | skipped (UPLOAD_YT=0) | duplicate (stesso file gia'
+caricato, vedi UPLOAD_DEDUP).
+
+Env:
+- CATALOG=0 disabilita la scrittura
+- CATALOG_DB (default build/catalog.sqlite)
+- UPLOAD_DEDUP=1 (default): main non ricarica un file con sha256 gia' uploaded
+
+Uso:
+    python src/catalog.py list --limit 20 --status uploaded
+    python src/catalog.py show <entry_id | run_id>
+    python src/catalog.py find --sha256 <hash> | --title "%cat%" | --video-id X | --seed N
+    python src/catalog.py stats
+    python src/catalog.py import videos_to_upload/run_manifest.json farm/done/*/run_manifest.json
+    python src/catalog.py sql "SELECT profile, avg(bytes) FROM runs GROUP BY profile"
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+BUILD_DIR = ROOT_DIR / "build"
+
+UPLOAD_STATUSES = ("uploaded", "not_uploaded", "failed", "skipped", "duplicate")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    entry_id        TEXT PRIMARY KEY,
+    run_id          TEXT NOT NULL,
+    created_at      REAL NOT NULL,
+    root_seed       INTEGER,
+    background_seed INTEGER,
+    script_sha256   TEXT,
+    audio_sha256    TEXT,
+    title           TEXT,
+    profile         TEXT,
+    size            TEXT,
+    fps             INTEGER,
+    duration        REAL,
+    bytes           INTEGER,
+    sha256          TEXT,
+    video_id        TEXT,
+    upload_status   TEXT,
+    total_seconds   REAL,
+    wall_seconds    REAL,
+    manifest        TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_run_id ON runs (run_id);
+CREATE INDEX IF NOT EXISTS runs_sha256 ON runs (sha256, upload_status);
+CREATE INDEX IF NOT EXISTS runs_script ON runs (script_sha256);
+CREATE INDEX IF NOT EXISTS runs_title ON runs (title);
+CREATE INDEX IF NOT EXISTS runs_video_id ON runs (video_id);
+CREATE INDEX IF NOT EXISTS runs_seed ON runs (root_seed);
+CREATE INDEX IF NOT EXISTS runs_status_time ON runs (upload_status, created_at);
+
+CREATE TABLE IF NOT EXISTS stages (
+    entry_id TEXT NOT NULL REFERENCES runs (entry_id) ON DELETE CASCADE,
+    stage    TEXT NOT NULL,
+    seconds  REAL NOT NULL,
+    PRIMARY KEY (entry_id, stage)
+);
+CREATE INDEX IF NOT EXISTS stages_stage ON stages (stage, seconds);
+"""
+
+_V1_INDEXES = ("runs_sha256", "runs_script", "runs_title", "runs_video_id", "runs_seed",
+               "runs_status_time", "stages_stage")
+
+
+def enabled() -> bool:
+    return (os.getenv("CATALOG", "1") or "1").strip() != "0"
+
+
+def db_path() -> Path:
+    return Path(os.getenv("CATALOG_DB") or (BUILD_DIR / "catalog.sqlite"))
+
+
+def connect(path: Path | None = None):
+    import sqlite3
+
+    path = path or db_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Farm workers on the same host share the file: WAL + busy timeout.
+    conn = sqlite3.connect(str(path), timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    _migrate_v1(conn)
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def entry_id(run_id: str, sha256: str | None) -> str:
+    return f"{run_id}:{sha256[:16]}" if sha256 else run_id
+
+
+def _migrate_v1(conn) -> None:
+    """Catalogo con chiave run_id (prima versione) -> chiave entry_id, righe conservate."""
+    cols = {r["name"] for r in conn.execute("PRAGMA table_info(runs)")}
+    if not cols or "entry_id" in cols:
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        cols = {r["name"] for r in conn.execute("PRAGMA table_info(runs)")}
+        if "entry_id" in cols:  # another worker migrated it meanwhile
+            conn.execute("ROLLBACK")
+            return
+        for idx in _V1_INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {idx}")
+        conn.execute("ALTER TABLE stages RENAME TO stages_v1")
+        conn.execute("ALTER TABLE runs RENAME TO runs_v1")
+        for stmt in _SCHEMA.split(";"):
+            if stmt.strip():
+                conn.execute(stmt)
+        old = ", ".join(sorted(cols))
+        conn.execute(
+            f"INSERT INTO runs (entry_id, {old}) SELECT "
+            "CASE WHEN sha256 IS NULL OR sha256 = '' THEN run_id ELSE run_id || ':' || substr(sha256, 1, 16) END, "
+            f"{old} FROM runs_v1"
+        )
+        conn.execute(
+            "INSERT INTO stages (entry_id, stage, seconds) "
+            "SELECT r.entry_id, s.stage, s.seconds FROM stages_v1 s JOIN runs r ON r.run_id = s.run_id"
+        )
+        conn.execute("DROP TABLE stages_v1")
+        conn.execute("DROP TABLE runs_v1")
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _row(manifest: dict, created_at: float) -> dict[str, Any]:
+    inputs = manifest.get("inputs") or {}
+    script = inputs.get("script") or inputs.get("subtitles_ass") or {}
+    output = manifest.get("output") or {}
+    stages = manifest.get("stage_seconds") or {}
+    timeline = manifest.get("stages") or {}
+    return {
+        "entry_id": entry_id(manifest["run_id"], output.get("sha256")),
+        "run_id": manifest["run_id"],
+        "created_at": created_at,
+        "root_seed": manifest.get("root_seed"),
+        "background_seed": (manifest.get("seeds") or {}).get("background"),
+        "script_sha256": script.get("sha256"),
+        "audio_sha256": (inputs.get("audio") or {}).get("sha256"),
+        "title": manifest.get("title"),
+        "profile": manifest.get("profile"),
+        "size": manifest.get("size"),
+        "fps": manifest.get("fps"),
+        "duration": manifest.get("duration"),
+        "bytes": output.get("size"),
+        "sha256": output.get("sha256"),
+        "video_id": manifest.get("video_id") or None,
+        "upload_status": manifest.get("upload_status"),
+        "total_seconds": round(sum(stages.values()), 3) if stages else None,
+        "wall_seconds": timeline.get("wall_seconds"),
+        "manifest": json.dumps(manifest, sort_keys=True),
+    }
+
+
+def record(manifest: dict, created_at: float | None = None, conn=None) -> str:
+    """
+    Inserisce o aggiorna (stesso entry_id: stesso run_id E stesso file) il run
+    descritto dal manifest. Ritorna l'entry_id.
+
+    Un replay identico rigira con lo stesso run_id e produce lo stesso file:
+    una riga 'uploaded' non viene mai sovrascritta da un esito diverso
+    (duplicate/failed/skipped/...), altrimenti find_uploaded la perderebbe e il
+    replay successivo ricaricherebbe il video. Un file diverso e' un'altra riga.
+    """
+    row = _row(manifest, created_at if created_at is not None else time.time())
+    own = conn is None
+    conn = conn or connect()
+    try:
+        with conn:
+            cols = ", ".join(row)
+            marks = ", ".join(f":{k}" for k in row)
+            # created_at stays the first recording's time on update.
+            updates = ", ".join(f"{k}=excluded.{k}" for k in row if k not in ("entry_id", "created_at"))
+            cur = conn.execute(
+                f"INSERT INTO runs ({cols}) VALUES ({marks}) ON CONFLICT(entry_id) DO UPDATE SET {updates} "
+                "WHERE runs.upload_status IS NOT 'uploaded' OR excluded.upload_status = 'uploaded'",
+                row,
+            )
+            if cur.rowcount == 0:
+                return row["entry_id"]
+            conn.execute("DELETE FROM stages WHERE entry_id = ?", (row["entry_id"],))
+            conn.executemany(
+                "INSERT INTO stages (entry_id, stage, seconds) VALUES (?, ?, ?)",
+                [(row["entry_id"], k, float(v)) for k, v in (manifest.get("stage_seconds") or {}).items()],
+            )
+    finally:
+        if own:
+            conn.close()
+    return row["entry_id"]
+
+
+def record_run(manifest: dict) -> None:
+    """Hook della pipeline: come record(), ma non fa mai fallire il run."""
+    if not enabled():
+        return
+    try:
+        print(f"[Monday] Catalogo: {record(manifest)} -> {db_path()}")
+    except Exception as e:
+        print(f"[Monday] Catalogo non aggiornato (ignoro): {e}")
+
+
+def find_uploaded(sha256: str, conn=None) -> dict | None:
+    """Run gia' caricato con lo stesso file finale (byte identici), se esiste."""
+    own = conn is None
+    conn = conn or connect()
+    try:
+        r = conn.execute(
+            "SELECT run_id, video_id, title, created_at FROM runs "
+            "WHERE sha256 = ? AND upload_status = 'uploaded' ORDER BY created_at LIMIT 1",
+            (sha256,),
+        ).fetchone()
+        return dict(r) if r else None
+    finally:
+        if own:
+            conn.close()
+
+
+def dedup_enabled() -> bool:
+    return enabled() and (os.getenv("UPLOAD_DEDUP", "1") or "1").strip() == "1"
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+_LIST_COLS = "entry_id, created_at, title, profile, bytes, total_seconds, upload_status, video_id"
+
+
+def _fmt_time(ts: float) -> str:
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(ts))
+
+
+def _print_rows(rows) -> None:
+    for r in rows:
+        mb = f"{r['bytes'] / 1e6:6.1f}MB" if r["bytes"] else "      -"
+        secs = f"{r['total_seconds']:6.1f}s" if r["total_seconds"] is not None else "      -"
+        print(f"{r['entry_id']:39s} {_fmt_time(r['created_at'])} {r['upload_status'] or '-':12s} "
+              f"{r['profile'] or '-':8s} {mb} {secs} {r['video_id'] or '-':12s} {r['title'] or ''}")
+
+
+def _cmd_list(conn, args: argparse.Namespace) -> None:
+    where, params = [], []
+    if args.status:
+        where.append("upload_status = ?")
+        params.append(args.status)
+    if args.since:
+        where.append("created_at >= ?")
+        params.append(time.time() - args.since * 3600)
+    sql = f"SELECT {_LIST_COLS} FROM runs"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY created_at DESC LIMIT ?"
+    _print_rows(conn.execute(sql, [*params, args.limit]))
+
+
+def _cmd_show(conn, args: argparse.Namespace) -> None:
+    # A replay run_id can match several entries (different inputs, same seed)
+    rows = conn.execute(
+        "SELECT manifest FROM runs WHERE entry_id = ? OR run_id = ? ORDER BY created_at",
+        (args.run_id, args.run_id),
+    ).fetchall()
+    if not rows:
+        raise SystemExit(f"run {args.run_id!r} non trovato")
+    for r in rows:
+        print(json.dumps(json.loads(r["manifest"]), indent=2, sort_keys=True))
+
+
+def _cmd_find(conn, args: argparse.Namespace) -> None:
+    for col, value, op in (
+        ("sha256", args.sha256, "="),
+        ("script_sha256", args.script, "="),
+        ("video_id", args.video_id, "="),
+        ("root_seed", args.seed, "="),
+        ("title", args.title, "LIKE"),
+    ):
+        if value is not None:
+            _print_rows(conn.execute(
+                f"SELECT {_LIST_COLS} FROM runs WHERE {col} {op} ? ORDER BY created_at DESC", (value,)
+            ))
+            return
+    raise SystemExit("serve uno tra --sha256, --script, --video-id, --seed, --title")
+
+
+def _cmd_stats(conn, args: argparse.Namespace) -> None:
+    print("== upload")
+    for r in conn.execute("SELECT upload_status, count(*) n, sum(bytes) b FROM runs GROUP BY upload_status ORDER BY n DESC"):
+        print(f"{r['upload_status'] or '-':12s} {r['n']:6d} run {(r['b'] or 0) / 1e9:8.2f} GB")
+    print("\n== profili")
+    for r in conn.execute(
+        "SELECT profile, count(*) n, avg(bytes) b, avg(total_seconds) s, avg(wall_seconds) w "
+        "FROM runs GROUP BY profile ORDER BY n DESC"
+    ):
+        wall = f"{r['w']:7.1f}s" if r["w"] is not None else "       -"
+        print(f"{r['profile'] or '-':10s} {r['n']:6d} run  {(r['b'] or 0) / 1e6:7.1f} MB  "
+              f"stadi {r['s'] or 0:7.1f}s  wall {wall}")
+    print("\n== stadi (secondi)")
+    print(f"{'stadio':14s} {'run':>6s} {'media':>8s} {'max':>8s} {'totale':>10s}")
+    for r in conn.execute(
+        "SELECT stage, count(*) n, avg(seconds) a, max(seconds) m, sum(seconds) t "
+        "FROM stages GROUP BY stage ORDER BY t DESC"
+    ):
+        print(f"{r['stage']:14s} {r['n']:6d} {r['a']:8.2f} {r['m']:8.2f} {r['t']:10.1f}")
+
+
+def _cmd_import(conn, args: argparse.Namespace) -> None:
+    n = 0
+    for p in map(Path, args.manifests):
+        try:
+            manifest = json.loads(p.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"[Monday] {p}: saltato ({e})")
+            continue
+        if "run_id" not in manifest:
+            print(f"[Monday] {p}: non e' un run_manifest, saltato")
+            continue
+        record(manifest, created_at=p.stat().st_mtime, conn=conn)
+        n += 1
+    print(f"[Monday] Importati {n} manifest in {db_path()}")
+
+
+def _cmd_sql(conn, args: argparse.Namespace) -> None:
+    cur = conn.execute(args.query)
+    if cur.description is None:
+        conn.commit()
+        return
+    cols = [d[0] for d in cur.description]
+    print("\t".join(cols))
+    for r in cur:
+        print("\t".join("" if v is None else str(v) for v in r))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Catalogo dei video prodotti")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    ls = sub.add_parser("list", help="run piu' recenti")
+    ls.add_argument("--limit", type=int, default=20)
+    ls.add_argument("--status", choices=UPLOAD_STATUSES)
+    ls.add_argument("--since", type=float, help="solo le ultime N ore")
+    sh = sub.add_parser("show", help="manifest completo di un run")
+    sh.add_argument("run_id", help="entry_id, oppure run_id (tutte le righe del run)")
+    fd = sub.add_parser("find", help="ricerca per hash, titolo, video id o seed")
+    fd.add_argument("--sha256")
+    fd.add_argument("--script", help="sha256 dello script")
+    fd.add_argument("--video-id")
+    fd.add_argument("--seed", type=int)
+    fd.add_argument("--title", help="pattern LIKE, es. '%%gatto%%'")
+    sub.add_parser("stats", help="report: stati di upload, profili, costo degli stadi")
+    im = sub.add_parser("import", help="importa run_manifest.json esistenti")
+    im.add_argument("manifests", nargs="+")
+    sq = sub.add_parser("sql", help="query SQL libera")
+    sq.add_argument("query")
+    args = ap.parse_args()
+
+    conn = connect()
+    try:
+        {
+            "list": _cmd_list,
+            "show": _cmd_show,
+            "find": _cmd_find,
+            "stats": _cmd_stats,
+            "import": _cmd_import,
+            "sql": _cmd_sql,
+        }[args.cmd](conn, args)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
 # src/config.py
 FILES_FOLDER = "files_to_upload"
 UPLOADED_FOLDER = "uploaded"
+DUPLICATES_FOLDER = "duplicates"
 LOG_FILE = "log.txt"
+LOG_JSONL = "log.jsonl"
@@ -0,0 +1,101 @@
+"""
+Profili di encoding x264 per il render finale.
+
+Shorts viene comunque ricompresso dalla piattaforma: spedire CRF 18 con grana
+pesante significa caricare 3-4x i byte necessari. I profili "shorts" e "target"
+limitano il bitrate con VBV (-maxrate/-bufsize) attorno al bitrate consigliato per
+l'ingest 1080p30 (~8 Mbps), con grana ridotta (comprime molto meglio).
+
+ENCODE_PROFILE = quality (default, comportamento storico) | shorts | target | preview
+Confronto numerico: python benchmarks/bench_encode_profiles.py
+"""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+
+@dataclass(frozen=True)
+class EncodeProfile:
+    name: str
+    preset: str = "veryfast"
+    crf: int | None = 18
+    bitrate: str | None = None
+    maxrate: str | None = None
+    bufsize: str | None = None
+    two_pass: bool = False
+    # noise=alls strength of the procedural background grain
+    grain: int = 18
+
+    def video_args(self, pass_num: int | None = None, passlog: Path | None = None) -> list[str]:
+        args = ["-c:v", "libx264", "-preset", self.preset]
+        if self.bitrate:
+            args += ["-b:v", self.bitrate]
+        elif self.crf is not None:
+            args += ["-crf", str(self.crf)]
+        if self.maxrate:
+            args += ["-maxrate", self.maxrate]
+        if self.bufsize:
+            args += ["-bufsize", self.bufsize]
+        args += ["-pix_fmt", "yuv420p"]
+        if pass_num is not None:
+            args += ["-pass", str(pass_num)]
+            if passlog is not None:
+                args += ["-passlogfile", str(passlog)]
+        return args
+
+
+PROFILES: dict[str, EncodeProfile] = {
+    # Storico: CRF 18, grana piena, nessun tetto.
+    "quality": EncodeProfile("quality"),
+    # CRF con tetto VBV: qualita' costante ma mai oltre il bitrate di ingest.
+    "shorts": EncodeProfile("shorts", crf=21, maxrate="8M", bufsize="16M", grain=10),
+    # Bitrate medio fisso in due passate: dimensione prevedibile.
+    "target": EncodeProfile("target", crf=None, bitrate="6M", maxrate="8M", bufsize="16M", two_pass=True, grain=8),
+    # Anteprime veloci, mai caricate.
+    "preview": EncodeProfile("preview", preset="ultrafast", crf=28, grain=6),
+}
+
+
+def get_profile(name: str | None = None) -> EncodeProfile:
+    if name is None:
+        name = (os.getenv("ENCODE_PROFILE", "quality") or "quality").strip().lower()
+    if name not in PROFILES:
+        print(f"[Monday] ENCODE_PROFILE sconosciuto {name!r}, uso 'quality'.")
+        name = "quality"
+    return PROFILES[name]
+
+
+def encode(
+    run: Callable[[list[str]], object],
+    head: list[str],
+    tail: list[str],
+    out_path: Path,
+    profile: EncodeProfile,
+    final_run: Callable[[list[str]], object] | None = None,
+) -> Path:
+    """
+    Esegue ffmpeg con i parametri video del profilo.
+
+    head: "ffmpeg -y" + input + filtri + opzioni di output indipendenti dal pass
+    tail: opzioni finali (audio, movflags, ...) usate solo nell'ultimo pass
+    Con two_pass: pass 1 senza audio verso null, pass 2 normale.
+    final_run: esegue l'ultimo pass al posto di run (es. upload in streaming);
+    riceve il comando con out_path come ultimo argomento.
+    """
+    final_run = final_run or run
+    if not profile.two_pass:
+        final_run([*head, *profile.video_args(), *tail, str(out_path)])
+        return out_path
+
+    passlog = out_path.with_name(f".{out_path.stem}_2pass")
+    try:
+        run([*head, *profile.video_args(1, passlog), "-an", "-f", "null", os.devnull])
+        final_run([*head, *profile.video_args(2, passlog), *tail, str(out_path)])
+    finally:
+        for p in out_path.parent.glob(f"{passlog.name}*"):
+            p.unlink(missing_ok=True)
+    return out_path
@@ -0,0 +1,356 @@
+"""
+Render farm su una cartella condivisa (NFS o locale): coda di job con lease.
+
+Ogni job e' una cartella con gli input della pipeline (voice.mp3, subtitles.txt,
+video-info.txt, ...) e un job.json ({"env": {...}, "attempts": n}). Gli stati
+sono sottocartelle di FARM_DIR e le transizioni sono rename atomici:
+
+    pending/<id>  --claim-->  leased/<id>  --ok-->  done/<id>
+                      ^            |
+                      +--- reap ---+ (lease scaduto: worker morto)   --> failed/<id>
+
+- claim: rename pending/<id> -> leased/<id>; uno solo dei worker ci riesce
+- lease: leased/<id>/.lease.json con un token del worker; l'heartbeat ne
+  aggiorna l'mtime ogni FARM_HEARTBEAT s. Se il token non e' piu' il suo (job
+  ri-accodato e preso da un altro) il worker abbandona il job
+- il coordinatore (`reap`) rimette in pending i job con lease piu' vecchio di
+  FARM_LEASE_TTL s; dopo FARM_MAX_ATTEMPTS tentativi il job va in failed/
+- output: il worker esegue src/main.py con VIDEOS_DIR=<job>, poi scrive
+  result.json con sha256 e dimensione di video_final.mp4 e pubblica il job in
+  done/ con un rename; `verify` ricontrolla i checksum
+
+Gli orologi degli host devono essere sincronizzati (NTP): la scadenza e' mtime.
+I job non caricano su YouTube (UPLOAD_YT=0) salvo "env" diverso nel job.json.
+
+Uso (anche su una sola macchina):
+    FARM_DIR=/mnt/farm python src/farm.py submit --from videos_to_upload
+    FARM_DIR=/mnt/farm python src/farm.py worker &     # uno per processo/host
+    FARM_DIR=/mnt/farm python src/farm.py coordinator
+    FARM_DIR=/mnt/farm python src/farm.py status | verify
+"""
+
+from __future__ import annotations
+
+import argparse
+import errno
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+
+import bulk_mover
+
+
+SRC_DIR = Path(__file__).resolve().parent
+ROOT_DIR = SRC_DIR.parent
+FARM_DIR = Path(os.getenv("FARM_DIR") or (ROOT_DIR / "build" / "farm"))
+
+STATES = ("pending", "leased", "done", "failed")
+LEASE_NAME = ".lease.json"
+JOB_NAME = "job.json"
+RESULT_NAME = "result.json"
+OUTPUT_NAME = "video_final.mp4"
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)) or default)
+
+
+def lease_ttl() -> float:
+    return _env_float("FARM_LEASE_TTL", 120)
+
+
+def heartbeat_interval() -> float:
+    return _env_float("FARM_HEARTBEAT", 15)
+
+
+def max_attempts() -> int:
+    return int(os.getenv("FARM_MAX_ATTEMPTS", "3") or "3")
+
+
+def _dirs(root: Path) -> dict[str, Path]:
+    d = {s: root / s for s in STATES}
+    for p in d.values():
+        p.mkdir(parents=True, exist_ok=True)
+    return d
+
+
+def _read_json(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_json_atomic(path: Path, data: dict) -> None:
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _try_rename(src: Path, dst: Path) -> bool:
+    """rename atomico; False se qualcun altro ci e' arrivato prima."""
+    try:
+        os.rename(src, dst)
+        return True
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        if e.errno in (errno.EEXIST, errno.ENOTEMPTY):
+            return False
+        raise
+
+
+# ---------------------------------------------------------------------------
+# Submit
+# ---------------------------------------------------------------------------
+
+
+def submit(inputs: Path, env: dict[str, str] | None = None, root: Path | None = None) -> str:
+    """Copia gli input in un nuovo job e lo pubblica in pending/ (atomico)."""
+    d = _dirs(root or FARM_DIR)
+    job_id = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}_{uuid.uuid4().hex[:8]}"
+    staging = d["pending"] / f".{job_id}.tmp"
+    staging.mkdir()
+    for p in Path(inputs).iterdir():
+        if p.is_file() and not p.name.startswith(".") and p.name not in (OUTPUT_NAME, RESULT_NAME):
+            shutil.copy2(p, staging / p.name)
+    _write_json_atomic(staging / JOB_NAME, {"env": env or {}, "attempts": 0, "submitted": time.time()})
+    os.rename(staging, d["pending"] / job_id)
+    return job_id
+
+
+# ---------------------------------------------------------------------------
+# Worker
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class Lease:
+    job_id: str
+    path: Path
+    token: str
+
+    def owned(self) -> bool:
+        return _read_json(self.path / LEASE_NAME).get("token") == self.token
+
+    def heartbeat(self) -> bool:
+        """Rinnova il lease; False se il job non e' piu' nostro."""
+        if not self.owned():
+            return False
+        try:
+            os.utime(self.path / LEASE_NAME)
+        except FileNotFoundError:
+            return False
+        return True
+
+
+def claim(worker_id: str, root: Path | None = None) -> Lease | None:
+    d = _dirs(root or FARM_DIR)
+    for job in sorted(p for p in d["pending"].iterdir() if p.is_dir() and not p.name.startswith(".")):
+        target = d["leased"] / job.name
+        if not _try_rename(job, target):
+            continue
+        token = uuid.uuid4().hex
+        _write_json_atomic(target / LEASE_NAME, {
+            "token": token,
+            "worker": worker_id,
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+            "claimed": time.time(),
+        })
+        return Lease(job.name, target, token)
+    return None
+
+
+def _run_job(lease: Lease) -> int | None:
+    """Esegue la pipeline sul job; None se il lease e' stato perso a meta'."""
+    job = _read_json(lease.path / JOB_NAME)
+    env = {**os.environ, "UPLOAD_YT": "0", **{k: str(v) for k, v in (job.get("env") or {}).items()}}
+    env["VIDEOS_DIR"] = str(lease.path)
+    log = (lease.path / f"worker_{socket.gethostname()}_{os.getpid()}.log").open("ab")
+    try:
+        proc = subprocess.Popen(
+            [sys.executable, str(SRC_DIR / "main.py")],
+            env=env, stdout=log, stderr=subprocess.STDOUT, start_new_session=True,
+        )
+        while True:
+            try:
+                return proc.wait(timeout=heartbeat_interval())
+            except subprocess.TimeoutExpired:
+                if not lease.heartbeat():
+                    print(f"[Monday] farm: lease di {lease.job_id} perso, interrompo il render.")
+                    os.killpg(proc.pid, 15)
+                    proc.wait()
+                    return None
+    finally:
+        log.close()
+
+
+def _finish(lease: Lease, returncode: int, started: float, worker_id: str, root: Path) -> str:
+    d = _dirs(root)
+    job = _read_json(lease.path / JOB_NAME)
+    output = lease.path / OUTPUT_NAME
+
+    if returncode == 0 and output.exists():
+        _write_json_atomic(lease.path / RESULT_NAME, {
+            "sha256": bulk_mover.file_sha256(output),
+            "size": output.stat().st_size,
+            "worker": worker_id,
+            "host": socket.gethostname(),
+            "seconds": round(time.time() - started, 3),
+            "finished": time.time(),
+        })
+        state = "done"
+    else:
+        job["attempts"] = int(job.get("attempts") or 0) + 1
+        job["last_error"] = f"exit {returncode}" + ("" if output.exists() else f", {OUTPUT_NAME} mancante")
+        _write_json_atomic(lease.path / JOB_NAME, job)
+        state = "pending" if job["attempts"] < max_attempts() else "failed"
+
+    # Publish only if we still own the job (the reaper may have taken it).
+    if not lease.owned():
+        return "lost"
+    (lease.path / LEASE_NAME).unlink(missing_ok=True)
+    if not _try_rename(lease.path, d[state] / lease.job_id):
+        return "lost"
+    return state
+
+
+def work(worker_id: str | None = None, once: bool = False, idle_sleep: float = 5.0, root: Path | None = None) -> None:
+    root = root or FARM_DIR
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    print(f"[Monday] farm: worker {worker_id} su {root}")
+    while True:
+        lease = claim(worker_id, root)
+        if lease is None:
+            if once:
+                return
+            time.sleep(idle_sleep)
+            continue
+
+        print(f"[Monday] farm: {worker_id} -> {lease.job_id}")
+        started = time.time()
+        rc = _run_job(lease)
+        state = "lost" if rc is None else _finish(lease, rc, started, worker_id, root)
+        print(f"[Monday] farm: {lease.job_id} -> {state}")
+        if once:
+            return
+
+
+# ---------------------------------------------------------------------------
+# Coordinator
+# ---------------------------------------------------------------------------
+
+
+def reap(root: Path | None = None) -> list[str]:
+    """Ri-accoda i job con lease scaduto (worker morto o host irraggiungibile)."""
+    d = _dirs(root or FARM_DIR)
+    ttl = lease_ttl()
+    moved: list[str] = []
+    for job in (p for p in d["leased"].iterdir() if p.is_dir()):
+        lease = job / LEASE_NAME
+        try:
+            age = time.time() - lease.stat().st_mtime
+        except FileNotFoundError:
+            # Claimed but lease not written yet: the rename bumped the dir's ctime.
+            try:
+                st = job.stat()
+                age = time.time() - max(st.st_mtime, st.st_ctime)
+            except FileNotFoundError:
+                continue
+        if age <= ttl:
+            continue
+
+        meta = _read_json(job / JOB_NAME)
+        meta["attempts"] = int(meta.get("attempts") or 0) + 1
+        meta["last_error"] = f"lease scaduto ({_read_json(lease).get('worker', '?')}, {age:.0f}s)"
+        state = "pending" if meta["attempts"] < max_attempts() else "failed"
+        # Invalidate the old lease first: a slow-but-alive worker sees it's gone.
+        lease.unlink(missing_ok=True)
+        _write_json_atomic(job / JOB_NAME, meta)
+        if _try_rename(job, d[state] / job.name):
+            moved.append(job.name)
+            print(f"[Monday] farm: {job.name} {meta['last_error']} -> {state}")
+    return moved
+
+
+def coordinate(interval: float | None = None, root: Path | None = None) -> None:
+    interval = interval or max(1.0, lease_ttl() / 4)
+    while True:
+        reap(root)
+        time.sleep(interval)
+
+
+def verify(root: Path | None = None) -> list[str]:
+    """Ricalcola lo sha256 degli output in done/; ritorna i job corrotti."""
+    d = _dirs(root or FARM_DIR)
+    bad: list[str] = []
+    for job in sorted(p for p in d["done"].iterdir() if p.is_dir()):
+        res = _read_json(job / RESULT_NAME)
+        out = job / OUTPUT_NAME
+        if not out.exists() or bulk_mover.file_sha256(out) != res.get("sha256"):
+            bad.append(job.name)
+    return bad
+
+
+def status(root: Path | None = None) -> dict[str, list[str]]:
+    d = _dirs(root or FARM_DIR)
+    return {s: sorted(p.name for p in d[s].iterdir() if p.is_dir() and not p.name.startswith(".")) for s in STATES}
+
+
+def _parse_env(items: list[str]) -> dict[str, str]:
+    out: dict[str, str] = {}
+    for item in items:
+        k, _, v = item.partition("=")
+        out[k] = v
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Render farm su cartella condivisa")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    s = sub.add_parser("submit", help="accoda un job dagli input di una cartella")
+    s.add_argument("--from", dest="inputs", default=str(ROOT_DIR / "videos_to_upload"))
+    s.add_argument("--env", nargs="*", default=[], help="KEY=VALUE per la pipeline")
+    w = sub.add_parser("worker", help="prende job e li renderizza")
+    w.add_argument("--id", default=None)
+    w.add_argument("--once", action="store_true")
+    sub.add_parser("coordinator", help="ri-accoda i job dei worker morti (loop)")
+    sub.add_parser("reap", help="un solo giro del coordinatore")
+    sub.add_parser("status")
+    sub.add_parser("verify", help="ricontrolla i checksum degli output")
+    args = ap.parse_args()
+
+    if args.cmd == "submit":
+        print(submit(Path(args.inputs), _parse_env(args.env)))
+    elif args.cmd == "worker":
+        work(args.id, once=args.once)
+    elif args.cmd == "coordinator":
+        coordinate()
+    elif args.cmd == "reap":
+        reap()
+    elif args.cmd == "status":
+        for state, jobs in status().items():
+            print(f"{state:8s} {len(jobs):4d}  {' '.join(jobs[:10])}")
+    else:
+        bad = verify()
+        for j in bad:
+            print(f"[Monday] farm: checksum NON valido per {j}")
+        raise SystemExit(1 if bad else 0)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
@@ -1,9 +1,9 @@
 from __future__ import annotations
 
+import argparse
 import os
 import re
 import shlex
-import subprocess
 import inspect
 from dataclasses import dataclass
 from datetime import datetime
@@ -11,20 +11,55 @@ from pathlib import Path
 
 # Local modules
 import backgrounds
+import bg_pool
+import catalog
+import encode_profiles
+import metrics
+import orchestrator
+import replay
+import scratch
+import split_render
+import stream_upload
+import streaming
 import subtitles
+import supervise
+import thumbnails
 
 ROOT = Path(__file__).resolve().parent.parent
-VIDEOS_DIR = ROOT / "videos_to_upload"
+# VIDEOS_DIR: overridden by farm workers (one job directory per run)
+VIDEOS_DIR = Path(os.getenv("VIDEOS_DIR") or (ROOT / "videos_to_upload"))
 BUILD_DIR = ROOT / "build"
 
 DEFAULT_W = 1080
 DEFAULT_H = 1920
 DEFAULT_FPS = 30
 
+# Preview renders (PREVIEW=1 / --preview): low-res, ultrafast, never uploaded
+PREVIEW_NAME = "video_preview.mp4"
+
+
+def _preview_enabled() -> bool:
+    return (os.getenv("PREVIEW", "0") or "0").strip() == "1"
+
+
+def _preview_geometry() -> tuple[int, int, int]:
+    """PREVIEW_SIZE (default 360x640) and PREVIEW_FPS (default 15); even sizes for yuv420p."""
+    raw = (os.getenv("PREVIEW_SIZE", "360x640") or "360x640").strip().lower()
+    try:
+        w, h = (int(v) for v in raw.split("x", 1))
+    except ValueError:
+        w, h = 360, 640
+    fps = int(os.getenv("PREVIEW_FPS", "15") or "15")
+    return w - w % 2, h - h % 2, fps
+
+# Inputs picked up from videos_to_upload, in priority order
+AUDIO_CANDIDATES = ["voice.mp3", "voice.wav", "audio.mp3", "audio.wav"]
+VIDEO_CANDIDATES = ["video.mp4", "input.mp4", "source.mp4"]
+
 
 def _run(cmd: list[str]) -> str:
     """Run a command and return stdout, raise with nice error on failure."""
-    p = subprocess.run(cmd, capture_output=True, text=True)
+    p = supervise.run(cmd)
     if p.returncode != 0:
         raise RuntimeError(
             "[Monday] Command failed\n"
@@ -49,10 +84,9 @@ def _ffprobe_duration(path: Path) -> float:
 
 
 def _ffprobe_has_audio(path: Path) -> bool:
-    out = subprocess.run(
+    out = supervise.run(
         ["ffprobe", "-v", "error", "-select_streams", "a", "-show_entries", "stream=codec_type",
          "-of", "default=nw=1:nk=1", str(path)],
-        capture_output=True, text=True
     )
     return out.returncode == 0 and "audio" in (out.stdout or "").lower()
 
@@ -64,29 +98,35 @@ def _sanitize_title(s: str) -> str:
     return s
 
 
-def _pick_audio_file() -> Path:
+def _pick_audio_file(
+    work_dir: Path = BUILD_DIR,
+    duration_cap: float | None = None,
+    stream: bool = False,
+) -> tuple[Path, bool]:
     """
     Prefer an explicit voice file (fully automatic pipeline should create this).
     Fallback: try to extract from a video in videos_to_upload.
+
+    Returns (path, streamed). With stream=True a source video is NOT extracted:
+    path is the video itself and the caller pipes its audio (streaming.py).
+    Extraction always stops at duration_cap: no full-length decode of long sources.
     """
-    candidates = [
-        VIDEOS_DIR / "voice.mp3",
-        VIDEOS_DIR / "voice.wav",
-        VIDEOS_DIR / "audio.mp3",
-        VIDEOS_DIR / "audio.wav",
-    ]
-    for c in candidates:
+    for c in (VIDEOS_DIR / n for n in AUDIO_CANDIDATES):
         if c.exists() and c.stat().st_size > 0:
-            return c
+            return c, False
 
     # fallback: extract from a video file if present
-    for vname in ["video.mp4", "input.mp4", "source.mp4"]:
+    for vname in VIDEO_CANDIDATES:
         v = VIDEOS_DIR / vname
         if v.exists() and v.stat().st_size > 0 and _ffprobe_has_audio(v):
-            BUILD_DIR.mkdir(parents=True, exist_ok=True)
-            out_wav = BUILD_DIR / "voice_extracted.wav"
+            if stream:
+                return v, True
+            work_dir.mkdir(parents=True, exist_ok=True)
+            out_wav = work_dir / "voice_extracted.wav"
+            cap_args = ["-t", f"{duration_cap:.3f}"] if duration_cap else []
             _run([
                 "ffmpeg", "-y",
+                *cap_args,
                 "-i", str(v),
                 "-vn",
                 "-ac", "1",
@@ -94,7 +134,7 @@ def _pick_audio_file() -> Path:
                 "-c:a", "pcm_s16le",
                 str(out_wav),
             ])
-            return out_wav
+            return out_wav, False
 
     raise FileNotFoundError(
         "[Monday] Audio non trovato.\n"
@@ -208,7 +248,13 @@ def _build_ass(lines: list[AssLine], out_path: Path, style: str = "cinematic") -
     return out_path
 
 
-def _subtitles_from_txt(subs_txt: Path, duration: float, wrap_words: int, style: str) -> Path:
+def _subtitles_from_txt(
+    subs_txt: Path,
+    duration: float,
+    wrap_words: int,
+    style: str,
+    work_dir: Path = BUILD_DIR,
+) -> Path:
     """
     Turn subtitles.txt into timed ASS lines spread across duration.
     Each input line becomes a segment.
@@ -245,11 +291,11 @@ def _subtitles_from_txt(subs_txt: Path, duration: float, wrap_words: int, style:
     if out_lines and out_lines[-1].end < duration:
         out_lines[-1].end = duration
 
-    BUILD_DIR.mkdir(parents=True, exist_ok=True)
-    return _build_ass(out_lines, BUILD_DIR / "subtitles.ass", style=style)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    return _build_ass(out_lines, work_dir / "subtitles.ass", style=style)
 
 
-def _ensure_subtitles_ass(duration: float, style: str) -> Path:
+def _ensure_subtitles_ass(duration: float, style: str, work_dir: Path = BUILD_DIR) -> Path:
     """
     Priority:
     1) videos_to_upload/subtitles_wrapped.ass (if you already generated it)
@@ -264,42 +310,58 @@ def _ensure_subtitles_ass(duration: float, style: str) -> Path:
 
     p_txt = VIDEOS_DIR / "subtitles.txt"
     if p_txt.exists() and p_txt.stat().st_size > 0:
-        return _subtitles_from_txt(p_txt, duration=duration, wrap_words=wrap_words, style=style)
+        return _subtitles_from_txt(p_txt, duration=duration, wrap_words=wrap_words, style=style, work_dir=work_dir)
 
     # Minimal fallback
     title, _ = _read_video_info()
     if not title:
         title = "Deadpan story"
     out_lines = [AssLine(0.0, max(2.0, min(5.0, duration)), _wrap_every_n_words(title, wrap_words))]
-    BUILD_DIR.mkdir(parents=True, exist_ok=True)
-    return _build_ass(out_lines, BUILD_DIR / "subtitles.ass", style=style)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    return _build_ass(out_lines, work_dir / "subtitles.ass", style=style)
 
 
-def _make_base_video(background_mp4: Path, audio_path: Path) -> Path:
-    BUILD_DIR.mkdir(parents=True, exist_ok=True)
-    out = BUILD_DIR / "video_base.mp4"
+def _make_base_video(
+    background_mp4: Path,
+    audio_path: Path,
+    work_dir: Path = BUILD_DIR,
+    audio_producer: list[str] | None = None,
+) -> Path:
+    work_dir.mkdir(parents=True, exist_ok=True)
+    out = work_dir / "video_base.mp4"
+
+    # Audio from a file, or piped from a producer process (STREAM_AUDIO=1)
+    audio_input = streaming.audio_consumer_input() if audio_producer else ["-i", str(audio_path)]
 
     # Re-encode audio to AAC, keep video (bg already H264), ensure faststart.
-    _run([
+    cmd = [
         "ffmpeg", "-y",
         "-i", str(background_mp4),
-        "-i", str(audio_path),
+        *audio_input,
+        "-map", "0:v:0",
+        "-map", "1:a:0",
         "-c:v", "copy",
         "-c:a", "aac",
         "-b:a", "128k",
         "-shortest",
         "-movflags", "+faststart",
         str(out),
-    ])
+    ]
+    if audio_producer:
+        streaming.run_piped(audio_producer, cmd)
+    else:
+        _run(cmd)
     return out
 
 
-def _unique_suffix() -> str:
-    # short unique ID for titles
+def _unique_suffix(seed: int | None = None) -> str:
+    # short unique ID for titles (derived from the run seed in replay mode)
+    if seed is not None:
+        return f"{seed % 16**8:08x}"
     return datetime.utcnow().strftime("%y%m%d-%H%M%S")
 
 
-def _make_title_and_description() -> tuple[str, str, list[str]]:
+def _make_title_and_description(suffix_seed: int | None = None) -> tuple[str, str, list[str]]:
     base_title, base_desc = _read_video_info()
 
     if not base_title:
@@ -325,7 +387,7 @@ def _make_title_and_description() -> tuple[str, str, list[str]]:
         pass
 
     # Add suffix to avoid duplicates
-    suffix = _unique_suffix()
+    suffix = _unique_suffix(suffix_seed)
     title = f"{base_title} [{suffix}]"
     title = title[:95].rstrip()
 
@@ -337,7 +399,55 @@ def _make_title_and_description() -> tuple[str, str, list[str]]:
     return title, desc, tags
 
 
-def _call_upload(video_path: Path, title: str, description: str, tags: list[str]) -> str:
+def _already_uploaded(sha256: str) -> dict | None:
+    """UPLOAD_DEDUP: a run whose final file (same bytes) is already on YouTube."""
+    if not catalog.dedup_enabled():
+        return None
+    try:
+        return catalog.find_uploaded(sha256)
+    except Exception as e:
+        print(f"[Monday] Catalogo non leggibile, niente controllo duplicati: {e}")
+        return None
+
+
+def _upload_via_accounts(
+    video_path: Path,
+    title: str,
+    description: str,
+    tags: list[str],
+    thumbnail_path: Path | None,
+    expected_duration: float | None,
+) -> str:
+    """
+    UPLOAD_ACCOUNTS=1: upload through the account pool (accounts.py), so a
+    channel that hit its daily limit hands the video to the next one.
+    """
+    import accounts
+
+    job = accounts.UploadJob(
+        video_path=video_path,
+        title=title,
+        description=description,
+        tags=tags,
+        thumbnail_path=thumbnail_path,
+        expected_duration=expected_duration,
+    )
+    (res,) = accounts.dispatch([job])
+    if res.error:
+        print(f"[Monday] Upload non riuscito ({res.account or 'nessun account'}): {res.error}")
+        return ""
+    print(f"[Monday] Caricato sull'account {res.account}")
+    return res.video_id
+
+
+def _call_upload(
+    video_path: Path,
+    title: str,
+    description: str,
+    tags: list[str],
+    thumbnail_path: Path | None = None,
+    expected_duration: float | None = None,
+) -> str:
     """
     Call uploader.upload_video in a compatible way (signature might differ).
     """
@@ -365,6 +475,10 @@ def _call_upload(video_path: Path, title: str, description: str, tags: list[str]
         kwargs["tags"] = tags
     if "privacy_status" in sig.parameters:
         kwargs["privacy_status"] = "public"
+    if thumbnail_path is not None and "thumbnail_path" in sig.parameters:
+        kwargs["thumbnail_path"] = str(thumbnail_path)
+    if expected_duration is not None and "expected_duration" in sig.parameters:
+        kwargs["expected_duration"] = expected_duration
 
     # call safely
     try:
@@ -376,63 +490,355 @@ def _call_upload(video_path: Path, title: str, description: str, tags: list[str]
         return fn(str(video_path))
 
 
-def main() -> None:
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Deadpan video pipeline")
+    ap.add_argument(
+        "--seed",
+        default=None,
+        help="root seed for a deterministic replay run (default: RUN_SEED, else a unique run)",
+    )
+    ap.add_argument(
+        "--preview",
+        action="store_true",
+        help="low-res ultrafast render to videos_to_upload/video_preview.mp4, never uploaded (PREVIEW=1)",
+    )
+    args = ap.parse_args(argv)
+    if args.preview:
+        os.environ["PREVIEW"] = "1"
+    if args.seed is not None:
+        os.environ["RUN_SEED"] = args.seed
+    root_seed = replay.root_seed_from_env()
+    # farm/watcher/CI stop us with SIGTERM: clean up and kill our ffmpeg children
+    supervise.install_signal_handlers()
+
     VIDEOS_DIR.mkdir(parents=True, exist_ok=True)
     BUILD_DIR.mkdir(parents=True, exist_ok=True)
 
+    # Intermediates live in the scratch workspace (tmpfs when possible)
+    work_dir = scratch.work_dir()
+    ok = False
+    try:
+        _run_pipeline(work_dir, root_seed)
+        ok = True
+    except BaseException as e:
+        metrics.record_failure(type(e).__name__)
+        raise
+    finally:
+        scratch.cleanup()
+        prom = metrics.flush(success=ok)
+        if prom is not None:
+            print(f"[Monday] Metriche: {prom}")
+
+
+def _early_duration(duration_cap: float) -> float:
+    """
+    Background length before the audio stage has run: a quick probe of the input
+    the audio will come from (same priority as _pick_audio_file), else the cap.
+    """
+    for c in [VIDEOS_DIR / n for n in AUDIO_CANDIDATES + VIDEO_CANDIDATES]:
+        if c.exists() and c.stat().st_size > 0:
+            try:
+                # small margin: container and audio stream durations differ slightly
+                return min(_ffprobe_duration(c) + 0.5, duration_cap)
+            except RuntimeError:
+                break
+    return duration_cap
+
+
+def _prepare_background(
+    duration: float,
+    seed: int,
+    work_dir: Path,
+    grain: int = 18,
+    allow_pool: bool = True,
+    width: int = DEFAULT_W,
+    height: int = DEFAULT_H,
+    fps: int = DEFAULT_FPS,
+) -> Path:
+    # Background: warm pool first (BG_POOL=1), otherwise procedural on the spot
+    use_pool = allow_pool and (os.getenv("BG_POOL", "0") or "0").strip() == "1"
+    bg = None
+    if use_pool:
+        bg = bg_pool.take(
+            duration_s=duration,
+            out_path=work_dir / "bg_pool_trimmed.mp4",
+            width=width,
+            height=height,
+            fps=fps,
+        )
+        if bg is None:
+            print("[Monday] bg_pool vuoto -> genero il background al volo.")
+    if bg is None:
+        # Generate background mp4 procedural (already 1080x1920)
+        bg = backgrounds.generate_procedural_background(
+            duration_s=duration,
+            seed=seed,
+            width=width,
+            height=height,
+            fps=fps,
+            out_path=work_dir / f"bg_{seed}.mp4",
+            grain=grain,
+        )
+    if use_pool and (os.getenv("BG_POOL_REFILL", "1") or "1").strip() == "1":
+        bg_pool.spawn_refill()
+    return bg
+
+
+def _run_pipeline(work_dir: Path, root_seed: int | None = None) -> None:
     # Sub style (only affects ASS style sizing/margins)
     sub_style = (os.getenv("SUB_STYLE", "cinematic") or "cinematic").strip().lower()
     if sub_style not in ("cinematic", "aggressive"):
         sub_style = "cinematic"
     print(f"[Monday] SUB_STYLE scelto: {sub_style}")
 
-    # Pick audio
-    audio_path = _pick_audio_file()
-    print(f"[Monday] Audio: {audio_path} (size: {audio_path.stat().st_size} byte)")
-
-    # Duration (cap to 60s for Shorts safety unless you want more)
-    duration = _ffprobe_duration(audio_path)
+    # Duration cap (60s for Shorts safety unless you want more)
     duration_cap = float(os.getenv("DURATION_LIMIT", "60") or "60")
-    duration = min(duration, duration_cap)
-    print(f"[Monday] Durata: {duration:.2f}s (cap {duration_cap}s)")
-
-    # Generate background mp4 procedural (already 1080x1920)
-    seed = int(datetime.utcnow().timestamp())
-    bg = backgrounds.generate_procedural_background(
-        duration_s=duration,
-        seed=seed,
-        width=DEFAULT_W,
-        height=DEFAULT_H,
-        fps=DEFAULT_FPS,
-    )
-    print(f"[Monday] Background: {bg} (size: {bg.stat().st_size} byte)")
-
-    # Make base video with audio
-    base_video = _make_base_video(bg, audio_path)
-    print(f"[Monday] Base video: {base_video} (size: {base_video.stat().st_size} byte)")
-
-    # Ensure subtitles ASS
-    subs_ass = _ensure_subtitles_ass(duration=duration, style=sub_style)
-    print(f"[Monday] Subtitles ASS: {subs_ass} (size: {subs_ass.stat().st_size} byte)")
-
-    # Burn-in subtitles -> final in videos_to_upload
-    final_path = subtitles.add_burned_in_subtitles(
-        video_path=base_video,
-        subtitles_ass_path=subs_ass,
-        output_dir=VIDEOS_DIR,
-        output_name="video_final.mp4",
-    )
-    print(f"[Monday] Video finale: {final_path} (size: {final_path.stat().st_size} byte)")
+    # Watchdog deadlines scale with the media length (supervise.py)
+    supervise.set_media_seconds(duration_cap)
+
+    # Replay mode: every random choice comes from the root seed
+    if root_seed is not None:
+        seed = replay.derive(root_seed, "background") % 2**31
+        title_seed = replay.derive(root_seed, "title")
+        print(f"[Monday] Replay: RUN_SEED={root_seed} (run id {replay.run_id(root_seed)})")
+    else:
+        seed = int(datetime.utcnow().timestamp())
+        title_seed = None
+    preview = _preview_enabled()
+    if preview:
+        width, height, fps = _preview_geometry()
+        split = 1
+        profile = encode_profiles.get_profile("preview")
+        print(f"[Monday] PREVIEW: {width}x{height}@{fps}, niente upload")
+    else:
+        width, height, fps = DEFAULT_W, DEFAULT_H, DEFAULT_FPS
+        split = split_render.split_segments_from_env()
+        profile = encode_profiles.get_profile()
+    print(f"[Monday] Encode profile: {profile.name}")
+
+    def audio_stage() -> tuple[Path, float, list[str] | None]:
+        # Pick audio (STREAM_AUDIO=1: source video audio is piped, never extracted to disk)
+        audio_path, streamed = _pick_audio_file(
+            work_dir, duration_cap=duration_cap, stream=streaming.streaming_enabled()
+        )
+        print(f"[Monday] Audio: {audio_path} (size: {audio_path.stat().st_size} byte, stream={int(streamed)})")
+
+        duration = min(_ffprobe_duration(audio_path), duration_cap)
+        print(f"[Monday] Durata: {duration:.2f}s (cap {duration_cap}s)")
+        producer = streaming.audio_producer_cmd(audio_path, duration) if streamed else None
+        return audio_path, duration, producer
+
+    def subtitles_stage(duration: float) -> Path:
+        subs_ass = _ensure_subtitles_ass(duration=duration, style=sub_style, work_dir=work_dir)
+        if preview:
+            # Layout stays in 1080x1920 script coordinates; libass scales it down
+            subs_ass = subtitles.preview_ass(subs_ass, work_dir / "subtitles_preview.ass")
+        print(f"[Monday] Subtitles ASS: {subs_ass} (size: {subs_ass.stat().st_size} byte)")
+        return subs_ass
 
-    # Upload if enabled
     upload = (os.getenv("UPLOAD_YT", "1") or "1").strip()
-    if upload == "1":
-        title, desc, tags = _make_title_and_description()
-        print(f"[Monday] Titolo che inviamo a YouTube: {title!r}")
-        vid = _call_upload(final_path, title=title, description=desc, tags=tags)
-        print(f"[Monday] Uploaded video id: {vid}")
+    # Streamed upload (stream_upload.py): the final encode goes up while it's written
+    upload_meta = None
+    streamed: dict[str, str] = {}
+    if (
+        stream_upload.enabled() and upload == "1" and not preview and split <= 1
+        and (os.getenv("UPLOAD_ACCOUNTS", "0") or "0").strip() != "1"
+    ):
+        upload_meta = _make_title_and_description(title_seed)
+        print(f"[Monday] STREAM_UPLOAD: upload durante l'encode, titolo {upload_meta[0]!r}")
+
+    timeline = None
+    if split > 1:
+        with metrics.stage("audio"):
+            audio_path, duration, audio_producer = audio_stage()
+        supervise.set_media_seconds(duration)
+
+        # Split encode: background + burn-in per GOP-aligned segment, in parallel
+        with metrics.stage("subtitles"):
+            subs_ass = subtitles_stage(duration)
+
+        with metrics.stage("split_render"):
+            rendered = split_render.render_final_split(
+                seed=seed,
+                audio_path=audio_path,
+                subtitles_ass=subs_ass,
+                duration_s=duration,
+                out_path=work_dir / "video_final.mp4",
+                segments=split,
+                width=width,
+                height=height,
+                fps=fps,
+                work_dir=work_dir,
+                audio_producer=audio_producer,
+                profile=profile,
+            )
     else:
-        print("[Monday] UPLOAD_YT=0 -> upload saltato.")
+        # The background only needs a length: it starts right away, alongside
+        # audio extraction and subtitles, and mux -shortest trims it to the audio.
+        bg_duration = _early_duration(duration_cap)
+
+        def background_stage(_r: dict) -> Path:
+            # Pool entries have their own random seeds (and are full size):
+            # not usable for a replay or a preview
+            with supervise.media_seconds_for(bg_duration):
+                bg = _prepare_background(
+                    bg_duration, seed, work_dir,
+                    grain=profile.grain,
+                    allow_pool=root_seed is None and not preview,
+                    width=width,
+                    height=height,
+                    fps=fps,
+                )
+            print(f"[Monday] Background: {bg} (size: {bg.stat().st_size} byte)")
+            return bg
+
+        # Stages run concurrently: each declares its own media length to the
+        # watchdog instead of touching the run-wide value.
+        def mux_stage(r: dict) -> Path:
+            audio_path, duration, producer = r["audio"]
+            with supervise.media_seconds_for(duration):
+                base_video = _make_base_video(r["background"], audio_path, work_dir, audio_producer=producer)
+            print(f"[Monday] Base video: {base_video} (size: {base_video.stat().st_size} byte)")
+            return base_video
+
+        def streamed_upload(cmd: list[str], duration: float) -> None:
+            import uploader
+
+            title, desc, tags = upload_meta
+            streamed["video_id"] = uploader.upload_stream(
+                cmd, title=title, description=desc, tags=tags, expected_duration=duration
+            )
+
+        def burn_stage(r: dict) -> Path:
+            # Burn-in subtitles (in scratch); STREAM_UPLOAD=1 uploads while encoding
+            with supervise.media_seconds_for(r["audio"][1]):
+                return subtitles.add_burned_in_subtitles(
+                    video_path=r["mux"],
+                    subtitles_ass_path=r["subtitles"],
+                    output_dir=work_dir,
+                    output_name="video_final.mp4",
+                    profile=profile,
+                    original_size=(DEFAULT_W, DEFAULT_H) if preview else None,
+                    final_run=(lambda cmd: streamed_upload(cmd, r["audio"][1])) if upload_meta else None,
+                )
+
+        graph = orchestrator.Graph()
+        graph.add("background", background_stage)
+        graph.add("audio", lambda _r: audio_stage())
+        graph.add("subtitles", lambda r: subtitles_stage(r["audio"][1]), deps=("audio",))
+        graph.add("mux", mux_stage, deps=("background", "audio"))
+        graph.add("burn", burn_stage, deps=("mux", "subtitles"))
+        parallel = (os.getenv("PARALLEL_STAGES", "1") or "1").strip() != "0"
+        results = graph.run(max_workers=4 if parallel else 1)
+        timeline = graph.report()
+
+        audio_path, duration, _producer = results["audio"]
+        # Stages are done: later steps (thumbnail, validation) use the real length
+        supervise.set_media_seconds(duration)
+        subs_ass = results["subtitles"]
+        rendered = results["burn"]
+
+    if preview:
+        with metrics.stage("promote"):
+            preview_path = scratch.promote(rendered, VIDEOS_DIR / PREVIEW_NAME)
+        print(f"[Monday] Preview: {preview_path} (size: {preview_path.stat().st_size} byte)")
+        return
+
+    # Only the final artifact goes to persistent storage (atomic rename)
+    with metrics.stage("promote"):
+        final_path = scratch.promote(rendered, VIDEOS_DIR / "video_final.mp4")
+    metrics.inc("bytes_rendered_total", final_path.stat().st_size)
+    print(f"[Monday] Video finale: {final_path} (size: {final_path.stat().st_size} byte)")
+
+    # Thumbnail: best of K candidate frames (single ffmpeg pass, keyframes only)
+    thumb_path = None
+    if (os.getenv("THUMBNAIL", "1") or "1").strip() == "1":
+        try:
+            with metrics.stage("thumbnail"):
+                thumb_path = thumbnails.pick_thumbnail(final_path, out_path=final_path.with_name("thumbnail.jpg"))
+            print(f"[Monday] Thumbnail: {thumb_path} (size: {thumb_path.stat().st_size} byte)")
+        except Exception as e:
+            print(f"[Monday] Thumbnail saltata: {e}")
+
+    inputs = {
+        "audio": {"path": audio_path.name, "sha256": replay.sha256_file(audio_path)},
+        "subtitles_ass": {"path": subs_ass.name, "sha256": replay.sha256_file(subs_ass)},
+    }
+    script_txt = VIDEOS_DIR / "subtitles.txt"
+    if script_txt.exists():
+        # The script as written, independent of SUB_STYLE (the catalog's script hash)
+        inputs["script"] = {"path": script_txt.name, "sha256": replay.sha256_file(script_txt)}
+
+    manifest = {
+        "run_id": replay.run_id(root_seed),
+        "root_seed": root_seed,
+        "seeds": {
+            "background": seed,
+            "title": title_seed,
+        },
+        "profile": profile.name,
+        "split_segments": split,
+        "stages": timeline,
+        "size": f"{width}x{height}",
+        "fps": fps,
+        "duration": round(duration, 3),
+        "inputs": inputs,
+        "output": {
+            "path": final_path.name,
+            "size": final_path.stat().st_size,
+            "sha256": replay.sha256_file(final_path),
+        },
+    }
+
+    # Upload if enabled; the run goes to the catalog whatever happens
+    manifest["upload_status"] = "skipped"
+    try:
+        if upload_meta:
+            vid = streamed.get("video_id", "")
+            manifest["title"] = upload_meta[0]
+            print(f"[Monday] Uploaded video id: {vid} (in streaming)")
+            manifest["video_id"] = vid
+            manifest["upload_status"] = "uploaded" if vid else "not_uploaded"
+            if vid and thumb_path is not None:
+                import uploader
+
+                uploader.set_thumbnail(vid, thumb_path)
+        elif upload == "1":
+            title, desc, tags = _make_title_and_description(title_seed)
+            manifest["title"] = title
+            dup = _already_uploaded(manifest["output"]["sha256"])
+            if dup:
+                print(f"[Monday] Stesso file gia' caricato (run {dup['run_id']}, video {dup['video_id']}): "
+                      "upload saltato (UPLOAD_DEDUP=0 per forzarlo).")
+                manifest["upload_status"] = "duplicate"
+                manifest["duplicate_of"] = dup["run_id"]
+            else:
+                print(f"[Monday] Titolo che inviamo a YouTube: {title!r}")
+                with metrics.stage("upload"):
+                    if (os.getenv("UPLOAD_ACCOUNTS", "0") or "0").strip() == "1":
+                        vid = _upload_via_accounts(final_path, title, desc, tags, thumb_path, duration)
+                    else:
+                        vid = _call_upload(
+                            final_path,
+                            title=title,
+                            description=desc,
+                            tags=tags,
+                            thumbnail_path=thumb_path,
+                            expected_duration=duration,
+                        )
+                print(f"[Monday] Uploaded video id: {vid}")
+                manifest["video_id"] = vid
+                manifest["upload_status"] = "uploaded" if vid else "not_uploaded"
+        else:
+            print("[Monday] UPLOAD_YT=0 -> upload saltato.")
+    except BaseException:
+        manifest["upload_status"] = "failed"
+        raise
+    finally:
+        manifest["stage_seconds"] = {k: round(v, 3) for k, v in metrics.stage_durations().items()}
+        manifest_path = replay.write_manifest(final_path.with_name(replay.MANIFEST_NAME), manifest)
+        print(f"[Monday] Manifest: {manifest_path}")
+        catalog.record_run(manifest)
 
 
 if __name__ == "__main__":
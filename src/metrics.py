@@ -0,0 +1,222 @@
+"""
+Metriche Prometheus (textfile collector di node_exporter) per i run della pipeline.
+
+Durante il run si registrano durate degli stadi, byte, cache TTS, upload, retry e
+motivi di fallimento; a fine run flush() le somma allo stato cumulativo (JSON
+accanto al .prom) e riscrive il file .prom in modo atomico, come richiesto dal
+textfile collector (node_exporter --collector.textfile.directory=...).
+
+Env:
+- METRICS=0 disabilita tutto
+- METRICS_TEXTFILE (default build/metrics/deadpan.prom)
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+BUILD_DIR = ROOT_DIR / "build"
+
+PREFIX = "deadpan"
+
+# Stage durations go from sub-second (probe) to minutes (render).
+STAGE_BUCKETS = [0.1, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600]
+
+_HELP = {
+    "stage_duration_seconds": ("histogram", "Durata degli stadi della pipeline."),
+    "runs_total": ("counter", "Run della pipeline per esito."),
+    "failures_total": ("counter", "Fallimenti per motivo (es. uploadLimitExceeded, stall, RuntimeError)."),
+    "bytes_rendered_total": ("counter", "Byte dei video finali renderizzati."),
+    "bytes_uploaded_total": ("counter", "Byte inviati a YouTube."),
+    "upload_retries_total": ("counter", "Retry durante l'upload."),
+    "process_stalls_total": ("counter", "Processi esterni uccisi dal watchdog (deadline superata)."),
+    "uploads_total": ("counter", "Upload completati per account (pool multi-account)."),
+    "tts_cache_hits_total": ("counter", "Frasi TTS servite dalla cache."),
+    "tts_cache_misses_total": ("counter", "Frasi TTS sintetizzate."),
+    "tts_cache_hit_ratio": ("gauge", "Hit ratio cumulativo della cache TTS."),
+    "upload_throughput_bytes_per_second": ("gauge", "Throughput dell'ultimo upload."),
+    "upload_chunk_size_bytes": ("gauge", "Dimensione finale del chunk dell'upload adattivo."),
+    "critical_path_seconds": ("gauge", "Durata wall degli stadi concorrenti (percorso critico) dell'ultimo run."),
+    "last_run_timestamp_seconds": ("gauge", "Fine dell'ultimo run (unix time)."),
+    "last_run_success": ("gauge", "1 se l'ultimo run e' andato a buon fine."),
+}
+
+_lock = threading.Lock()
+_run: dict = {"hist": {}, "counters": {}, "gauges": {}}
+
+
+def enabled() -> bool:
+    return (os.getenv("METRICS", "1") or "1").strip() != "0"
+
+
+def textfile_path() -> Path:
+    return Path(os.getenv("METRICS_TEXTFILE") or (BUILD_DIR / "metrics" / f"{PREFIX}.prom"))
+
+
+def _key(name: str, labels: dict[str, str] | None) -> str:
+    # JSON-friendly series key: name|k=v,k=v
+    lbl = ",".join(f"{k}={v}" for k, v in sorted((labels or {}).items()))
+    return f"{name}|{lbl}"
+
+
+def observe(name: str, value: float, labels: dict[str, str] | None = None) -> None:
+    with _lock:
+        _run["hist"].setdefault(_key(name, labels), []).append(float(value))
+
+
+def inc(name: str, value: float = 1.0, labels: dict[str, str] | None = None) -> None:
+    with _lock:
+        k = _key(name, labels)
+        _run["counters"][k] = _run["counters"].get(k, 0.0) + float(value)
+
+
+def set_gauge(name: str, value: float, labels: dict[str, str] | None = None) -> None:
+    with _lock:
+        _run["gauges"][_key(name, labels)] = float(value)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Misura la durata di uno stadio (anche se fallisce)."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("stage_duration_seconds", time.perf_counter() - t0, {"stage": name})
+
+
+def stage_durations() -> dict[str, float]:
+    """Durate (somma) degli stadi del run corrente, per log/catalogo."""
+    out: dict[str, float] = {}
+    with _lock:
+        for k, values in _run["hist"].items():
+            name, lbl = k.split("|", 1)
+            if name == "stage_duration_seconds" and lbl.startswith("stage="):
+                out[lbl[len("stage="):]] = sum(values)
+    return out
+
+
+def record_failure(reason: str) -> None:
+    inc("failures_total", 1, {"reason": reason})
+
+
+def _load_state(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {"hist": {}, "counters": {}, "gauges": {}}
+
+
+def _merge(state: dict, run: dict) -> None:
+    for k, values in run["hist"].items():
+        h = state["hist"].setdefault(k, {"buckets": [0] * len(STAGE_BUCKETS), "sum": 0.0, "count": 0})
+        for v in values:
+            for i, le in enumerate(STAGE_BUCKETS):
+                if v <= le:
+                    h["buckets"][i] += 1
+            h["sum"] += v
+            h["count"] += 1
+    for k, v in run["counters"].items():
+        state["counters"][k] = state["counters"].get(k, 0.0) + v
+    state["gauges"].update(run["gauges"])
+
+    hits = sum(v for k, v in state["counters"].items() if k.startswith("tts_cache_hits_total|"))
+    misses = sum(v for k, v in state["counters"].items() if k.startswith("tts_cache_misses_total|"))
+    if hits + misses > 0:
+        state["gauges"][_key("tts_cache_hit_ratio", None)] = hits / (hits + misses)
+
+
+def _series(name: str, lbl: str, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in (p.split("=", 1) for p in lbl.split(",") if p)]
+    if extra:
+        parts.append(extra)
+    return f"{PREFIX}_{name}" + ("{" + ",".join(parts) + "}" if parts else "")
+
+
+def _fmt(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def _render(state: dict) -> str:
+    by_name: dict[str, list[str]] = {}
+    for kind in ("hist", "counters", "gauges"):
+        for k in state[kind]:
+            by_name.setdefault(k.split("|", 1)[0], []).append(k)
+
+    lines: list[str] = []
+    for name in sorted(by_name):
+        mtype, help_text = _HELP.get(name, ("untyped", name))
+        lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {PREFIX}_{name} {mtype}")
+        for k in sorted(by_name[name]):
+            lbl = k.split("|", 1)[1]
+            if k in state["hist"]:
+                h = state["hist"][k]
+                for le, c in zip(STAGE_BUCKETS, h["buckets"]):
+                    le_label = f'le="{le}"'
+                    lines.append(f"{_series(name + '_bucket', lbl, le_label)} {c}")
+                inf_label = 'le="+Inf"'
+                lines.append(f"{_series(name + '_bucket', lbl, inf_label)} {h['count']}")
+                lines.append(f"{_series(name + '_sum', lbl)} {h['sum']:.6f}")
+                lines.append(f"{_series(name + '_count', lbl)} {h['count']}")
+            elif k in state["counters"]:
+                lines.append(f"{_series(name, lbl)} {_fmt(state['counters'][k])}")
+            else:
+                lines.append(f"{_series(name, lbl)} {_fmt(state['gauges'][k])}")
+    return "\n".join(lines) + "\n"
+
+
+def flush(success: bool | None) -> Path | None:
+    """
+    Chiude il run: aggiorna lo stato cumulativo e riscrive il .prom (atomico).
+
+    success=None: flush parziale di chi non e' un run della pipeline (es. la
+    sintesi TTS): porta nello stato contatori e gauge senza contare un run; le
+    durate degli stadi restano per il flush finale.
+
+    Farm e watcher lanciano piu' processi sullo stesso stato: load/merge/write
+    avviene sotto flock, altrimenti gli incrementi concorrenti si perdono.
+    """
+    import fcntl
+
+    global _run
+    if not enabled():
+        return None
+
+    if success is not None:
+        inc("runs_total", 1, {"status": "success" if success else "failure"})
+        set_gauge("last_run_timestamp_seconds", time.time())
+        set_gauge("last_run_success", 1.0 if success else 0.0)
+
+    path = textfile_path()
+    state_path = path.with_suffix(".state.json")
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    with _lock:
+        if success is None:
+            run = {"hist": {}, "counters": _run["counters"], "gauges": _run["gauges"]}
+            _run = {"hist": _run["hist"], "counters": {}, "gauges": {}}
+        else:
+            run, _run = _run, {"hist": {}, "counters": {}, "gauges": {}}
+
+    with path.with_suffix(".lock").open("w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        state = _load_state(state_path)
+        _merge(state, run)
+
+        tmp_state = state_path.with_name(f"{state_path.name}.{os.getpid()}.tmp")
+        tmp_state.write_text(json.dumps(state), encoding="utf-8")
+        os.replace(tmp_state, state_path)
+
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(_render(state), encoding="utf-8")
+        os.replace(tmp, path)
+    return path
@@ -0,0 +1,189 @@
+"""
+Validazione profonda del MP4 finale PRIMA di spendere banda per l'upload.
+
+Ordine pensato per scartare presto (e in fretta) i file rotti:
+1. scan dei box top-level (solo header, pochi read): ftyp in testa, moov e mdat
+   presenti, moov prima di mdat, nessun box che sfora la fine del file
+   (= render troncato)
+2. UNA chiamata ffprobe: stream video/audio con codec, risoluzione e durata attesi
+3. lettura parziale della coda: decodifica dell'ultimo GOP (-sseof), nessun errore
+
+moov prima di mdat e' quello che scrivono tutte le encode finali: +faststart
+(burn dei sottotitoli, split_render, quality, remux) oppure MP4 frammentato
+dell'upload in streaming (moov vuoto in testa, poi coppie moof/mdat).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import struct
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import supervise
+
+
+# -sseof seeks to the keyframe at or before EOF-TAIL_SECONDS, so the decode
+# always starts on a GOP boundary and covers the whole last GOP, however long.
+TAIL_SECONDS = 3.0
+# The final encodes don't set -g: x264's default keyint=250 is ~8.3 s at 30 fps
+# (10.4 s at 24), all of which may be decoded before reaching the tail.
+MAX_GOP_SECONDS = 250 / 24
+
+
+@dataclass
+class ValidationResult:
+    ok: bool
+    errors: list[str] = field(default_factory=list)
+    boxes: list[str] = field(default_factory=list)
+    duration: float = 0.0
+    width: int = 0
+    height: int = 0
+
+
+def scan_top_level_boxes(path: Path) -> tuple[list[tuple[str, int, int]], list[str]]:
+    """Ritorna ([(tipo, offset, size)], errori) leggendo solo gli header dei box."""
+    boxes: list[tuple[str, int, int]] = []
+    errors: list[str] = []
+    file_size = path.stat().st_size
+
+    with path.open("rb") as f:
+        off = 0
+        while off < file_size:
+            f.seek(off)
+            hdr = f.read(8)
+            if len(hdr) < 8:
+                errors.append(f"header di box troncato all'offset {off}")
+                break
+            size, btype = struct.unpack(">I4s", hdr)
+            name = btype.decode("latin-1")
+            if size == 1:
+                ext = f.read(8)
+                if len(ext) < 8:
+                    errors.append(f"largesize troncato nel box {name!r}")
+                    break
+                size = struct.unpack(">Q", ext)[0]
+            elif size == 0:
+                size = file_size - off
+            if size < 8:
+                errors.append(f"box {name!r} con size invalida ({size}) all'offset {off}")
+                break
+            if off + size > file_size:
+                errors.append(
+                    f"box {name!r} troncato: finisce a {off + size}, il file e' di {file_size} byte"
+                )
+                boxes.append((name, off, size))
+                break
+            boxes.append((name, off, size))
+            off += size
+
+    return boxes, errors
+
+
+def _check_structure(boxes: list[tuple[str, int, int]]) -> list[str]:
+    errors: list[str] = []
+    types = [b[0] for b in boxes]
+    if not types or types[0] != "ftyp":
+        errors.append("il file non inizia con 'ftyp' (non e' un MP4 valido)")
+    if "moov" not in types:
+        errors.append("box 'moov' mancante (render interrotto prima della chiusura)")
+    if "mdat" not in types:
+        errors.append("box 'mdat' mancante (nessun dato media)")
+    if "moov" in types and "mdat" in types and types.index("moov") > types.index("mdat"):
+        errors.append("'moov' dopo 'mdat': encode senza -movflags +faststart (ne' frammentato)")
+    return errors
+
+
+def _probe(path: Path) -> dict:
+    p = supervise.run(["ffprobe", "-v", "error", "-show_streams", "-show_format", "-of", "json", str(path)])
+    if p.returncode != 0:
+        raise RuntimeError(p.stderr.strip() or "ffprobe failed")
+    return json.loads(p.stdout or "{}")
+
+
+def _decode_tail(path: Path) -> str:
+    """Decodifica gli ultimi TAIL_SECONDS: stringa vuota se ok, altrimenti gli errori."""
+    p = supervise.run(
+        [
+            "ffmpeg", "-v", "error", "-xerror",
+            "-sseof", f"-{TAIL_SECONDS}",
+            "-i", str(path),
+            "-map", "0:v:0",
+            "-f", "null", "-",
+        ],
+        media_seconds=TAIL_SECONDS + MAX_GOP_SECONDS,
+    )
+    if p.returncode != 0:
+        return p.stderr.strip() or f"ffmpeg exit {p.returncode}"
+    return p.stderr.strip()
+
+
+def expected_size_from_env() -> tuple[int, int] | None:
+    """VALIDATE_SIZE=WxH (default 1080x1920); vuoto = non controllare la risoluzione."""
+    raw = (os.getenv("VALIDATE_SIZE", "1080x1920") or "").strip().lower()
+    if not raw or "x" not in raw:
+        return None
+    w, h = raw.split("x", 1)
+    return int(w), int(h)
+
+
+def validate_mp4(
+    path: Path,
+    expected_size: tuple[int, int] | None = None,
+    expected_duration: float | None = None,
+    duration_tolerance: float = 0.5,
+    video_codec: str = "h264",
+    audio_codec: str = "aac",
+    check_tail: bool = True,
+) -> ValidationResult:
+    path = Path(path)
+    res = ValidationResult(ok=False)
+
+    # 1) Container structure: pure header reads, rejects truncated files in ms.
+    boxes, errors = scan_top_level_boxes(path)
+    res.boxes = [b[0] for b in boxes]
+    errors += _check_structure(boxes)
+    if errors:
+        res.errors = errors
+        return res
+
+    # 2) Streams, in one probe.
+    try:
+        info = _probe(path)
+    except RuntimeError as e:
+        res.errors = [f"ffprobe: {e}"]
+        return res
+
+    streams = info.get("streams") or []
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+    res.duration = float((info.get("format") or {}).get("duration") or 0.0)
+
+    if video is None:
+        errors.append("nessuno stream video")
+    else:
+        res.width, res.height = int(video.get("width") or 0), int(video.get("height") or 0)
+        if video_codec and video.get("codec_name") != video_codec:
+            errors.append(f"codec video {video.get('codec_name')!r}, atteso {video_codec!r}")
+        if expected_size and (res.width, res.height) != tuple(expected_size):
+            errors.append(f"risoluzione {res.width}x{res.height}, attesa {expected_size[0]}x{expected_size[1]}")
+    if audio is None:
+        errors.append("nessuno stream audio")
+    elif audio_codec and audio.get("codec_name") != audio_codec:
+        errors.append(f"codec audio {audio.get('codec_name')!r}, atteso {audio_codec!r}")
+
+    if res.duration <= 0:
+        errors.append("durata nulla")
+    elif expected_duration is not None and abs(res.duration - expected_duration) > duration_tolerance:
+        errors.append(f"durata {res.duration:.2f}s, attesa {expected_duration:.2f}s (+/-{duration_tolerance}s)")
+
+    # 3) Last GOP decodes (partial read of the tail only).
+    if not errors and check_tail:
+        tail_err = _decode_tail(path)
+        if tail_err:
+            errors.append(f"decodifica dell'ultimo GOP fallita: {tail_err.splitlines()[-1]}")
+
+    res.errors = errors
+    res.ok = not errors
+    return res
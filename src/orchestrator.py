@@ -0,0 +1,110 @@
+"""
+Esecuzione concorrente degli stadi della pipeline (grafo di dipendenze su thread).
+
+Gli stadi sono funzioni con nome e dipendenze; ognuno parte appena le sue
+dipendenze sono finite, su un pool di thread (il lavoro pesante e' in processi
+ffmpeg, quindi il GIL non conta). Ogni stadio e' misurato con metrics.stage().
+
+Alla fine report() stampa la timeline e il percorso critico: la catena di
+stadi che ha davvero determinato la durata del run (risalendo dall'ultimo
+stadio, ad ogni passo la dipendenza finita per ultima), e quanto tempo e'
+stato nascosto dalla sovrapposizione.
+
+Se uno stadio fallisce non ne partono altri, i processi figli ancora vivi
+(es. il render del background) vengono uccisi e l'eccezione risale.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+import metrics
+import supervise
+
+
+@dataclass
+class Stage:
+    name: str
+    fn: Callable[[dict[str, Any]], Any]
+    deps: tuple[str, ...] = ()
+    start: float = 0.0
+    end: float = 0.0
+
+
+@dataclass
+class Graph:
+    stages: dict[str, Stage] = field(default_factory=dict)
+    t0: float = 0.0
+    t_end: float = 0.0
+
+    def add(self, name: str, fn: Callable[[dict[str, Any]], Any], deps: tuple[str, ...] = ()) -> None:
+        """fn riceve il dict dei risultati degli stadi gia' finiti."""
+        for d in deps:
+            if d not in self.stages:
+                raise ValueError(f"stadio {name!r}: dipendenza sconosciuta {d!r}")
+        self.stages[name] = Stage(name, fn, tuple(deps))
+
+    def _timed(self, stage: Stage, results: dict[str, Any]) -> Any:
+        stage.start = time.perf_counter()
+        try:
+            with metrics.stage(stage.name):
+                return stage.fn(results)
+        finally:
+            stage.end = time.perf_counter()
+
+    def run(self, max_workers: int = 4) -> dict[str, Any]:
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+        results: dict[str, Any] = {}
+        pending = dict(self.stages)
+        running: dict[Any, Stage] = {}
+        self.t0 = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="stage") as pool:
+            try:
+                while pending or running:
+                    for name, st in list(pending.items()):
+                        if len(running) >= max(1, max_workers):
+                            break
+                        if all(d in results for d in st.deps):
+                            del pending[name]
+                            # Shallow copy: a stage only reads what finished before it started.
+                            running[pool.submit(self._timed, st, dict(results))] = st
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        st = running.pop(fut)
+                        results[st.name] = fut.result()
+            except BaseException:
+                # Don't leave an ffmpeg rendering into a scratch dir that's about to go.
+                supervise.kill_all()
+                raise
+            finally:
+                self.t_end = time.perf_counter()
+        return results
+
+    def critical_path(self) -> list[Stage]:
+        done = [s for s in self.stages.values() if s.end > 0]
+        if not done:
+            return []
+        path = [max(done, key=lambda s: s.end)]
+        while path[-1].deps:
+            path.append(max((self.stages[d] for d in path[-1].deps), key=lambda s: s.end))
+        return list(reversed(path))
+
+    def report(self) -> dict[str, Any]:
+        wall = self.t_end - self.t0
+        busy = sum(s.end - s.start for s in self.stages.values())
+        path = self.critical_path()
+        for s in sorted(self.stages.values(), key=lambda s: s.start):
+            print(f"[Monday]   {s.name:12s} {s.start - self.t0:7.2f}s -> {s.end - self.t0:7.2f}s "
+                  f"({s.end - s.start:6.2f}s)")
+        print(f"[Monday] Percorso critico: {' -> '.join(s.name for s in path)} "
+              f"({wall:.2f}s; stadi in tutto {busy:.2f}s, {max(0.0, busy - wall):.2f}s nascosti)")
+        metrics.set_gauge("critical_path_seconds", wall)
+        return {
+            "wall_seconds": round(wall, 3),
+            "stage_seconds_total": round(busy, 3),
+            "critical_path": [s.name for s in path],
+        }
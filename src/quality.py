@@ -1,13 +1,48 @@
+"""
+Look "cinematic" dei background (scale/crop, eq, vignette, grana) e pipeline
+audio+background -> MP4 verticale.
+
+Per i background IMMAGINE la parte statica del look (scale, crop, eq, vignette)
+non cambia da un frame all'altro: viene calcolata una volta sola con
+Pillow/NumPy, salvata in cache (PNG, chiave = sha256 dell'immagine + parametri)
+e il filtergraph per frame si riduce a grana + conversione di formato. Il PNG
+si decodifica una volta sola e viene ripetuto dal filtro loop (non -loop 1,
+che lo rileggerebbe e decodificherebbe a ogni frame); confronto:
+python benchmarks/profile_filters.py --chains still
+
+Per i background VIDEO (loop con -stream_loop) la sorgente, spesso 4K, viene
+transcodificata una volta in un proxy gia' alla risoluzione/fps di uscita con
+il look statico applicato, in un profilo economico da decodificare (GOP corto,
+niente B-frame, yuv420p); i render successivi fanno il loop del proxy.
+
+Env:
+- QUALITY_CACHE_DIR (default build/cache/quality)
+- QUALITY_CACHE_MAX_MB (default 2048): oltre, si eliminano le voci usate meno di recente
+- QUALITY_PRECOMPUTE=0 / QUALITY_PROXY=0: filtergraph completo per immagini / video
+"""
+
 from __future__ import annotations
 
+import hashlib
+import math
+import os
 from pathlib import Path
-import subprocess
+
+import supervise
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+# Static look, shared by the filtergraph and the NumPy emulation below.
+EQ_CONTRAST = 1.18
+EQ_BRIGHTNESS = 0.03
+EQ_SATURATION = 1.20
+VIGNETTE_ANGLE = math.pi / 5  # vignette filter default
 
 
 def run_ffmpeg(cmd: list[str]) -> None:
     """Run ffmpeg and raise if it fails."""
     print("Eseguo ffmpeg:", " ".join(cmd))
-    completed = subprocess.run(cmd, check=False)
+    completed = supervise.run(cmd, capture=False)
     if completed.returncode != 0:
         raise RuntimeError(f"ffmpeg error (exit code {completed.returncode})")
 
@@ -16,6 +51,190 @@ def _is_video_file(p: Path) -> bool:
     return p.suffix.lower() in {".mp4", ".mov", ".mkv", ".webm", ".m4v", ".avi"}
 
 
+def static_filters(width: int = 1080, height: int = 1920) -> list[str]:
+    """La parte del look che non dipende dal tempo."""
+    return [
+        f"scale={width}:{height}:force_original_aspect_ratio=increase",
+        f"crop={width}:{height}",
+        f"eq=contrast={EQ_CONTRAST:.2f}:brightness={EQ_BRIGHTNESS:.2f}:saturation={EQ_SATURATION:.2f}",
+        "vignette",
+    ]
+
+
+def dynamic_filters(fps: int = 30) -> list[str]:
+    """La parte per frame: grana temporale e formato di uscita."""
+    return [
+        "noise=alls=10:allf=t+u",
+        f"fps={fps}",
+        "format=yuv420p",
+    ]
+
+
+def quality_filters(width: int = 1080, height: int = 1920, fps: int = 30) -> list[str]:
+    """Look "cinematic" del background, un filtro per voce (vedi apply_quality_pipeline)."""
+    return [*static_filters(width, height), *dynamic_filters(fps)]
+
+
+# A still image is decoded once and repeated by the loop filter; `-loop 1` on
+# the input would decode the (1080x1920) PNG again for every output frame.
+STILL_LOOP = "loop=loop=-1:size=1"
+
+
+def still_filters(width: int = 1080, height: int = 1920, fps: int = 30, precomputed: bool = False) -> list[str]:
+    """Catena per un'immagine fissa: look statico (se non precalcolato) una volta, poi loop e parte per frame."""
+    if precomputed:
+        # RGB PNG: noise goes on the same planar YUV frames as before
+        return ["format=yuv420p", STILL_LOOP, *dynamic_filters(fps)]
+    return [*static_filters(width, height), STILL_LOOP, *dynamic_filters(fps)]
+
+
+def _precompute_enabled() -> bool:
+    return (os.getenv("QUALITY_PRECOMPUTE", "1") or "1").strip() != "0"
+
+
+def _proxy_enabled() -> bool:
+    return (os.getenv("QUALITY_PROXY", "1") or "1").strip() != "0"
+
+
+def _cache_dir() -> Path:
+    d = Path(os.getenv("QUALITY_CACHE_DIR") or (ROOT_DIR / "build" / "cache" / "quality"))
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+
+def _cache_key(src: Path, params: str) -> str:
+    """sha256 del contenuto della sorgente + parametri che determinano l'output."""
+    h = hashlib.sha256()
+    with Path(src).open("rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    h.update(f"|{params}".encode("utf-8"))
+    return h.hexdigest()[:32]
+
+
+def _cache_hit(path: Path) -> bool:
+    if path.exists() and path.stat().st_size > 0:
+        os.utime(path)  # mtime = last use, for pruning
+        return True
+    return False
+
+
+def _prune_cache(keep: Path) -> None:
+    """Elimina le voci usate meno di recente finche' la cache sta in QUALITY_CACHE_MAX_MB."""
+    limit = float(os.getenv("QUALITY_CACHE_MAX_MB", "2048") or "2048") * 1024 * 1024
+    entries = []
+    for p in keep.parent.iterdir():
+        if p.is_file() and not p.name.startswith("."):
+            st = p.stat()
+            entries.append((st.st_mtime, st.st_size, p))
+    total = sum(e[1] for e in entries)
+    for _mtime, size, p in sorted(entries):
+        if total <= limit:
+            break
+        if p == keep:
+            continue
+        p.unlink(missing_ok=True)
+        total -= size
+
+
+def _static_look(src: Path, width: int, height: int):
+    """
+    static_filters() applicati all'immagine in-process (Pillow + NumPy):
+    - scale "increase" + crop centrato (stesse dimensioni intermedie di ffmpeg)
+    - eq in YCbCr: luma contrast*(v-0.5)+0.5+brightness, chroma scalata di saturation
+    - vignette: fattore cos(angle * d/dmax)^4 sulla luma e sulla chroma attorno a 127
+    """
+    import numpy as np
+    from PIL import Image
+
+    with Image.open(src) as im:
+        img = im.convert("RGB")
+    iw, ih = img.size
+    sw = max(width, round(height * iw / ih))
+    sh = max(height, round(width * ih / iw))
+    img = img.resize((sw, sh), Image.BICUBIC)
+    # crop centers, aligned to the 4:2:0 chroma grid like ffmpeg's crop
+    x = ((sw - width) // 2) & ~1
+    y = ((sh - height) // 2) & ~1
+    img = img.crop((x, y, x + width, y + height))
+
+    ycc = np.asarray(img.convert("YCbCr"), dtype=np.float32)
+    luma = np.clip((EQ_CONTRAST * (ycc[..., 0] / 255.0 - 0.5) + 0.5 + EQ_BRIGHTNESS) * 256.0, 0, 255)
+    chroma = (ycc[..., 1:] - 128.0) * EQ_SATURATION + 128.0
+
+    yy, xx = np.ogrid[0:height, 0:width]
+    d = np.hypot(xx - width / 2, yy - height / 2) / math.hypot(width / 2, height / 2)
+    factor = (np.cos(VIGNETTE_ANGLE * np.minimum(d, 1.0)) ** 4).astype(np.float32)
+    luma = luma * factor
+    chroma = (chroma - 127.0) * factor[..., None] + 127.0
+
+    out = np.clip(np.dstack([luma, chroma]) + 0.5, 0, 255).astype(np.uint8)
+    return Image.fromarray(out, "YCbCr").convert("RGB")
+
+
+def precomputed_background(image: Path, width: int = 1080, height: int = 1920) -> Path:
+    """PNG con il look statico gia' applicato, dalla cache se c'e' (chiave: contenuto + parametri)."""
+    key = _cache_key(image, f"{width}x{height}|{','.join(static_filters(width, height))}")
+    cached = _cache_dir() / f"{key}.png"
+    if _cache_hit(cached):
+        print(f"[Monday] Look statico dalla cache: {cached}")
+        return cached
+
+    tmp = cached.with_name(f".{cached.stem}.{os.getpid()}.tmp.png")
+    _static_look(Path(image), width, height).save(tmp, compress_level=1)
+    os.replace(tmp, cached)
+    _prune_cache(cached)
+    print(f"[Monday] Look statico calcolato una volta: {cached}")
+    return cached
+
+
+def proxy_background(
+    video: Path,
+    width: int = 1080,
+    height: int = 1920,
+    fps: int = 30,
+    max_seconds: float | None = None,
+) -> Path:
+    """
+    Proxy del background video: risoluzione e fps di uscita, look statico gia'
+    applicato, GOP di 1 s senza B-frame (decodifica economica nel loop).
+    max_seconds: i render non usano oltre questa durata della sorgente.
+    """
+    vf = [*static_filters(width, height), f"fps={fps}", "format=yuv420p"]
+    key = _cache_key(video, f"{','.join(vf)}|t={max_seconds}|proxy1")
+    cached = _cache_dir() / f"proxy_{key}.mp4"
+    if _cache_hit(cached):
+        print(f"[Monday] Proxy del background dalla cache: {cached}")
+        return cached
+
+    tmp = cached.with_name(f".{cached.stem}.{os.getpid()}.tmp.mp4")
+    cap = ["-t", str(max_seconds)] if max_seconds else []
+    try:
+        run_ffmpeg([
+            "ffmpeg", "-y",
+            *cap,
+            "-i", str(video),
+            "-an", "-sn",
+            "-vf", ",".join(vf),
+            "-c:v", "libx264",
+            "-preset", "veryfast",
+            "-tune", "fastdecode",
+            # Intermediate: keep it close to lossless, the final encode is lossy anyway
+            "-crf", "14",
+            "-g", str(fps),
+            "-bf", "0",
+            "-pix_fmt", "yuv420p",
+            "-movflags", "+faststart",
+            str(tmp),
+        ])
+        os.replace(tmp, cached)
+    finally:
+        tmp.unlink(missing_ok=True)
+    _prune_cache(cached)
+    print(f"[Monday] Proxy del background creato: {cached}")
+    return cached
+
+
 def apply_quality_pipeline(
     raw_audio: Path,
     background_path: Path,
@@ -24,14 +243,16 @@ def apply_quality_pipeline(
     width: int = 1080,
     height: int = 1920,
     fps: int = 30,
+    work_dir: Path | None = None,
 ) -> None:
     """
     Pipeline robusta per Shorts verticali 9:16:
 
     1) Taglia/normalizza audio a max `duration_limit` secondi (WAV 48k mono).
        Evita "in-place edit": se input e output coincidono, usa un nome alternativo.
+       Con `work_dir` (es. scratch.work_dir()) il WAV intermedio va li', non accanto al video.
     2) Crea MP4 verticale 1080x1920 con background:
-       - se background_path è IMMAGINE: loop immagine
+       - se background_path è IMMAGINE: decodificata una volta, ripetuta dal filtro loop
        - se background_path è VIDEO: loop video (stream_loop)
        Look "cinematic": crop/scale corretto + vignette + grain + eq.
     """
@@ -50,6 +271,9 @@ def apply_quality_pipeline(
     # 1) Trim + normalize audio into WAV 48k mono
     # Default output name near final_video
     trimmed_audio = final_video.with_name("audio_trimmed.wav")
+    if work_dir is not None:
+        Path(work_dir).mkdir(parents=True, exist_ok=True)
+        trimmed_audio = Path(work_dir) / "audio_trimmed.wav"
 
     # If raw_audio is already audio_trimmed.wav in the same folder -> avoid in-place
     try:
@@ -73,15 +297,22 @@ def apply_quality_pipeline(
     run_ffmpeg(cmd_trim)
 
     # 2) Build cinematic background -> final vertical mp4
-    vf = (
-        f"scale={width}:{height}:force_original_aspect_ratio=increase,"
-        f"crop={width}:{height},"
-        f"eq=contrast=1.18:brightness=0.03:saturation=1.20,"
-        f"vignette,"
-        f"noise=alls=10:allf=t+u,"
-        f"fps={fps},"
-        f"format=yuv420p"
-    )
+    vf = ",".join(quality_filters(width, height, fps))
+    if not _is_video_file(background_path):
+        vf = ",".join(still_filters(width, height, fps))
+
+    if _is_video_file(background_path) and _proxy_enabled():
+        try:
+            background_path = proxy_background(background_path, width, height, fps, max_seconds=duration_limit)
+            vf = ",".join(dynamic_filters(fps))
+        except Exception as e:
+            print(f"[Monday] Proxy del background non riuscito, uso la sorgente: {e}")
+    elif not _is_video_file(background_path) and _precompute_enabled():
+        try:
+            background_path = precomputed_background(background_path, width, height)
+            vf = ",".join(still_filters(width, height, fps, precomputed=True))
+        except Exception as e:
+            print(f"[Monday] Precalcolo del look non riuscito, filtergraph completo: {e}")
 
     if _is_video_file(background_path):
         cmd_video = [
@@ -106,8 +337,7 @@ def apply_quality_pipeline(
         cmd_video = [
             "ffmpeg",
             "-y",
-            "-loop", "1",
-            "-i", str(background_path),
+            "-i", str(background_path),  # decoded once, repeated by STILL_LOOP
             "-i", str(trimmed_audio),
             "-vf", vf,
             "-c:v", "libx264",
@@ -0,0 +1,64 @@
+"""
+Replay deterministico: un solo seed radice da cui derivano tutte le scelte casuali.
+
+Senza seed (default) ogni run resta unico come prima. Con RUN_SEED (o
+`python src/main.py --seed N`) background (colore, hue, grana), suffisso del
+titolo e id del run sono derivati dal seed radice: input identici danno
+intermedi identici byte per byte, e i run si possono confrontare (o servire da
+cache) a parita' di lavoro. Lo script non e' generato dalla pipeline ma e' un
+input (subtitles.txt): il manifest ne registra lo sha256, non un seed.
+
+I sotto-seed sono sha256("<radice>:<nome>"): aggiungerne uno nuovo non sposta
+quelli esistenti.
+
+Il manifest del run (run_manifest.json accanto al video finale) registra seed,
+sotto-seed, profilo, durate degli stadi e sha256 di input e output.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+MANIFEST_NAME = "run_manifest.json"
+
+
+def root_seed_from_env() -> int | None:
+    """RUN_SEED: intero, o qualsiasi stringa (hashata). Vuoto = run non deterministico."""
+    raw = (os.getenv("RUN_SEED") or "").strip()
+    if not raw:
+        return None
+    try:
+        return int(raw)
+    except ValueError:
+        return derive(0, raw)
+
+
+def derive(root: int, name: str) -> int:
+    """Sotto-seed stabile (63 bit) per una scelta casuale con nome."""
+    digest = hashlib.sha256(f"{root}:{name}".encode("utf-8")).hexdigest()
+    return int(digest[:16], 16) >> 1
+
+
+def run_id(root: int | None) -> str:
+    if root is None:
+        return time.strftime("%Y%m%dT%H%M%S", time.gmtime()) + f"_{os.getpid()}"
+    return f"seed{derive(root, 'run_id'):016x}"[:20]
+
+
+def sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with Path(path).open("rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def write_manifest(path: Path, data: dict) -> Path:
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(json.dumps(data, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, path)
+    return path
@@ -0,0 +1,117 @@
+"""
+Workspace di scratch per gli intermedi della pipeline.
+
+bg_{seed}.mp4, video_base.mp4, frasi MP3, voice_extracted.wav, audio_trimmed.wav...
+vengono scritti e riletti a ogni run: su tmpfs (/dev/shm) costano solo RAM.
+Solo gli artefatti finali vengono "promossi" su storage persistente (rename atomico).
+
+Env:
+- SCRATCH_DIR: root esplicita (vince su tutto)
+- SCRATCH_MIN_FREE_MB (default 2048): spazio/RAM minimi per usare /dev/shm
+- KEEP_SCRATCH=1: non cancellare la work dir a fine run (debug)
+"""
+
+from __future__ import annotations
+
+import errno
+import os
+import shutil
+from pathlib import Path
+
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+BUILD_DIR = ROOT_DIR / "build"
+SHM_DIR = Path("/dev/shm")
+
+_work_dir: Path | None = None
+
+
+def _mem_available_bytes() -> int:
+    try:
+        with open("/proc/meminfo", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def scratch_root() -> Path:
+    """/dev/shm se c'e' abbastanza spazio e RAM libera, altrimenti build/."""
+    explicit = (os.getenv("SCRATCH_DIR") or "").strip()
+    if explicit:
+        return Path(explicit)
+
+    need = int(os.getenv("SCRATCH_MIN_FREE_MB", "2048") or "2048") * 1024 * 1024
+    if SHM_DIR.is_dir() and os.access(SHM_DIR, os.W_OK):
+        try:
+            free = shutil.disk_usage(SHM_DIR).free
+        except OSError:
+            free = 0
+        if free >= need and _mem_available_bytes() >= need:
+            return SHM_DIR
+
+    return BUILD_DIR
+
+
+def work_dir() -> Path:
+    """Work dir di questo run (una per processo: run concorrenti non si pestano i piedi)."""
+    global _work_dir
+    if _work_dir is None:
+        _work_dir = scratch_root() / f"deadpan_{os.getpid()}"
+        _work_dir.mkdir(parents=True, exist_ok=True)
+        print(f"[Monday] Scratch: {_work_dir}")
+    return _work_dir
+
+
+def cleanup() -> None:
+    global _work_dir
+    if _work_dir is None:
+        return
+    if (os.getenv("KEEP_SCRATCH", "0") or "0").strip() != "1":
+        shutil.rmtree(_work_dir, ignore_errors=True)
+    _work_dir = None
+
+
+def _fsync_dir(path: Path) -> None:
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def promote(src: Path, dst: Path) -> Path:
+    """
+    Sposta un artefatto finale su storage persistente, in modo atomico:
+    - stesso filesystem: os.replace
+    - tmpfs -> disco: copia su file temporaneo accanto a dst, fsync, os.replace
+    Chi legge dst vede sempre o il file vecchio o quello nuovo, mai uno a meta'.
+    """
+    src = Path(src)
+    dst = Path(dst)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+
+    try:
+        os.replace(src, dst)
+        return dst
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+
+    tmp = dst.with_name(f".{dst.name}.tmp")
+    try:
+        with src.open("rb") as fin, tmp.open("wb") as fout:
+            shutil.copyfileobj(fin, fout, length=4 * 1024 * 1024)
+            fout.flush()
+            os.fsync(fout.fileno())
+        os.replace(tmp, dst)
+    finally:
+        tmp.unlink(missing_ok=True)
+    _fsync_dir(dst.parent)
+    src.unlink(missing_ok=True)
+    return dst
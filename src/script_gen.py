@@ -0,0 +1,336 @@
+"""
+Generazione procedurale degli script Deadpan Files (testo, titolo, descrizione, tag).
+
+Modulo separato da uploader.py: non importa nulla dei client Google, cosi' i run
+che generano solo lo script (o solo il render) restano leggeri.
+"""
+
+from __future__ import annotations
+
+
+# ---------------------------------------------------------------------------
+# GENERAZIONE TESTO (SCRIPT) DEADPAN FILES â€” "VITA NATURAL DURANTE"
+# ---------------------------------------------------------------------------
+
+
+def generate_script(seed: int | None = None):
+    """
+    Obiettivo: storie SEMPRE diverse, senza intervento umano:
+    - spazio combinatorio enorme (procedurale)
+    - 12+ strutture diverse (non template fisso)
+    - dettagli variabili (nomi, luoghi, prove, contraddizioni, conseguenze)
+    - output breve e ritmato (TTS + sottotitoli)
+
+    seed: con un seed esplicito lo script e' riproducibile; senza, seed unico
+    per run come sempre.
+    """
+    import hashlib
+    import os
+    import random
+    import textwrap
+    from datetime import datetime, timezone
+
+    if seed is None:
+        # Seed unico per ogni run (time + entropy). Non dipende dalla memoria tra run.
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+        entropy = os.urandom(16).hex()
+        seed_material = f"{stamp}-{entropy}-{os.getpid()}"
+        seed = int(hashlib.sha256(seed_material.encode("utf-8")).hexdigest()[:16], 16)
+    rng = random.Random(seed)
+
+    # ----------------------------
+    # VOCABOLARI (procedurali)
+    # ----------------------------
+    agencies = [
+        "Records Division", "Missing Persons Unit", "Evidence Control", "Night Dispatch",
+        "County Forensics", "Transit Police", "Hospital Security", "Incident Review Board",
+        "Cold Case Taskforce", "Internal Affairs", "Property & Storage", "Audio Lab"
+    ]
+
+    place_types = [
+        "motel", "train station", "hospital wing", "parking garage", "storage unit",
+        "public library", "paper mill", "cinema", "subway platform", "riverside trail",
+        "weather station", "county archive", "old courthouse", "service tunnel"
+    ]
+    place_adjs = [
+        "shuttered", "abandoned", "flooded", "sealed", "renovated", "quiet", "condemned",
+        "temporary", "off-limits", "unfinished", "unmarked", "windowless", "underground"
+    ]
+    neighborhoods = [
+        "north side", "east district", "old town", "industrial strip", "coastal road",
+        "rural outskirts", "downtown grid", "hillside blocks", "harbor line", "factory row"
+    ]
+
+    evidence_items = [
+        "cassette tape", "burned CD", "memory card", "disposable camera", "keycard",
+        "voicemail transcript", "radio log", "lab report", "polaroid", "door access record",
+        "evidence bag", "handwritten note", "pager", "receipt", "security export"
+    ]
+    evidence_verbs = [
+        "was tagged", "was sealed", "was logged", "was duplicated", "was misfiled",
+        "was re-labeled", "was re-sealed", "was transferred", "was archived", "was destroyed"
+    ]
+
+    anomalies = [
+        "a shadow with no source", "a timestamp that goes backwards", "breathing behind the mic",
+        "footsteps approaching the recorder", "a second voice that never speaks again",
+        "a reflection that shows another room", "a door that opens on a closed corridor",
+        "a name that shouldnâ€™t exist", "a camera angle from impossible distance",
+        "a fingerprint set that matches itself", "a file created tomorrow", "a call from a dead number"
+    ]
+
+    contradictions = [
+        "the report says one thing, the evidence says another",
+        "the timeline breaks in one place",
+        "every witness agreesâ€”on the wrong detail",
+        "the photo doesnâ€™t match the room",
+        "the audio contains no voices, only proximity",
+        "the access log shows entry, the camera shows nobody",
+        "the signature belongs to someone not on payroll",
+        "the file hash matches an older case, perfectly",
+        "the printout is dated next week",
+        "the metadata lists a device that was never manufactured"
+    ]
+
+    consequences = [
+        "the officer requested a transfer at sunrise",
+        "the guard quit without notice",
+        "the family received letters addressed to the missing person",
+        "the evidence room was re-locked and re-numbered",
+        "the entire shift was reassigned",
+        "the archive clerk stopped coming to work",
+        "the station closed early, once, and never explained why",
+        "the case number was sealed againâ€”under a new label",
+        "the tape was returned with fresh fingerprints",
+        "the report vanished from the system overnight"
+    ]
+
+    tones = [
+        "clinical", "confessional", "dispatch", "memo", "transcript", "casefile",
+        "foundfootage", "forensics", "redacted", "afteraction", "catalog", "witness"
+    ]
+
+    ctas = [
+        "Follow Deadpan Files. Another box is waiting.",
+        "Follow Deadpan Files. The next file has your city in it.",
+        "Follow Deadpan Files. This wasnâ€™t the last recording.",
+        "Follow Deadpan Files. The next case starts with a name youâ€™ll recognize.",
+        "Follow Deadpan Files. Weâ€™re opening the next drawer tonight.",
+        "Follow Deadpan Files for more archived horror."
+    ]
+
+    # nomi procedurali (combinazione enorme)
+    first_names = [
+        "Evan", "Noah", "Mason", "Liam", "Caleb", "Lucas", "Aiden", "Owen", "Miles", "Nate",
+        "Hannah", "Maya", "Ava", "Nina", "Claire", "Elena", "Lena", "Sofia", "Iris", "June"
+    ]
+    last_names = [
+        "Harper", "Caldwell", "Reyes", "Bennett", "Hughes", "Moreno", "Sullivan", "Park",
+        "Fletcher", "Sinclair", "Rowe", "Keller", "Vaughn", "Pierce", "Donovan", "Hale"
+    ]
+
+    def pick(pool: list[str]) -> str:
+        return rng.choice(pool)
+
+    def make_case_code() -> str:
+        return f"{rng.randint(1, 99):02d}-{rng.randint(1, 28):02d}-{rng.randint(10, 99)}"
+
+    def make_year() -> int:
+        return rng.choice([1987, 1991, 1994, 1998, 2001, 2006, 2011, 2016, 2019, 2021])
+
+    def make_time() -> str:
+        return f"{rng.randint(0, 4):02d}:{rng.choice([13, 17, 22, 31, 44, 58]):02d}"
+
+    def make_place() -> str:
+        return f"a {pick(place_adjs)} {pick(place_types)} on the {pick(neighborhoods)}"
+
+    def make_person() -> str:
+        return f"{pick(first_names)} {pick(last_names)}"
+
+    def tighten(s: str, max_len: int = 140) -> str:
+        s = " ".join(s.replace("â€”", ". ").replace("â€¦", "...").split())
+        if len(s) <= max_len:
+            return s
+        return textwrap.shorten(s, width=max_len, placeholder="...")
+
+    # ----------------------------
+    # COSTRUZIONE â€œFATTIâ€
+    # ----------------------------
+    agency = pick(agencies)
+    case_code = make_case_code()
+    year = make_year()
+    t = make_time()
+    place = make_place()
+    item = pick(evidence_items)
+    anomaly = pick(anomalies)
+    contradiction = pick(contradictions)
+    consequence = pick(consequences)
+    person = make_person()
+
+    # Hook: 2 frasi, sempre variabili
+    hook_patterns = [
+        "Case file {code} was sealed in {year}. It still keeps changing.",
+        "They archived {code} under {agency}. The metadata rewrote itself.",
+        "The call log says {t}. The recording begins before we answered.",
+        "We found a {item} in {place}. It was already labeled with our case number.",
+        "The report lists {person} as a witness. {person} died in {year}.",
+        "Footage from {place} is cleanâ€”until the last ten seconds."
+    ]
+    hook = tighten(pick(hook_patterns).format(
+        code=case_code, year=year, agency=agency, t=t, item=item, place=place, person=person
+    ), 170)
+
+    # â€œEvidence beatâ€ e â€œEscalation beatâ€
+    evidence_patterns = [
+        "The {item} {verb} and stored under {agency}. Then it moved shelves by itself.",
+        "Every frame shows {anomaly}. The room has no object that could cast it.",
+        "The access log shows a keycard swipe at {t}. The camera shows nobody entering.",
+        "The audio contains only {anomaly}. No words. No voices. Just proximity.",
+        "The phone placed seven calls after the official time of death. Same number. Same ring."
+    ]
+    evidence = tighten(pick(evidence_patterns).format(
+        item=item, verb=pick(evidence_verbs), agency=agency, anomaly=anomaly, t=t
+    ), 190)
+
+    escalation_patterns = [
+        "We checked again. {contradiction}.",
+        "Forensics flagged the file. {contradiction}.",
+        "When we enhanced the audio, the noise shaped into a second rhythm.",
+        "The timeline doesnâ€™t drift. It snaps.",
+        "The case appears in another archiveâ€”same hash, different year.",
+    ]
+    escalation = tighten(pick(escalation_patterns).format(contradiction=contradiction), 170)
+
+    # Twist + ending
+    twist_patterns = [
+        "Then the evidence did something it canâ€™t do: it addressed us by name.",
+        "The last frame shows the victim looking into the lensâ€”filmed from behind.",
+        "The whisper wasnâ€™t a word. It was a dateâ€”tomorrow.",
+        "The calls werenâ€™t from the victim. They were from the evidence room.",
+        "The signature belongs to an officer who never existed on payroll.",
+        "The fileâ€™s creation date is tomorrow. We verified the server clock.",
+    ]
+    twist = tighten(pick(twist_patterns), 170)
+
+    end_patterns = [
+        "At sunrise, {consequence}.",
+        "By morning, {consequence}.",
+        "After we logged it, {consequence}.",
+        "We sealed the drawer again. Two days later, the label changed.",
+        "We requested the original export. What we received was shorterâ€”missing one second."
+    ]
+    ending = tighten(pick(end_patterns).format(consequence=consequence), 190)
+
+    cta = pick(ctas)
+
+    # ----------------------------
+    # 12 STRUTTURE DIVERSE
+    # ----------------------------
+    formats = []
+
+    formats.append(f"{hook} {evidence} {escalation} {twist} {ending} {cta}")
+
+    formats.append(
+        f"Night dispatch log â€” {agency}. {hook} "
+        f"Unit reports activity at {place}. {evidence} {twist} {ending} {cta}"
+    )
+
+    formats.append(
+        f"Transcript excerpt â€” case {case_code}. {hook} "
+        f"{evidence} {escalation} {twist} {cta}"
+    )
+
+    formats.append(
+        f"Archived memo from {agency}. Subject: {place}. "
+        f"{hook} {evidence} {ending} {cta}"
+    )
+
+    formats.append(
+        f"Found footage note. Seized item: {item}. Location: {place}. "
+        f"{hook} {evidence} {twist} {cta}"
+    )
+
+    formats.append(
+        f"Evidence catalog entry {case_code}. {item} â€” status: sealed. "
+        f"{hook} {escalation} {twist} {ending} {cta}"
+    )
+
+    formats.append(
+        f"Witness statement: {person}. {hook} "
+        f"{evidence} {twist} {ending} {cta}"
+    )
+
+    formats.append(
+        f"Forensics addendum. {hook} "
+        f"Anomaly observed: {anomaly}. {escalation} {twist} {cta}"
+    )
+
+    formats.append(
+        f"Redacted report. {hook} "
+        f"{evidence} [REDACTED]. {twist} {ending} {cta}"
+    )
+
+    formats.append(
+        f"After-action summary. {hook} "
+        f"{escalation} Outcome: {ending} {cta}"
+    )
+
+    formats.append(
+        f"Audio lab note. {hook} "
+        f"Source artifact: {item}. {evidence} {twist} {cta}"
+    )
+
+    formats.append(
+        f"Cold case brief. {hook} "
+        f"Primary contradiction: {contradiction}. {twist} {ending} {cta}"
+    )
+
+    # Scegli formato e â€œripulisciâ€ per TTS
+    script = pick(formats)
+    script = " ".join(script.replace("â€”", ". ").replace("â€¦", "...").split()).strip()
+
+    # ----------------------------
+    # TITOLI: tantissimi pattern + variabili
+    # ----------------------------
+    title_patterns = [
+        "The {item} That Rewrote The Case",
+        "The Case File That Kept Changing",
+        "The Footage From {place_type}",
+        "The Call From A Dead Number",
+        "The Evidence Room Incident",
+        "The Transcript With One Missing Second",
+        "The Night Dispatch Log They Wonâ€™t Explain",
+        "The Timestamp That Went Backwards",
+        "The Report Signed By Nobody",
+        "The Tape That Knew Tomorrow"
+    ]
+    title = pick(title_patterns).format(
+        item=item.title(),
+        place_type=pick(place_types).title(),
+    )
+    title = tighten(title, 88)
+
+    # Descrizione: breve, â€œserialeâ€, monetizzabile
+    description = "\n".join([
+        hook,
+        evidence,
+        twist,
+        "",
+        "Deadpan Files â€” short true crime / horror case files.",
+        "New files drop automatically. Follow for the next report."
+    ])
+
+    # Tags: variabili, ma pulite
+    base_tags = [
+        "deadpan files", "true crime", "horror story", "mystery", "unexplained", "shorts",
+        "case file", "found footage", "evidence", "dispatch log", "creepy", "archived"
+    ]
+    # aggiungi 2-3 tag dinamici (sempre diversi)
+    dynamic_tags = [
+        item.lower(),
+        pick(place_types),
+        pick(["cctv", "voicemail", "audio tape", "cold case", "case report", "evidence room"]),
+    ]
+    tags = list(dict.fromkeys(base_tags + dynamic_tags))[:20]
+
+    return script, title, description, tags
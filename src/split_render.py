@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import math
+import os
+import shlex
+from dataclasses import dataclass
+from pathlib import Path
+
+import backgrounds
+import encode_profiles
+import streaming
+import subtitles
+import supervise
+
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+BUILD_DIR = ROOT_DIR / "build"
+
+# Closed 2 s GOPs: every segment boundary falls on an IDR frame, so the segments
+# can be joined with `concat -c copy` without re-encoding and without seams.
+GOP_SECONDS = 2
+
+
+def _run(cmd: list[str], media_seconds: float | None = None) -> str:
+    p = supervise.run(cmd, media_seconds=media_seconds)
+    if p.returncode != 0:
+        raise RuntimeError(
+            "FFmpeg failed:\n"
+            f"CMD: {' '.join(shlex.quote(c) for c in cmd)}\n"
+            f"STDOUT:\n{p.stdout}\n"
+            f"STDERR:\n{p.stderr}\n"
+        )
+    return p.stdout.strip()
+
+
+@dataclass
+class Segment:
+    idx: int
+    start_frame: int
+    frames: int
+
+
+def split_segments_from_env() -> int:
+    """
+    SPLIT_ENCODE:
+    - "" / "0" / "1": off (single process, as before)
+    - "auto": one segment every 4 cores (x264 already threads well up to ~4)
+    - N: N segments
+    """
+    raw = (os.getenv("SPLIT_ENCODE", "0") or "0").strip().lower()
+    if raw == "auto":
+        return max(1, (os.cpu_count() or 1) // 4)
+    try:
+        return max(1, int(raw))
+    except ValueError:
+        return 1
+
+
+def plan_segments(duration_s: float, fps: int, n: int) -> list[Segment]:
+    """Cut the timeline into at most n pieces, each a whole number of GOPs."""
+    total = int(math.ceil(duration_s * fps))
+    gop = GOP_SECONDS * fps
+    gops = max(1, int(math.ceil(total / gop)))
+    per_seg = int(math.ceil(gops / max(1, n))) * gop
+
+    segs: list[Segment] = []
+    start = 0
+    while start < total:
+        frames = min(per_seg, total - start)
+        segs.append(Segment(idx=len(segs), start_frame=start, frames=frames))
+        start += frames
+    return segs
+
+
+def _render_segment(
+    seg: Segment,
+    seed: int,
+    subtitles_ass: Path,
+    work_dir: Path,
+    width: int,
+    height: int,
+    fps: int,
+    threads: int,
+    profile: encode_profiles.EncodeProfile,
+) -> Path:
+    """
+    Background + subtitle burn for one GOP-aligned slice, in a single ffmpeg process.
+
+    The procedural motion is shifted by the segment's first frame number, and the
+    subtitles see the global timeline via setpts (+t0 before libass, back to 0 after).
+    """
+    out = work_dir / f"seg_{seg.idx:03d}.mp4"
+    t0 = seg.start_frame / fps
+    gop = GOP_SECONDS * fps
+
+    vf = (
+        backgrounds.procedural_background_vf(
+            seed, width, height, fps, frame_offset=seg.start_frame, grain=profile.grain
+        )
+        + f",setpts=PTS+{t0:.6f}/TB,"
+        + subtitles.subtitles_filter(subtitles_ass)
+        + ",setpts=PTS-STARTPTS"
+    )
+
+    encode_profiles.encode(
+        # Each segment is 1/N of the run: its own length for deadline and speed.
+        lambda cmd: _run(cmd, media_seconds=seg.frames / fps),
+        head=[
+            "ffmpeg", "-y",
+            "-f", "lavfi",
+            "-i", backgrounds.procedural_background_source(seed, seg.frames / fps, width, height, fps),
+            "-vf", vf,
+            "-frames:v", str(seg.frames),
+            "-g", str(gop),
+            "-keyint_min", str(gop),
+            "-sc_threshold", "0",
+            "-threads", str(threads),
+        ],
+        tail=["-an"],
+        out_path=out,
+        profile=profile,
+    )
+    return out
+
+
+def render_final_split(
+    seed: int,
+    audio_path: Path,
+    subtitles_ass: Path,
+    duration_s: float,
+    out_path: Path,
+    segments: int,
+    width: int = 1080,
+    height: int = 1920,
+    fps: int = 30,
+    work_dir: Path | None = None,
+    audio_producer: list[str] | None = None,
+    profile: encode_profiles.EncodeProfile | None = None,
+) -> Path:
+    """
+    Split-encode del render finale:
+    N segmenti allineati ai GOP renderizzati in parallelo (background + sottotitoli),
+    poi concat -c copy + mux audio AAC una sola volta (niente gap AAC tra segmenti).
+    Con `audio_producer` l'audio arriva in pipe (streaming.py) invece che da audio_path.
+    """
+    work_dir = (work_dir or BUILD_DIR) / f"split_{seed}"
+    work_dir.mkdir(parents=True, exist_ok=True)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    profile = profile or encode_profiles.get_profile()
+    plan = plan_segments(duration_s, fps, segments)
+    threads = max(1, (os.cpu_count() or 1) // len(plan))
+    print(f"[Monday] Split encode: {len(plan)} segmenti x {threads} thread")
+
+    with ThreadPoolExecutor(max_workers=len(plan)) as pool:
+        parts = list(pool.map(
+            lambda s: _render_segment(s, seed, subtitles_ass, work_dir, width, height, fps, threads, profile),
+            plan,
+        ))
+
+    concat_list = work_dir / "concat.txt"
+    concat_list.write_text("".join(f"file '{p.as_posix()}'\n" for p in parts), encoding="utf-8")
+
+    audio_input = streaming.audio_consumer_input() if audio_producer else ["-i", str(audio_path)]
+    cmd = [
+        "ffmpeg", "-y",
+        "-f", "concat", "-safe", "0",
+        "-i", str(concat_list),
+        *audio_input,
+        "-map", "0:v:0",
+        "-map", "1:a:0",
+        "-c:v", "copy",
+        "-c:a", "aac",
+        "-b:a", "128k",
+        "-shortest",
+        "-movflags", "+faststart",
+        str(out_path),
+    ]
+    if audio_producer:
+        streaming.run_piped(audio_producer, cmd)
+    else:
+        _run(cmd)
+
+    for p in parts + [concat_list]:
+        try:
+            p.unlink()
+        except FileNotFoundError:
+            pass
+    try:
+        work_dir.rmdir()
+    except OSError:
+        pass
+
+    return out_path
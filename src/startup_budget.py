@@ -0,0 +1,118 @@
+"""
+Budget di startup per l'entry point della pipeline (python -X importtime).
+
+Controlla che:
+- i moduli della pipeline (main, uploader, script_gen) si importino entro il
+  budget registrato in startup_budget.json (mediana di N run a freddo);
+- nessun client Google venga importato da un run render-only.
+
+Il secondo punto e' sempre bloccante. Fuori budget si esce con 1 solo con
+--strict: lo usa il workflow startup-budget.yml (push e pull request), con il
+budget misurato sui runner; il workflow di pubblicazione stampa solo un avviso.
+Il budget si cambia in un commit a parte, con le misure di -X importtime.
+
+Uso:
+    python src/startup_budget.py            # check, exit 1 solo per import Google
+    python src/startup_budget.py --strict   # exit 1 anche se fuori budget
+    python src/startup_budget.py --record   # registra il budget attuale (+headroom)
+    python src/startup_budget.py --record --budget-file /tmp/b.json  # misura altrove
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+
+SRC_DIR = Path(__file__).resolve().parent
+BUDGET_FILE = SRC_DIR / "startup_budget.json"
+
+MODULES = ["main", "uploader", "script_gen"]
+FORBIDDEN_PREFIXES = ("googleapiclient", "google.oauth2", "google.auth", "google_auth_oauthlib", "httplib2")
+
+
+def _measure_once(module: str) -> tuple[int, set[str]]:
+    """Un processo fresco con -X importtime. Ritorna (cumulative us del modulo, moduli importati)."""
+    p = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=str(SRC_DIR),
+        capture_output=True,
+        text=True,
+    )
+    if p.returncode != 0:
+        raise RuntimeError(f"[Monday] import {module} fallito:\n{p.stderr}")
+
+    cumulative = 0
+    imported: set[str] = set()
+    for line in p.stderr.splitlines():
+        # "import time:       123 |        456 | package"  (i figli sono indentati)
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        imported.add(parts[2].strip())
+        if parts[2].rstrip() == f" {module}":
+            cumulative = int(parts[1].strip())
+    return cumulative, imported
+
+
+def measure(runs: int = 5) -> tuple[dict[str, float], set[str]]:
+    """Mediana su `runs` processi per modulo (ms) + unione dei moduli importati."""
+    medians: dict[str, float] = {}
+    imported_all: set[str] = set()
+    for m in MODULES:
+        samples: list[int] = []
+        for _ in range(runs):
+            cumulative, imported = _measure_once(m)
+            imported_all |= imported
+            samples.append(cumulative)
+        medians[m] = statistics.median(samples) / 1000.0
+    return medians, imported_all
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="Check del budget di startup (-X importtime)")
+    ap.add_argument("--record", action="store_true", help="scrive startup_budget.json dal valore misurato")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--headroom", type=float, default=1.5, help="moltiplicatore usato con --record")
+    ap.add_argument("--strict", action="store_true", help="exit 1 anche se un modulo sfora il budget")
+    ap.add_argument("--budget-file", type=Path, default=BUDGET_FILE)
+    args = ap.parse_args(argv)
+
+    medians, imported = measure(args.runs)
+
+    forbidden = sorted(m for m in imported if m.startswith(FORBIDDEN_PREFIXES))
+    if forbidden:
+        print(f"[Monday] ERRORE: client pesanti importati allo startup: {', '.join(forbidden)}")
+        return 1
+
+    if args.record:
+        budget = {m: round(max(ms, 1.0) * args.headroom, 1) for m, ms in medians.items()}
+        args.budget_file.parent.mkdir(parents=True, exist_ok=True)
+        args.budget_file.write_text(json.dumps({"budget_ms": budget}, indent=2) + "\n", encoding="utf-8")
+        print(f"[Monday] Budget registrato in {args.budget_file}: {budget}")
+        return 0
+
+    budget = json.loads(args.budget_file.read_text(encoding="utf-8"))["budget_ms"]
+    ok = True
+    for m in MODULES:
+        limit = float(budget.get(m, 0))
+        status = "ok" if medians[m] <= limit else "SFORATO"
+        print(f"[Monday] startup {m}: {medians[m]:.1f} ms (budget {limit:.1f} ms) {status}")
+        ok = ok and medians[m] <= limit
+    if not ok and not args.strict:
+        # Workflow command: shows up as an annotation on the GitHub Actions run.
+        prefix = "::warning::" if os.getenv("GITHUB_ACTIONS") == "true" else ""
+        print(f"{prefix}[Monday] ATTENZIONE: startup fuori budget (non bloccante senza --strict).")
+        return 0
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+"""
+Upload in streaming: l'encode finale scrive MP4 frammentato su stdout e i byte
+partono verso YouTube mentre ffmpeg sta ancora codificando.
+
+- ffmpeg: -movflags frag_keyframe+empty_moov+default_base_moof -frag_duration 1s
+  -f mp4 pipe:1 (moov vuoto in testa, poi coppie moof/mdat: nessun seek
+  all'indietro). Il burn finale non imposta -g: col keyint di default di x264
+  (250, ~8 s) frag_keyframe da solo emetterebbe un frammento ogni ~8 s e su
+  uno Short da 60 s l'upload si sovrapporrebbe poco all'encode; -frag_duration
+  chiude un frammento almeno ogni FRAG_SECONDS anche a meta' GOP
+- un thread copia lo stdout nel file locale (serve a thumbnail, manifest e
+  retry) senza mai bloccare l'encoder; l'upload legge il file mentre cresce
+- sessione resumable a lunghezza ignota: ogni chunk va con
+  Content-Range: bytes a-b/*, la lunghezza si dichiara solo nell'ultimo.
+  L'ultimo chunk resta in locale finche' l'encode non e' finito e il file non
+  ha passato la validazione: se qualcosa va storto la sessione non viene mai
+  chiusa e nessun video viene creato
+- dimensione dei chunk (multipli di 256 KiB) e tetto di banda come l'upload
+  adattivo (upload_control); su 5xx/429/errori di rete si chiede al server
+  l'offset confermato (bytes */*) e si riparte da li'
+
+Env:
+- STREAM_UPLOAD=1 abilita (render senza split, non preview, senza UPLOAD_ACCOUNTS).
+  UPLOAD_DEDUP (catalog.py) qui non si applica: l'upload parte prima che il
+  file esista e se ne conosca lo sha256, quindi un replay identico viene
+  ricaricato comunque
+- YT_API_ENDPOINT (transport.py): endpoint alternativo, es. fake_youtube
+
+Verifica e confronto con l'upload a file finito: python benchmarks/bench_stream_upload.py
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+import metrics
+import supervise
+import transport
+import upload_control
+
+UPLOAD_URL = "https://www.googleapis.com/upload/youtube/v3/videos"
+FRAG_MOVFLAGS = "frag_keyframe+empty_moov+default_base_moof"
+FRAG_SECONDS = 1.0
+
+_READ_BLOCK = 1024 * 1024
+_RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class StreamUploadError(RuntimeError):
+    """Risposta HTTP inattesa dalla sessione resumable."""
+
+    def __init__(self, status: int, content: bytes | str):
+        if isinstance(content, bytes):
+            content = content.decode("utf-8", errors="replace")
+        super().__init__(f"HTTP {status}: {content[:500]}")
+        self.status = status
+        self.content = content
+
+
+def enabled() -> bool:
+    return (os.getenv("STREAM_UPLOAD", "0") or "0").strip() == "1"
+
+
+def upload_url() -> str:
+    endpoint = transport.api_endpoint()
+    return f"{endpoint}/upload/youtube/v3/videos" if endpoint else UPLOAD_URL
+
+
+def fragmented_pipe(cmd: list[str]) -> list[str]:
+    """Lo stesso comando ffmpeg, ma MP4 frammentato su stdout al posto del file (ultimo argomento)."""
+    args = cmd[:-1]
+    # +faststart rewrites the file at the end: impossible on a pipe.
+    while "-movflags" in args:
+        i = args.index("-movflags")
+        del args[i:i + 2]
+    return [*args, "-movflags", FRAG_MOVFLAGS, "-frag_duration", str(int(FRAG_SECONDS * 1e6)),
+            "-f", "mp4", "pipe:1"]
+
+
+def _committed(range_header: str | None) -> int:
+    # "bytes=0-1048575" -> 1048576; no header -> nothing persisted yet
+    if not range_header:
+        return 0
+    return int(range_header.rsplit("-", 1)[1]) + 1
+
+
+class ResumableSession:
+    """Sessione di upload resumable (protocollo Google), lunghezza dichiarata alla fine."""
+
+    def __init__(self, http: Any, uri: str):
+        self.http = http
+        self.uri = uri
+
+    @classmethod
+    def start(cls, http: Any, body: dict, url: str | None = None, content_type: str = "video/mp4") -> "ResumableSession":
+        resp, content = http.request(
+            f"{url or upload_url()}?uploadType=resumable&part={','.join(body)}",
+            method="POST",
+            body=json.dumps(body),
+            headers={
+                "Content-Type": "application/json; charset=UTF-8",
+                "X-Upload-Content-Type": content_type,
+            },
+        )
+        status = int(resp.status)
+        if status != 200 or not resp.get("location"):
+            raise StreamUploadError(status, content)
+        return cls(http, resp["location"])
+
+    def _put(self, data: bytes, content_range: str) -> tuple[int, dict | None]:
+        resp, content = self.http.request(
+            self.uri,
+            method="PUT",
+            body=data,
+            headers={"Content-Range": content_range, "Content-Length": str(len(data))},
+        )
+        status = int(resp.status)
+        if status == 308:
+            return _committed(resp.get("range")), None
+        if status in (200, 201):
+            return -1, json.loads(content)
+        raise StreamUploadError(status, content)
+
+    def send(self, data: bytes, offset: int, total: int | None = None) -> tuple[int, dict | None]:
+        """
+        Invia data a partire da offset. total=None: chunk intermedio (lunghezza
+        ancora ignota). Ritorna (byte confermati, None) oppure (-1, risorsa video).
+        """
+        size = "*" if total is None else str(total)
+        if not data:
+            return self._put(b"", f"bytes */{size}")
+        return self._put(data, f"bytes {offset}-{offset + len(data) - 1}/{size}")
+
+    def committed(self) -> int:
+        """Byte gia' persistiti dal server (dopo un errore)."""
+        offset, _ = self._put(b"", "bytes */*")
+        return max(offset, 0)
+
+
+class _Tee:
+    """Copia lo stdout dell'encoder nel file locale; l'upload aspetta che cresca."""
+
+    def __init__(self, src: Any, path: Path):
+        self.written = 0
+        self.done = False
+        self.error: BaseException | None = None
+        self._cond = threading.Condition()
+        dst = path.open("wb")
+        self._thread = threading.Thread(target=self._pump, args=(src, dst), name="stream-tee", daemon=True)
+        self._thread.start()
+
+    def _pump(self, src: Any, dst: Any) -> None:
+        try:
+            with dst:
+                while True:
+                    block = src.read1(_READ_BLOCK)
+                    if not block:
+                        break
+                    dst.write(block)
+                    dst.flush()
+                    with self._cond:
+                        self.written += len(block)
+                        self._cond.notify_all()
+        except BaseException as e:
+            self.error = e
+        finally:
+            with self._cond:
+                self.done = True
+                self._cond.notify_all()
+
+    def wait_for(self, n: int) -> int:
+        """Aspetta che ci siano n byte (o la fine dello stream); ritorna i byte scritti."""
+        with self._cond:
+            while self.written < n and not self.done:
+                self._cond.wait()
+            return self.written
+
+    def join(self) -> None:
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
+
+
+def _backoff(e: BaseException, retries: int, max_retries: int) -> None:
+    """Rilancia e se non e' ritentabile o i retry sono finiti, altrimenti dorme."""
+    if isinstance(e, StreamUploadError) and e.status not in _RETRY_STATUS:
+        raise e
+    metrics.inc("upload_retries_total")
+    if retries > max_retries:
+        raise e
+    delay = min(60.0, 2 ** retries) * (0.5 + random.random() / 2)
+    print(f"[Monday] chunk fallito ({getattr(e, 'status', None) or type(e).__name__}), "
+          f"retry {retries}/{max_retries} tra {delay:.1f}s")
+    time.sleep(delay)
+
+
+def _start_session(http: Any, body: dict, url: str | None, max_retries: int) -> ResumableSession:
+    retries = 0
+    while True:
+        try:
+            return ResumableSession.start(http, body, url)
+        except (StreamUploadError, OSError) as e:
+            retries += 1
+            _backoff(e, retries, max_retries)
+
+
+def encode_and_upload(
+    cmd: list[str],
+    out_path: Path,
+    http: Any,
+    body: dict,
+    *,
+    validate: Callable[[Path], bool] | None = None,
+    url: str | None = None,
+    media_seconds: float | None = None,
+    controller: upload_control.ChunkController | None = None,
+    bucket: upload_control.TokenBucket | None = None,
+    max_retries: int | None = None,
+) -> dict:
+    """
+    Esegue cmd (che scrive il video su stdout, vedi fragmented_pipe), lo salva in
+    out_path e lo carica mentre viene prodotto. validate(out_path) decide, a
+    encode finito, se chiudere la sessione. Ritorna la risorsa video dell'API.
+    """
+    if controller is None:
+        controller = upload_control.ChunkController.from_env()
+    if bucket is None:
+        rate = upload_control.max_rate_from_env()
+        bucket = upload_control.TokenBucket(rate) if rate > 0 else None
+    if max_retries is None:
+        max_retries = int(os.getenv("UPLOAD_MAX_RETRIES", "8") or "8")
+
+    session = _start_session(http, body, url, max_retries)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+
+    t0 = time.perf_counter()
+    offset = 0
+    total: int | None = None
+    sent_at_encode_end = 0
+    encode_end = 0.0
+    retries = 0
+    response = None
+
+    with tempfile.TemporaryFile() as err, supervise.popen(
+        cmd, media_seconds=media_seconds, stdout=subprocess.PIPE, stderr=err
+    ) as proc:
+        tee = _Tee(proc.stdout, out_path)
+        with out_path.open("rb") as src:
+            while response is None:
+                size = controller.chunk_size
+                avail = tee.wait_for(offset + size)
+                final = avail - offset < size  # stream over, less than one chunk left
+                if final and total is None:
+                    tee.join()
+                    if proc.wait() != 0:
+                        err.seek(0)
+                        raise RuntimeError(
+                            f"[Monday] encode in streaming fallito (exit {proc.returncode}):\n"
+                            f"{err.read().decode('utf-8', errors='replace')[-4000:]}"
+                        )
+                    encode_end = time.perf_counter()
+                    sent_at_encode_end = offset
+                    if validate is not None and not validate(out_path):
+                        # Session left open and never finalized: no video gets created.
+                        raise RuntimeError("[Monday] Upload annullato: file video non valido.")
+                    total = avail
+
+                n = total - offset if final else size
+                src.seek(offset)
+                data = src.read(n)
+                if bucket is not None:
+                    bucket.consume(len(data))
+                t_chunk = time.perf_counter()
+                try:
+                    committed, response = session.send(data, offset, total if final else None)
+                except (StreamUploadError, OSError) as e:
+                    retries += 1
+                    _backoff(e, retries, max_retries)
+                    controller.record_failure()
+                    try:
+                        offset = session.committed()
+                    except (StreamUploadError, OSError):
+                        pass  # next send fails again and counts as a retry
+                    continue
+
+                controller.record(max(len(data), 1), time.perf_counter() - t_chunk)
+                retries = 0
+                if response is None:
+                    offset = committed
+
+    elapsed = max(1e-6, time.perf_counter() - t0)
+    metrics.inc("bytes_uploaded_total", total or 0)
+    metrics.set_gauge("upload_throughput_bytes_per_second", (total or 0) / elapsed)
+    metrics.set_gauge("upload_chunk_size_bytes", controller.chunk_size)
+    print(
+        f"[Monday] Upload in streaming: {sent_at_encode_end / 1e6:.1f} MB su {(total or 0) / 1e6:.1f} MB "
+        f"gia' inviati a fine encode, coda dopo l'encode {time.perf_counter() - encode_end:.2f}s"
+    )
+    return response
@@ -0,0 +1,77 @@
+"""
+Streaming tra stadi della pipeline via pipe (stdout -> stdin), senza intermedi.
+
+Esempio tipico: audio estratto da videos_to_upload/video.mp4.
+Prima: WAV 48 kHz full-length su disco, poi riletto dal muxer.
+Ora: ffmpeg estrae solo i primi `duration` secondi in PCM grezzo su stdout e il
+muxer lo legge da pipe:0 mentre codifica l'AAC. Nessun file intermedio.
+"""
+
+from __future__ import annotations
+
+import os
+import shlex
+import subprocess
+import tempfile
+from pathlib import Path
+
+import supervise
+
+
+# Raw PCM on the pipe: no container header to patch, no seek needed on either side.
+PCM_FORMAT = ["-f", "s16le", "-ar", "48000", "-ac", "1"]
+
+
+def streaming_enabled() -> bool:
+    return (os.getenv("STREAM_AUDIO", "0") or "0").strip() == "1"
+
+
+def audio_producer_cmd(source: Path, duration_s: float) -> list[str]:
+    """ffmpeg che decodifica SOLO i primi duration_s secondi dell'audio e li scrive su stdout."""
+    return [
+        "ffmpeg", "-v", "error",
+        "-t", f"{duration_s:.3f}",
+        "-i", str(source),
+        "-vn", "-sn",
+        "-map", "0:a:0",
+        *PCM_FORMAT,
+        "-c:a", "pcm_s16le",
+        "pipe:1",
+    ]
+
+
+def audio_consumer_input() -> list[str]:
+    """Argomenti di input per leggere l'audio del producer da stdin."""
+    return [*PCM_FORMAT, "-i", "pipe:0"]
+
+
+def run_piped(producer: list[str], consumer: list[str]) -> None:
+    """
+    Esegue producer | consumer. Solleva RuntimeError se il consumer fallisce.
+    Un producer terminato da broken pipe (consumer con -shortest che chiude prima)
+    non e' un errore.
+    """
+    with tempfile.TemporaryFile() as prod_err:
+        prod = subprocess.Popen(producer, stdout=subprocess.PIPE, stderr=prod_err)
+        try:
+            # The pipe can't be replayed: a stalled consumer is killed, not retried.
+            cons = supervise.run(consumer, stdin=prod.stdout, idempotent=False)
+        finally:
+            # Close our copy so the producer sees EPIPE if the consumer exited early.
+            if prod.stdout is not None:
+                prod.stdout.close()
+            try:
+                prod.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                prod.kill()
+                prod.wait()
+
+        if cons.returncode != 0:
+            prod_err.seek(0)
+            raise RuntimeError(
+                "FFmpeg pipe failed:\n"
+                f"PRODUCER: {' '.join(shlex.quote(c) for c in producer)}\n"
+                f"CONSUMER: {' '.join(shlex.quote(c) for c in consumer)}\n"
+                f"PRODUCER STDERR:\n{prod_err.read().decode('utf-8', errors='replace')}\n"
+                f"CONSUMER STDERR:\n{cons.stderr}\n"
+            )
@@ -1,12 +1,15 @@
 from __future__ import annotations
 
 import os
-import subprocess
 from pathlib import Path
+from typing import Callable
+
+import encode_profiles
+import supervise
 
 
 def _run(cmd: list[str]) -> None:
-    p = subprocess.run(cmd, capture_output=True, text=True)
+    p = supervise.run(cmd)
     if p.returncode != 0:
         raise RuntimeError(
             "FFmpeg failed:\n"
@@ -84,6 +87,52 @@ def _force_style_for_env() -> str:
     )
 
 
+def subtitles_filter(subtitles_ass_path: Path, original_size: tuple[int, int] | None = None) -> str:
+    """
+    Filtro libass (con force_style da SUB_STYLE), riusabile in altri filtergraph.
+
+    original_size: risoluzione per cui l'ASS e' stato scritto, quando si brucia
+    su un video piu' piccolo (preview).
+    """
+    subs = _ffmpeg_escape_subtitles_path(Path(subtitles_ass_path))
+    force_style = _force_style_for_env()
+    vf = f"subtitles='{subs}':force_style='{force_style}'"
+    if original_size:
+        vf += f":original_size={original_size[0]}x{original_size[1]}"
+    return vf
+
+
+def preview_ass(src: Path, dst: Path) -> Path:
+    """
+    Copia dell'ASS per un render a risoluzione ridotta.
+
+    Il layout resta in coordinate PlayResX/PlayResY (1080x1920): libass lo scala
+    sul frame reale, force_style compreso (anche lui e' in coordinate script).
+    Fuori scala resterebbero solo bordi e ombre con ScaledBorderAndShadow=no
+    (spessori in pixel video, 3x piu' grossi in preview): qui e' forzato a yes.
+    """
+    lines = Path(src).read_text(encoding="utf-8-sig", errors="ignore").splitlines()
+    out: list[str] = []
+    in_info = False
+    found = False
+    for ln in lines:
+        stripped = ln.strip()
+        if stripped.startswith("[") and stripped.endswith("]"):
+            if in_info and not found:
+                out.insert(len(out) - (1 if out and not out[-1].strip() else 0), "ScaledBorderAndShadow: yes")
+                found = True
+            in_info = stripped.lower() == "[script info]"
+        elif in_info and stripped.lower().startswith("scaledborderandshadow:"):
+            ln = "ScaledBorderAndShadow: yes"
+            found = True
+        out.append(ln)
+    if in_info and not found:
+        out.append("ScaledBorderAndShadow: yes")
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    dst.write_text("\n".join(out) + "\n", encoding="utf-8")
+    return dst
+
+
 def add_burned_in_subtitles(
     video_path: Path,
     subtitles_ass_path: Path | None = None,
@@ -92,10 +141,16 @@ def add_burned_in_subtitles(
     # compat extra: alcuni pezzi potrebbero chiamarlo così
     subtitles_path: Path | None = None,
     subtitles_file: Path | None = None,
+    profile: encode_profiles.EncodeProfile | None = None,
+    original_size: tuple[int, int] | None = None,
+    final_run: Callable[[list[str]], object] | None = None,
 ) -> Path:
     """
     Brucia i sottotitoli ASS con filtro 'subtitles' (libass).
     Supporta SUB_STYLE=aggressive|cinematic.
+    Parametri x264 da `profile` (default: ENCODE_PROFILE).
+    original_size: vedi subtitles_filter (preview a risoluzione ridotta).
+    final_run: vedi encode_profiles.encode (upload in streaming).
     """
     if output_dir is None:
         output_dir = video_path.parent
@@ -107,22 +162,15 @@ def add_burned_in_subtitles(
     output_dir.mkdir(parents=True, exist_ok=True)
     out_path = output_dir / output_name
 
-    subs = _ffmpeg_escape_subtitles_path(Path(subs_path))
-    force_style = _force_style_for_env()
-
-    vf = f"subtitles='{subs}':force_style='{force_style}'"
+    vf = subtitles_filter(Path(subs_path), original_size=original_size)
 
-    _run([
-        "ffmpeg", "-y",
-        "-i", str(video_path),
-        "-vf", vf,
-        "-c:v", "libx264",
-        "-preset", "veryfast",
-        "-crf", "18",
-        "-pix_fmt", "yuv420p",
-        "-c:a", "aac",
-        "-b:a", "128k",
-        str(out_path),
-    ])
+    encode_profiles.encode(
+        _run,
+        head=["ffmpeg", "-y", "-i", str(video_path), "-vf", vf],
+        tail=["-c:a", "aac", "-b:a", "128k", "-movflags", "+faststart"],
+        out_path=out_path,
+        profile=profile or encode_profiles.get_profile(),
+        final_run=final_run,
+    )
 
     return out_path
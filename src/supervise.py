@@ -0,0 +1,335 @@
+"""
+Supervisione dei processi esterni (ffmpeg/ffprobe): deadline, kill e retry.
+
+Nessun subprocess.run del progetto aveva un timeout: un ffmpeg bloccato teneva
+fermo il job fino al limite del CI. Qui ogni comando ha una deadline:
+
+    deadline = SUPERVISE_MIN_S + media_s / velocita' * SUPERVISE_FACTOR
+
+- media_s: esplicita per comando, altrimenti quella dello stadio corrente
+  (media_seconds_for(), per thread: gli stadi concorrenti di orchestrator non
+  si pestano i piedi), altrimenti quella del run (set_media_seconds(), da
+  chiamare solo quando non girano altri stadi). Chi lavora su una parte del run
+  (segmenti di split_render, background) DEVE dichiarare la sua, altrimenti la
+  velocita' misurata risulta gonfiata
+- velocita': x realtime misurata per tipo di comando (ffmpeg x264 per preset,
+  stream copy, ffprobe, ...), EWMA salvata in build/cache/supervise_speed.json;
+  finche' non c'e' una misura si usa SUPERVISE_DEFAULT_SPEED
+- senza durata nota: SUPERVISE_DEFAULT_S
+
+Alla scadenza si uccide l'intero process group (SIGTERM, poi SIGKILL) e, se il
+comando e' idempotente, si riprova fino a SUPERVISE_RETRIES volte con deadline
+1.5x. Ogni comando finisce nella trace (TRACE_FILE, default build/trace.jsonl)
+con esito ok|error|stall; gli stall contano in process_stalls_total.
+
+SUPERVISE=0 disabilita le deadline (trace e metriche restano).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import signal
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator, TypeVar
+
+import metrics
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+BUILD_DIR = ROOT_DIR / "build"
+
+T = TypeVar("T")
+
+_lock = threading.RLock()  # re-entrant: kill_all() runs from a signal handler
+_media_seconds: float | None = None
+_stage_media = threading.local()
+_speeds: dict[str, float] | None = None
+# Live children: each runs in its own process group, so a SIGTERM to our group
+# doesn't reach them; kill_all() does.
+_live: set[subprocess.Popen] = set()
+
+
+class StallTimeout(RuntimeError):
+    """Il processo ha superato la deadline (anche dopo i retry)."""
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)) or default)
+
+
+def enabled() -> bool:
+    return (os.getenv("SUPERVISE", "1") or "1").strip() != "0"
+
+
+def set_media_seconds(seconds: float | None) -> None:
+    """Durata del media su cui lavorano i comandi del run corrente."""
+    global _media_seconds
+    _media_seconds = seconds
+
+
+@contextmanager
+def media_seconds_for(seconds: float | None) -> Iterator[None]:
+    """Durata del media per i comandi lanciati da questo thread (uno stadio)."""
+    prev = getattr(_stage_media, "seconds", None)
+    _stage_media.seconds = seconds
+    try:
+        yield
+    finally:
+        _stage_media.seconds = prev
+
+
+def _media_for(explicit: float | None) -> float | None:
+    if explicit is not None:
+        return explicit
+    stage = getattr(_stage_media, "seconds", None)
+    return stage if stage is not None else _media_seconds
+
+
+def _speed_path() -> Path:
+    return Path(os.getenv("SUPERVISE_SPEED_FILE") or (BUILD_DIR / "cache" / "supervise_speed.json"))
+
+
+def _trace_path() -> Path:
+    return Path(os.getenv("TRACE_FILE") or (BUILD_DIR / "trace.jsonl"))
+
+
+def _load_speeds() -> dict[str, float]:
+    global _speeds
+    if _speeds is None:
+        try:
+            _speeds = {k: float(v) for k, v in json.loads(_speed_path().read_text(encoding="utf-8")).items()}
+        except (OSError, ValueError, AttributeError):
+            _speeds = {}
+    return _speeds
+
+
+def _record_speed(key: str, speed: float) -> None:
+    with _lock:
+        speeds = _load_speeds()
+        old = speeds.get(key)
+        speeds[key] = speed if old is None else 0.3 * speed + 0.7 * old
+        path = _speed_path()
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(speeds, sort_keys=True), encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+
+def command_key(cmd: list[str]) -> str:
+    """Tipo di comando per la stima di velocita'."""
+    prog = Path(cmd[0]).name
+    if "libx264" in cmd:
+        preset = cmd[cmd.index("-preset") + 1] if "-preset" in cmd[:-1] else "medium"
+        return f"{prog}:x264:{preset}"
+    for flag in ("-c", "-c:v"):
+        if flag in cmd[:-1] and cmd[cmd.index(flag) + 1] == "copy":
+            return f"{prog}:copy"
+    return prog
+
+
+def deadline_for(key: str, media_seconds: float | None) -> float:
+    if media_seconds is None or media_seconds <= 0:
+        return _env_float("SUPERVISE_DEFAULT_S", 900)
+    with _lock:
+        speed = _load_speeds().get(key) or _env_float("SUPERVISE_DEFAULT_SPEED", 0.25)
+    return _env_float("SUPERVISE_MIN_S", 60) + media_seconds / max(speed, 1e-3) * _env_float("SUPERVISE_FACTOR", 3)
+
+
+def trace(event: dict) -> None:
+    event = {"ts": round(time.time(), 3), "pid": os.getpid(), **event}
+    path = _trace_path()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with _lock, path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(event) + "\n")
+    except OSError:
+        pass
+
+
+def _kill_group(proc: subprocess.Popen) -> None:
+    for sig, grace in ((signal.SIGTERM, 5.0), (signal.SIGKILL, None)):
+        try:
+            os.killpg(proc.pid, sig)
+        except ProcessLookupError:
+            return
+        try:
+            proc.wait(timeout=grace)
+            return
+        except subprocess.TimeoutExpired:
+            continue
+
+
+def kill_all() -> None:
+    """Uccide i process group di tutti i figli ancora vivi (uscita su segnale)."""
+    with _lock:
+        procs = list(_live)
+    for proc in procs:
+        _kill_group(proc)
+
+
+def install_signal_handlers() -> None:
+    """
+    SIGTERM/SIGHUP -> kill_all() + SystemExit, cosi' i finally (cleanup, metriche) girano.
+    SIGINT -> kill_all() + KeyboardInterrupt: i figli sono in un'altra sessione e
+    il Ctrl-C del terminale non li raggiunge piu' da soli.
+    """
+
+    def _handler(signum, _frame):
+        kill_all()
+        raise SystemExit(128 + signum)
+
+    def _interrupt(_signum, _frame):
+        kill_all()
+        raise KeyboardInterrupt
+
+    for sig in (signal.SIGTERM, signal.SIGHUP):
+        signal.signal(sig, _handler)
+    signal.signal(signal.SIGINT, _interrupt)
+
+
+def run(
+    cmd: list[str],
+    *,
+    text: bool = True,
+    capture: bool = True,
+    stdin: Any = None,
+    media_seconds: float | None = None,
+    idempotent: bool = True,
+    retries: int | None = None,
+) -> subprocess.CompletedProcess:
+    """
+    Come subprocess.run(cmd, capture_output=capture, text=text), con deadline.
+
+    Il return code non zero NON e' un errore qui (lo gestisce il chiamante, come
+    prima); solo lo stall viene ritentato (se idempotent) e, alla fine, sollevato
+    come StallTimeout.
+    """
+    key = command_key(cmd)
+    media = _media_for(media_seconds)
+    if retries is None:
+        retries = int(os.getenv("SUPERVISE_RETRIES", "1") or "1") if idempotent else 0
+    deadline = deadline_for(key, media) if enabled() else None
+
+    for attempt in range(retries + 1):
+        t0 = time.monotonic()
+        proc = subprocess.Popen(
+            cmd,
+            stdin=stdin,
+            stdout=subprocess.PIPE if capture else None,
+            stderr=subprocess.PIPE if capture else None,
+            text=text,
+            start_new_session=True,
+        )
+        with _lock:
+            _live.add(proc)
+        try:
+            out, err = proc.communicate(timeout=deadline)
+        except subprocess.TimeoutExpired:
+            _kill_group(proc)
+            proc.communicate()
+            elapsed = time.monotonic() - t0
+            metrics.inc("process_stalls_total", 1, {"cmd": key})
+            trace({"cmd": key, "argv0": cmd[0], "media_s": media, "deadline_s": round(deadline, 1),
+                   "elapsed_s": round(elapsed, 3), "outcome": "stall", "attempt": attempt})
+            print(f"[Monday] {key} bloccato oltre {deadline:.0f}s: processo terminato "
+                  f"(tentativo {attempt + 1}/{retries + 1})")
+            deadline *= 1.5
+            continue
+        except BaseException:
+            _kill_group(proc)
+            raise
+        finally:
+            with _lock:
+                _live.discard(proc)
+
+        elapsed = time.monotonic() - t0
+        trace({"cmd": key, "argv0": cmd[0], "media_s": media,
+               "deadline_s": round(deadline, 1) if deadline else None,
+               "elapsed_s": round(elapsed, 3), "rc": proc.returncode,
+               "outcome": "ok" if proc.returncode == 0 else "error", "attempt": attempt})
+        if proc.returncode == 0 and media and elapsed > 1.0:
+            _record_speed(key, media / elapsed)
+        return subprocess.CompletedProcess(cmd, proc.returncode, out, err)
+
+    raise StallTimeout(f"[Monday] {' '.join(cmd[:3])}... bloccato {retries + 1} volte, rinuncio")
+
+
+@contextmanager
+def popen(cmd: list[str], *, media_seconds: float | None = None, **kwargs: Any) -> Iterator[subprocess.Popen]:
+    """
+    Popen supervisionato per i processi letti in streaming dal chiamante
+    (stdout=PIPE): stessa deadline di run(), ma allo scadere il gruppo viene
+    ucciso (il lettore vede EOF) e all'uscita si solleva StallTimeout. Nessun
+    retry: uno stream gia' consumato non si puo' rigiocare.
+    """
+    key = command_key(cmd)
+    media = _media_for(media_seconds)
+    deadline = deadline_for(key, media) if enabled() else None
+    stalled = threading.Event()
+
+    t0 = time.monotonic()
+    proc = subprocess.Popen(cmd, start_new_session=True, **kwargs)
+    with _lock:
+        _live.add(proc)
+
+    def _expire() -> None:
+        if proc.poll() is None:
+            stalled.set()
+            _kill_group(proc)
+
+    timer = threading.Timer(deadline, _expire) if deadline else None
+    if timer is not None:
+        timer.daemon = True
+        timer.start()
+    try:
+        yield proc
+        proc.wait()
+    except BaseException as e:
+        _kill_group(proc)
+        if stalled.is_set():
+            raise StallTimeout(f"[Monday] {key} bloccato oltre {deadline:.0f}s: processo terminato") from e
+        raise
+    finally:
+        if timer is not None:
+            timer.cancel()
+        with _lock:
+            _live.discard(proc)
+        elapsed = time.monotonic() - t0
+        outcome = "stall" if stalled.is_set() else ("ok" if proc.returncode == 0 else "error")
+        if stalled.is_set():
+            metrics.inc("process_stalls_total", 1, {"cmd": key})
+        trace({"cmd": key, "argv0": cmd[0], "media_s": media,
+               "deadline_s": round(deadline, 1) if deadline else None,
+               "elapsed_s": round(elapsed, 3), "rc": proc.returncode, "outcome": outcome, "attempt": 0})
+
+    if stalled.is_set():
+        raise StallTimeout(f"[Monday] {key} bloccato oltre {deadline:.0f}s: processo terminato")
+    if proc.returncode == 0 and media and elapsed > 1.0:
+        _record_speed(key, media / elapsed)
+
+
+def call(fn: Callable[[], T], what: str, retries: int | None = None) -> T:
+    """Ritenta una chiamata Python idempotente (es. gTTS in rete) che fallisce."""
+    if retries is None:
+        retries = int(os.getenv("SUPERVISE_RETRIES", "1") or "1")
+    for attempt in range(retries + 1):
+        t0 = time.monotonic()
+        try:
+            result = fn()
+        except Exception as e:
+            trace({"cmd": what, "elapsed_s": round(time.monotonic() - t0, 3), "outcome": "error",
+                   "error": f"{type(e).__name__}: {e}"[:300], "attempt": attempt})
+            if attempt >= retries:
+                raise
+            time.sleep(min(30.0, 2.0 * 2 ** attempt))
+            continue
+        trace({"cmd": what, "elapsed_s": round(time.monotonic() - t0, 3), "outcome": "ok", "attempt": attempt})
+        return result
+    raise AssertionError("unreachable")
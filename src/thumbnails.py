@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import json
+import os
+import shlex
+from dataclasses import dataclass
+from pathlib import Path
+
+import supervise
+
+
+def _run_bytes(cmd: list[str]) -> bytes:
+    """Run a command and return raw stdout (binary), raise on failure."""
+    p = supervise.run(cmd, text=False)
+    if p.returncode != 0:
+        raise RuntimeError(
+            "FFmpeg failed:\n"
+            f"CMD: {' '.join(shlex.quote(c) for c in cmd)}\n"
+            f"STDERR:\n{p.stderr.decode('utf-8', errors='replace')}\n"
+        )
+    return p.stdout
+
+
+def _probe_video(path: Path) -> tuple[int, int, float]:
+    out = _run_bytes([
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "stream=width,height:format=duration",
+        "-of", "json",
+        str(path),
+    ])
+    info = json.loads(out.decode("utf-8") or "{}")
+    stream = (info.get("streams") or [{}])[0]
+    w = int(stream.get("width") or 0)
+    h = int(stream.get("height") or 0)
+    duration = float((info.get("format") or {}).get("duration") or 0.0)
+    if w <= 0 or h <= 0:
+        raise RuntimeError(f"[Monday] ffprobe: nessuno stream video in {path}")
+    return w, h, duration
+
+
+@dataclass
+class ThumbnailCandidate:
+    index: int
+    contrast: float
+    text_coverage: float
+    brightness: float
+    score: float
+
+
+def _extract_frames(video: Path, k: int, width: int, height: int, duration: float,
+                    keyframes_only: bool) -> list[bytes]:
+    """
+    Pull up to k rgb24 frames from `video` in ONE ffmpeg run.
+
+    `select` keeps a frame each time at least `step` seconds have passed since the
+    previous pick, so the k candidates are spread across the timeline.
+    With keyframes_only the decoder skips every non-key frame (-skip_frame nokey):
+    cost is ~one intra frame per candidate instead of a full decode.
+    """
+    step = max(0.1, duration / max(1, k))
+    select = f"select='isnan(prev_selected_t)+gte(t-prev_selected_t\\,{step:.3f})'"
+
+    cmd = ["ffmpeg", "-v", "error"]
+    if keyframes_only:
+        cmd += ["-skip_frame", "nokey"]
+    cmd += [
+        "-i", str(video),
+        "-an", "-sn",
+        "-vf", f"{select},format=rgb24",
+        "-fps_mode", "vfr",
+        "-frames:v", str(k),
+        "-f", "rawvideo",
+        "pipe:1",
+    ]
+    raw = _run_bytes(cmd)
+
+    frame_size = width * height * 3
+    return [raw[i:i + frame_size] for i in range(0, len(raw) - frame_size + 1, frame_size)]
+
+
+def _score_frame(index: int, frame: bytes, width: int, height: int) -> ThumbnailCandidate:
+    """
+    Cheap in-process scoring (NumPy, on a 4x subsampled luma plane):
+    - contrast: std of luma (flat/black frames lose)
+    - text coverage: share of near-white pixels (burned-in subtitles are white)
+    - brightness: too dark or blown out is penalized
+    """
+    import numpy as np
+
+    rgb = np.frombuffer(frame, dtype=np.uint8).reshape(height, width, 3)[::4, ::4].astype(np.float32)
+    luma = rgb[..., 0] * 0.299 + rgb[..., 1] * 0.587 + rgb[..., 2] * 0.114
+
+    contrast = float(luma.std()) / 128.0
+    text_coverage = float((luma > 225).mean())
+    brightness = float(luma.mean()) / 255.0
+
+    # Text matters, but a frame that is ALL white is not "text".
+    text_term = min(text_coverage, 0.12) / 0.12
+    exposure_penalty = abs(brightness - 0.42) * 1.5
+    score = contrast * 1.0 + text_term * 0.8 - exposure_penalty
+
+    return ThumbnailCandidate(
+        index=index,
+        contrast=contrast,
+        text_coverage=text_coverage,
+        brightness=brightness,
+        score=score,
+    )
+
+
+def pick_thumbnail(
+    video_path: Path,
+    out_path: Path | None = None,
+    k: int | None = None,
+    keyframes_only: bool | None = None,
+) -> Path:
+    """
+    Estrae K frame candidati dal video finale (sottotitoli inclusi) con UNA sola
+    invocazione di ffmpeg, li valuta in-process e salva il migliore come JPEG.
+
+    Env:
+    - THUMB_CANDIDATES (default 8)
+    - THUMB_KEYFRAMES_ONLY (default 1): decodifica solo i keyframe
+    """
+    from PIL import Image
+
+    video_path = Path(video_path)
+    if out_path is None:
+        out_path = video_path.with_name(video_path.stem + "_thumb.jpg")
+    if k is None:
+        k = int(os.getenv("THUMB_CANDIDATES", "8") or "8")
+    if keyframes_only is None:
+        keyframes_only = (os.getenv("THUMB_KEYFRAMES_ONLY", "1") or "1").strip() == "1"
+
+    width, height, duration = _probe_video(video_path)
+
+    frames = _extract_frames(video_path, k, width, height, duration, keyframes_only)
+    if not frames and keyframes_only:
+        # Too few keyframes (e.g. one long GOP): fall back to a full decode.
+        frames = _extract_frames(video_path, k, width, height, duration, keyframes_only=False)
+    if not frames:
+        raise RuntimeError(f"[Monday] Nessun frame estratto per la thumbnail da {video_path}")
+
+    candidates = [_score_frame(i, f, width, height) for i, f in enumerate(frames)]
+    best = max(candidates, key=lambda c: c.score)
+    print(
+        f"[Monday] Thumbnail: {len(candidates)} candidati, scelto #{best.index} "
+        f"(score={best.score:.3f}, contrast={best.contrast:.3f}, text={best.text_coverage:.3f})"
+    )
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    img = Image.frombytes("RGB", (width, height), frames[best.index])
+    img.save(out_path, format="JPEG", quality=90, optimize=True)
+    return out_path
@@ -0,0 +1,158 @@
+"""
+Trasporto HTTP per il client YouTube.
+
+googleapiclient di default usa httplib2: una connessione per Http, niente timeout
+espliciti, buffer di socket del kernel. Qui un'alternativa basata su una sessione
+`requests` autenticata (google.auth AuthorizedSession) con pool keep-alive,
+timeout connect/read separati e, solo se richiesto, buffer di socket fissi.
+
+Il client discovery vuole un oggetto "httplib2-like" (request() -> (Response,
+content)): RequestsHttp fa da adattatore.
+
+Env:
+- YT_TRANSPORT = httplib2 (default, comportamento storico) | requests
+- YT_CONNECT_TIMEOUT (s, default 10), YT_READ_TIMEOUT (s, default 300)
+- YT_SOCKET_BUFFER_KB (default 0 = autotuning del kernel; >0 fissa SO_SNDBUF e
+  SO_RCVBUF, quest'ultimo al massimo 1 MB)
+- YT_API_ENDPOINT: endpoint alternativo (es. benchmarks/fake_youtube.py)
+
+Buffer di socket: su Linux un setsockopt(SO_SNDBUF/SO_RCVBUF) esplicito spegne
+l'autotuning TCP di quel socket, e il valore viene limitato a net.core.wmem_max /
+rmem_max (212992 sui runner Ubuntu: ~416 KB effettivi, il kernel raddoppia).
+L'autotuning invece cresce fino a net.ipv4.tcp_wmem[2] (4 MB di default) seguendo
+il BDP reale, quindi e' quasi sempre meglio lasciarlo acceso. Un buffer fisso ha
+senso solo dove wmem_max e' stato alzato e l'autotuning resta sotto il BDP
+(link lunghi e veloci), o per limitare la memoria per connessione.
+
+Confronto: python benchmarks/bench_transport.py (con e senza buffer fisso),
+benchmarks/bench_upload.py
+"""
+
+from __future__ import annotations
+
+import os
+import socket
+from typing import Any
+
+TRANSPORTS = ("httplib2", "requests")
+
+
+def transport_from_env() -> str:
+    name = (os.getenv("YT_TRANSPORT", "httplib2") or "httplib2").strip().lower()
+    if name not in TRANSPORTS:
+        print(f"[Monday] YT_TRANSPORT sconosciuto {name!r}, uso 'httplib2'.")
+        name = "httplib2"
+    return name
+
+
+def api_endpoint() -> str | None:
+    """YT_API_ENDPOINT senza slash finale, o None per l'endpoint vero."""
+    return (os.getenv("YT_API_ENDPOINT") or "").strip().rstrip("/") or None
+
+
+def _timeouts() -> tuple[float, float]:
+    return (
+        float(os.getenv("YT_CONNECT_TIMEOUT", "10") or "10"),
+        float(os.getenv("YT_READ_TIMEOUT", "300") or "300"),
+    )
+
+
+def _socket_options() -> list[tuple[int, int, int]]:
+    from urllib3.connection import HTTPConnection
+
+    buf = int(os.getenv("YT_SOCKET_BUFFER_KB", "0") or "0") * 1024
+    opts = list(HTTPConnection.default_socket_options)  # includes TCP_NODELAY
+    if buf > 0:  # disables autotuning for this socket (see module docstring)
+        opts.append((socket.SOL_SOCKET, socket.SO_SNDBUF, buf))
+        opts.append((socket.SOL_SOCKET, socket.SO_RCVBUF, min(buf, 1024 * 1024)))
+    return opts
+
+
+def _make_adapter(pool_maxsize: int = 4):
+    from requests.adapters import HTTPAdapter
+
+    class _TunedAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+            kwargs["socket_options"] = _socket_options()
+            super().init_poolmanager(*args, **kwargs)
+
+    # Retries stay with googleapiclient (num_retries), not urllib3.
+    return _TunedAdapter(pool_connections=2, pool_maxsize=pool_maxsize, max_retries=0)
+
+
+def tune_session(session):
+    """Monta l'adapter con socket option e pool su una requests.Session."""
+    adapter = _make_adapter()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class RequestsHttp:
+    """Adattatore httplib2.Http -> requests.Session per googleapiclient."""
+
+    # Like googleapiclient's build_http(): 308 is "Resume Incomplete" for
+    # resumable uploads, never a redirect.
+    redirect_codes = frozenset({300, 301, 302, 303, 307})
+
+    def __init__(self, session, timeout: tuple[float, float] | None = None):
+        self.session = session
+        self.timeout = timeout or _timeouts()
+
+    def request(
+        self,
+        uri: str,
+        method: str = "GET",
+        body: Any = None,
+        headers: dict | None = None,
+        redirections: int = 5,
+        connection_type: Any = None,
+    ):
+        import httplib2
+
+        resp = self.session.request(
+            method,
+            uri,
+            data=body,
+            headers=headers,
+            timeout=self.timeout,
+            allow_redirects=redirections > 0,
+        )
+        info = {k.lower(): v for k, v in resp.headers.items()}
+        # requests already decoded the body (httplib2 does the same).
+        info.pop("content-encoding", None)
+        info["status"] = str(resp.status_code)
+        out = httplib2.Response(info)
+        out.reason = resp.reason or ""
+        return out, resp.content
+
+    def close(self) -> None:
+        self.session.close()
+
+
+def authorized_http(credentials, name: str | None = None):
+    """
+    Oggetto http da passare a build(..., http=...), o None per il trasporto
+    storico (build(..., credentials=...) con httplib2).
+    """
+    name = name or transport_from_env()
+    if name != "requests":
+        return None
+    from google.auth.transport.requests import AuthorizedSession
+
+    return RequestsHttp(tune_session(AuthorizedSession(credentials)))
+
+
+def request_http(credentials, name: str | None = None):
+    """
+    Oggetto http autenticato per le richieste fatte a mano (upload in streaming,
+    stream_upload.py), per entrambi i trasporti. Per httplib2 si usa build_http()
+    come il client discovery: il 308 "Resume Incomplete" non va seguito.
+    """
+    http = authorized_http(credentials, name)
+    if http is not None:
+        return http
+    import google_auth_httplib2
+    from googleapiclient.http import build_http
+
+    return google_auth_httplib2.AuthorizedHttp(credentials, http=build_http())
@@ -1,12 +1,17 @@
 from __future__ import annotations
 
+import hashlib
+import os
 import re
 import shlex
-import subprocess
+import shutil
 from dataclasses import dataclass
 from pathlib import Path
 from typing import List, Tuple
 
+import metrics
+import supervise
+
 
 @dataclass
 class Segment:
@@ -17,7 +22,7 @@ class Segment:
 
 
 def _run(cmd: List[str]) -> str:
-    p = subprocess.run(cmd, capture_output=True, text=True)
+    p = supervise.run(cmd)
     if p.returncode != 0:
         raise RuntimeError(
             "Command failed:\n"
@@ -216,19 +221,57 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
     out_path.write_text("".join(lines), encoding="utf-8")
 
 
+def _tts_cache_dir() -> Path | None:
+    """TTS_CACHE_DIR (default build/cache/tts); TTS_CACHE=0 disabilita."""
+    if (os.getenv("TTS_CACHE", "1") or "1").strip() == "0":
+        return None
+    d = Path(os.getenv("TTS_CACHE_DIR") or (Path(__file__).resolve().parent.parent / "build" / "cache" / "tts"))
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+
+def _tts_timeout() -> float:
+    """TTS_TIMEOUT: secondi massimi di attesa per una risposta di gTTS (default 30)."""
+    return float(os.getenv("TTS_TIMEOUT", "30") or "30")
+
+
+def _tts_cache_key(text: str, lang: str, tld: str) -> str:
+    return hashlib.sha256(f"{lang}|{tld}|{text}".encode("utf-8")).hexdigest()[:32]
+
+
 def generate_gtts_phrase_audio(
     phrases: List[str],
     out_dir: Path,
     lang: str = "en",
     tld: str = "com",
 ) -> List[Path]:
-    from gtts import gTTS
-
+    """
+    Una MP3 per frase. Le frasi gia' sintetizzate (stesso testo/lang/tld) vengono
+    prese dalla cache TTS invece di richiamare gTTS (CTA e formule ricorrono spesso).
+    """
     out_dir.mkdir(parents=True, exist_ok=True)
+    cache_dir = _tts_cache_dir()
     paths: List[Path] = []
     for i, txt in enumerate(phrases):
         p = out_dir / f"phrase_{i:03d}.mp3"
-        gTTS(text=txt, lang=lang, tld=tld, slow=False).save(str(p))
+        cached = cache_dir / f"{_tts_cache_key(txt, lang, tld)}.mp3" if cache_dir else None
+
+        if cached is not None and cached.exists() and cached.stat().st_size > 0:
+            shutil.copyfile(cached, p)
+            metrics.inc("tts_cache_hits_total")
+        else:
+            from gtts import gTTS
+
+            # Network call: bounded by TTS_TIMEOUT and retried (same text, same file)
+            supervise.call(
+                lambda: gTTS(text=txt, lang=lang, tld=tld, slow=False, timeout=_tts_timeout()).save(str(p)),
+                what="gtts",
+            )
+            metrics.inc("tts_cache_misses_total")
+            if cached is not None:
+                tmp = cached.with_name(f".{cached.name}.tmp")
+                shutil.copyfile(p, tmp)
+                os.replace(tmp, cached)
         paths.append(p)
     return paths
 
@@ -244,7 +287,11 @@ def build_voice_and_subs_from_text(
     voice_path = work_dir / "voice.mp3"
     subs_path = work_dir / "subtitles.ass"
 
-    phrase_audio = generate_gtts_phrase_audio(phrases, phrase_dir, lang=lang, tld=tld)
+    try:
+        phrase_audio = generate_gtts_phrase_audio(phrases, phrase_dir, lang=lang, tld=tld)
+    finally:
+        # TTS runs outside main.py's run: publish the cache hit/miss counters here.
+        metrics.flush(success=None)
     concat_audio_mp3(phrase_audio, voice_path)
     segments = build_segments_from_phrase_audio(phrases, phrase_audio, gap_seconds=0.06)
     write_ass_subtitles(segments, subs_path)
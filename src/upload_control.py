@@ -0,0 +1,188 @@
+"""
+Controllo dell'upload a chunk: dimensione adattiva e tetto di banda.
+
+Con l'upload single-shot (storico) un file da 60 MB parte tutto d'un fiato:
+satura l'uplink mentre sulla stessa macchina si renderizza, e su un link
+instabile un errore a meta' fa ripartire tutto. In modalita' adattiva l'upload
+e' resumable e:
+- ogni chunk e' misurato (byte, secondi); la dimensione del successivo punta a
+  durare ~UPLOAD_CHUNK_TARGET_S secondi al throughput stimato (EWMA), sempre
+  multiplo di 256 KiB (richiesto dall'API) e dentro [min, max]
+- un chunk lento (latenza > 3x il target) o fallito dimezza la dimensione
+- con UPLOAD_MAX_MBPS un token bucket limita il rate medio, e i chunk non
+  superano ~1 s di banda concessa (niente raffiche lunghe a piena linea)
+
+Env:
+- UPLOAD_ADAPTIVE=1 abilita (implicito se UPLOAD_MAX_MBPS > 0)
+- UPLOAD_MAX_MBPS (megabit/s, 0 = nessun tetto)
+- UPLOAD_CHUNK_MIN_KB (256), UPLOAD_CHUNK_MAX_KB (32768), UPLOAD_CHUNK_INITIAL_KB (2048)
+- UPLOAD_CHUNK_TARGET_S (4), UPLOAD_MAX_RETRIES (8)
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from pathlib import Path
+
+import metrics
+
+CHUNK_QUANTUM = 256 * 1024
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)) or default)
+
+
+def max_rate_from_env() -> float:
+    """Tetto di banda in byte/s (0 = nessuno)."""
+    return max(0.0, _env_float("UPLOAD_MAX_MBPS", 0.0)) * 1e6 / 8
+
+
+def adaptive_enabled() -> bool:
+    return (os.getenv("UPLOAD_ADAPTIVE", "0") or "0").strip() == "1" or max_rate_from_env() > 0
+
+
+def _quantize(n: float) -> int:
+    return max(CHUNK_QUANTUM, int(n) // CHUNK_QUANTUM * CHUNK_QUANTUM)
+
+
+class ChunkController:
+    """Sceglie la dimensione del prossimo chunk dal throughput misurato."""
+
+    def __init__(
+        self,
+        initial: int = 2048 * 1024,
+        minimum: int = CHUNK_QUANTUM,
+        maximum: int = 32 * 1024 * 1024,
+        target_seconds: float = 4.0,
+        max_rate: float = 0.0,
+        alpha: float = 0.5,
+    ):
+        self.minimum = _quantize(minimum)
+        self.maximum = max(self.minimum, _quantize(maximum))
+        if max_rate > 0:
+            # Never hold the link for more than ~1 s of the allowed rate.
+            self.maximum = max(self.minimum, min(self.maximum, _quantize(max_rate)))
+        self.target_seconds = target_seconds
+        self.alpha = alpha
+        self.throughput = 0.0  # bytes/s, EWMA
+        self.chunk_size = self._clamp(initial)
+
+    @classmethod
+    def from_env(cls) -> "ChunkController":
+        kb = 1024
+        return cls(
+            initial=int(_env_float("UPLOAD_CHUNK_INITIAL_KB", 2048) * kb),
+            minimum=int(_env_float("UPLOAD_CHUNK_MIN_KB", 256) * kb),
+            maximum=int(_env_float("UPLOAD_CHUNK_MAX_KB", 32768) * kb),
+            target_seconds=_env_float("UPLOAD_CHUNK_TARGET_S", 4.0),
+            max_rate=max_rate_from_env(),
+        )
+
+    def _clamp(self, n: float) -> int:
+        return min(self.maximum, max(self.minimum, _quantize(n)))
+
+    def record(self, nbytes: int, seconds: float) -> int:
+        """Chunk riuscito: aggiorna la stima e ritorna la nuova dimensione."""
+        seconds = max(seconds, 1e-3)
+        rate = nbytes / seconds
+        self.throughput = rate if self.throughput <= 0 else self.alpha * rate + (1 - self.alpha) * self.throughput
+        if seconds > 3 * self.target_seconds:
+            # Stalled chunk: back off hard, whatever the average says.
+            self.chunk_size = self._clamp(self.chunk_size / 2)
+        else:
+            # Grow at most 2x per step so one fast burst doesn't overshoot.
+            self.chunk_size = self._clamp(min(self.throughput * self.target_seconds, self.chunk_size * 2))
+        return self.chunk_size
+
+    def record_failure(self) -> int:
+        self.chunk_size = self._clamp(self.chunk_size / 2)
+        return self.chunk_size
+
+
+class TokenBucket:
+    """Limita il rate medio in byte/s; consume() dorme quanto serve."""
+
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else rate
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, n: int) -> float:
+        """Preleva n byte di credito; ritorna i secondi dormiti."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= n
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+def adaptive_media(path: Path, controller: ChunkController, mimetype: str = "video/mp4"):
+    """MediaFileUpload resumable la cui chunksize() segue il controller."""
+    from googleapiclient.http import MediaFileUpload
+
+    class _AdaptiveMediaFileUpload(MediaFileUpload):
+        def chunksize(self) -> int:
+            return controller.chunk_size
+
+    return _AdaptiveMediaFileUpload(str(path), mimetype=mimetype, chunksize=controller.chunk_size, resumable=True)
+
+
+def run_resumable(request, controller: ChunkController, bucket: TokenBucket | None = None, max_retries: int | None = None):
+    """
+    Esegue una richiesta resumable chunk per chunk, adattando la dimensione.
+
+    Errori 5xx/429 e di rete: retry con backoff esponenziale (il client riprende
+    dall'ultimo offset confermato), chunk dimezzato, metrica upload_retries_total.
+    Ritorna la risposta finale dell'API.
+    """
+    import random
+
+    from googleapiclient.errors import HttpError
+
+    if max_retries is None:
+        max_retries = int(os.getenv("UPLOAD_MAX_RETRIES", "8") or "8")
+
+    response = None
+    retries = 0
+    while response is None:
+        size = controller.chunk_size
+        if bucket is not None:
+            bucket.consume(size)
+        before = request.resumable_progress
+        t0 = time.perf_counter()
+        try:
+            _status, response = request.next_chunk(num_retries=0)
+        except (HttpError, OSError) as e:
+            status = getattr(getattr(e, "resp", None), "status", None)
+            if isinstance(e, HttpError) and status not in (429, 500, 502, 503, 504):
+                raise
+            retries += 1
+            metrics.inc("upload_retries_total")
+            if retries > max_retries:
+                raise
+            controller.record_failure()
+            delay = min(60.0, 2 ** retries) * (0.5 + random.random() / 2)
+            print(f"[Monday] chunk fallito ({status or type(e).__name__}), retry {retries}/{max_retries} tra {delay:.1f}s")
+            time.sleep(delay)
+            continue
+
+        if response is None:
+            sent = request.resumable_progress - before
+        else:
+            sent = min(size, request.resumable.size() - before)
+        controller.record(max(sent, 1), time.perf_counter() - t0)
+        retries = 0
+
+    metrics.set_gauge("upload_chunk_size_bytes", controller.chunk_size)
+    return response
@@ -9,17 +9,24 @@ Viene usato sia in locale che su GitHub Actions.
 
 from __future__ import annotations
 
+import os
+import time
 from pathlib import Path
-from typing import List, Optional
+from typing import TYPE_CHECKING, List, Optional
 
-from subtitles import generate_subtitles_txt_from_text
+import metrics
+import supervise
+import transport
+import upload_control
 
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaFileUpload
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
+# Compat: generate_script viveva qui. Il modulo script_gen non tocca Google.
+from script_gen import generate_script  # noqa: F401
+
+# I client Google (googleapiclient, google.oauth2, google_auth_oauthlib) costano
+# centinaia di ms all'import: vengono importati solo al primo uso, dentro le
+# funzioni. I run render-only (UPLOAD_YT=0, batch, script) non li caricano mai.
+if TYPE_CHECKING:
+    from google.oauth2.credentials import Credentials
 
 # Cartella src/
 BASE_DIR = Path(__file__).resolve().parent
@@ -38,29 +45,69 @@ SCOPES = ["https://www.googleapis.com/auth/youtube.upload"]
 # ---------------------------------------------------------------------------
 
 
-def _get_oauth_credentials() -> Credentials:
+# "token file|transport|endpoint" -> YouTube client (per-account cache)
+_SERVICES: dict[str, object] = {}
+
+
+class UploadLimitExceeded(RuntimeError):
+    """L'account ha raggiunto il limite di upload (uploadLimitExceeded / quotaExceeded)."""
+
+
+def _get_oauth_credentials(
+    token_file: Path = TOKEN_FILE,
+    client_secret_file: Path = CLIENT_SECRET_FILE,
+) -> Credentials:
     """Carica le credenziali OAuth da token.json, eventualmente le refresh-a."""
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+
     creds: Optional[Credentials] = None
 
-    if TOKEN_FILE.exists():
-        creds = Credentials.from_authorized_user_file(str(TOKEN_FILE), SCOPES)
+    if token_file.exists():
+        creds = Credentials.from_authorized_user_file(str(token_file), SCOPES)
 
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
             creds.refresh(Request())
         else:
-            flow = InstalledAppFlow.from_client_secrets_file(str(CLIENT_SECRET_FILE), SCOPES)
+            flow = InstalledAppFlow.from_client_secrets_file(str(client_secret_file), SCOPES)
             creds = flow.run_local_server(port=0)
 
-        TOKEN_FILE.write_text(creds.to_json(), encoding="utf-8")
+        token_file.write_text(creds.to_json(), encoding="utf-8")
 
     return creds
 
 
-def _get_youtube_service():
-    """Crea il client YouTube autenticato con OAuth."""
-    creds = _get_oauth_credentials()
-    return build("youtube", "v3", credentials=creds)
+def _get_youtube_service(
+    token_file: Path = TOKEN_FILE,
+    client_secret_file: Path = CLIENT_SECRET_FILE,
+    transport_name: str | None = None,
+):
+    """
+    Crea il client YouTube autenticato con OAuth (uno per token, riusato).
+
+    Le credenziali si rinnovano da sole ad ogni richiesta; il client non e'
+    thread-safe, ma il dispatcher multi-account usa un thread per account.
+    transport_name: httplib2 (storico) | requests (pool keep-alive, transport.py);
+    default YT_TRANSPORT.
+    """
+    from googleapiclient.discovery import build
+
+    transport_name = transport_name or transport.transport_from_env()
+    key = f"{Path(token_file).resolve()}|{transport_name}|{transport.api_endpoint()}"
+    service = _SERVICES.get(key)
+    if service is None:
+        creds = _get_oauth_credentials(token_file, client_secret_file)
+        http = transport.authorized_http(creds, transport_name)
+        endpoint = transport.api_endpoint()
+        options = {"api_endpoint": endpoint} if endpoint else None
+        if http is None:
+            service = build("youtube", "v3", credentials=creds, client_options=options)
+        else:
+            service = build("youtube", "v3", http=http, client_options=options)
+        _SERVICES[key] = service
+    return service
 
 
 # ---------------------------------------------------------------------------
@@ -68,8 +115,12 @@ def _get_youtube_service():
 # ---------------------------------------------------------------------------
 
 
-def _check_video_file(video_path: str | Path) -> bool:
-    """Controlla che il file video esista e non sia vuoto/corrotto."""
+def _check_video_file(video_path: str | Path, expected_duration: float | None = None) -> bool:
+    """
+    Controlla che il file video esista e non sia vuoto/corrotto.
+    Poi validazione profonda (mp4check): struttura/faststart, stream attesi,
+    durata e decodifica dell'ultimo GOP. VALIDATE_DEEP=0 la disattiva.
+    """
     p = Path(video_path)
 
     if not p.exists():
@@ -83,29 +134,65 @@ def _check_video_file(video_path: str | Path) -> bool:
         print("[Monday] ERRORE: file video troppo piccolo / probabilmente corrotto.")
         return False
 
+    if (os.getenv("VALIDATE_DEEP", "1") or "1").strip() == "1":
+        import mp4check  # dataclasses -> inspect: ~13 ms that script-only runs don't need
+
+        t0 = time.perf_counter()
+        res = mp4check.validate_mp4(
+            p,
+            expected_size=mp4check.expected_size_from_env(),
+            expected_duration=expected_duration,
+        )
+        ms = (time.perf_counter() - t0) * 1000
+        if not res.ok:
+            for err in res.errors:
+                print(f"[Monday] ERRORE validazione: {err}")
+            metrics.record_failure("invalid_video")
+            return False
+        print(
+            f"[Monday] Validazione ok in {ms:.0f} ms: {res.width}x{res.height}, "
+            f"{res.duration:.2f}s, box {'/'.join(res.boxes)}"
+        )
+
     return True
 
 
+# ---------------------------------------------------------------------------
+# THUMBNAIL
+# ---------------------------------------------------------------------------
+
+
+def _set_thumbnail(youtube, video_id: str, thumbnail_path: str | Path) -> None:
+    """Imposta la thumbnail custom. Non blocca mai l'upload (account non verificati => 403)."""
+    from googleapiclient.errors import HttpError
+    from googleapiclient.http import MediaFileUpload
+
+    p = Path(thumbnail_path)
+    if not p.exists():
+        print(f"[Monday] Thumbnail non trovata, salto: {p}")
+        return
+    try:
+        youtube.thumbnails().set(
+            videoId=video_id,
+            media_body=MediaFileUpload(str(p), mimetype="image/jpeg"),
+        ).execute()
+        print(f"[Monday] Thumbnail impostata: {p}")
+    except HttpError as e:
+        print(f"[Monday] Thumbnail non impostata (ignoro): {e}")
+
+
 # ---------------------------------------------------------------------------
 # UPLOAD VIDEO
 # ---------------------------------------------------------------------------
 
 
-def upload_video(
-    video_path: str | Path,
+def _video_body(
     title: str,
     description: str,
     tags: Optional[List[str]] = None,
     privacy_status: str = "public",
-) -> str:
-    """Carica un video su YouTube e restituisce l'ID del video."""
-    video_path = Path(video_path)
-
-    if not _check_video_file(video_path):
-        raise RuntimeError("[Monday] Upload annullato: file video non valido.")
-
-    youtube = _get_youtube_service()
-
+) -> dict:
+    """snippet/status per videos.insert, con titolo/descrizione/tag ripuliti."""
     safe_title = (str(title) if title is not None else "").strip() or "Deadpan Auto Test"
     safe_title = safe_title[:95]
 
@@ -131,356 +218,175 @@ def upload_video(
         },
         "status": {"privacyStatus": privacy_status},
     }
+    return body
+
+
+def _limit_reason(msg: str) -> str | None:
+    if "uploadLimitExceeded" in msg:
+        return "uploadLimitExceeded"
+    if "quotaExceeded" in msg:
+        return "quotaExceeded"
+    return None
+
+
+def upload_video(
+    video_path: str | Path,
+    title: str,
+    description: str,
+    tags: Optional[List[str]] = None,
+    privacy_status: str = "public",
+    thumbnail_path: str | Path | None = None,
+    expected_duration: float | None = None,
+    token_file: str | Path | None = None,
+    client_secret_file: str | Path | None = None,
+    raise_on_limit: bool = False,
+    transport_name: str | None = None,
+) -> str:
+    """
+    Carica un video su YouTube e restituisce l'ID del video.
 
-    media = MediaFileUpload(str(video_path), chunksize=-1, resumable=False)
+    token_file / client_secret_file: account da usare (default src/token.json).
+    raise_on_limit: con il limite di upload raggiunto solleva UploadLimitExceeded
+    invece di restituire "" (serve al dispatcher multi-account).
+    transport_name: trasporto HTTP (vedi transport.py), default YT_TRANSPORT.
+    """
+    from googleapiclient.errors import HttpError
+    from googleapiclient.http import MediaFileUpload
+
+    video_path = Path(video_path)
+
+    if not _check_video_file(video_path, expected_duration=expected_duration):
+        raise RuntimeError("[Monday] Upload annullato: file video non valido.")
+
+    youtube = _get_youtube_service(
+        Path(token_file) if token_file else TOKEN_FILE,
+        Path(client_secret_file) if client_secret_file else CLIENT_SECRET_FILE,
+        transport_name,
+    )
+
+    body = _video_body(title, description, tags, privacy_status)
+
+    adaptive = upload_control.adaptive_enabled()
+    if adaptive:
+        controller = upload_control.ChunkController.from_env()
+        rate = upload_control.max_rate_from_env()
+        bucket = upload_control.TokenBucket(rate) if rate > 0 else None
+        media = upload_control.adaptive_media(video_path, controller)
+    else:
+        media = MediaFileUpload(str(video_path), chunksize=-1, resumable=False)
+
+    size = video_path.stat().st_size
 
     try:
         print("Inizio upload...")
+        t0 = time.perf_counter()
         request = youtube.videos().insert(
             part="snippet,status",
             body=body,
             media_body=media,
         )
-        response = request.execute()
+        if adaptive:
+            response = upload_control.run_resumable(request, controller, bucket)
+        else:
+            response = request.execute()
+        elapsed = max(1e-6, time.perf_counter() - t0)
+        metrics.inc("bytes_uploaded_total", size)
+        metrics.set_gauge("upload_throughput_bytes_per_second", size / elapsed)
         video_id = response["id"]
         print(f"âœ… Upload completato. ID video: {video_id}")
+        if thumbnail_path:
+            _set_thumbnail(youtube, video_id, thumbnail_path)
         return video_id
     except HttpError as e:
         msg = str(e)
         print(f"âŒ Errore durante l'upload: {msg}")
 
-        if "uploadLimitExceeded" in msg:
+        reason = _limit_reason(msg)
+        if reason:
+            metrics.record_failure(reason)
+            if raise_on_limit:
+                raise UploadLimitExceeded(reason) from e
             print(
                 "[YouTube] Limite di upload raggiunto per questo account. "
                 "La pipeline Ã¨ ok, ma YouTube al momento non accetta nuovi video."
             )
             return ""
 
+        metrics.record_failure(f"http_{getattr(e.resp, 'status', 'error')}")
         raise
 
 
-# ---------------------------------------------------------------------------
-# GENERAZIONE TESTO (SCRIPT) DEADPAN FILES â€” "VITA NATURAL DURANTE"
-# ---------------------------------------------------------------------------
-
-
-def generate_script():
+def upload_stream(
+    encode_cmd: list[str],
+    title: str,
+    description: str,
+    tags: Optional[List[str]] = None,
+    privacy_status: str = "public",
+    expected_duration: float | None = None,
+    token_file: str | Path | None = None,
+    client_secret_file: str | Path | None = None,
+    raise_on_limit: bool = False,
+    transport_name: str | None = None,
+) -> str:
     """
-    Obiettivo: storie SEMPRE diverse, senza intervento umano:
-    - spazio combinatorio enorme (procedurale)
-    - 12+ strutture diverse (non template fisso)
-    - dettagli variabili (nomi, luoghi, prove, contraddizioni, conseguenze)
-    - output breve e ritmato (TTS + sottotitoli)
+    Come upload_video, ma l'upload parte mentre il video viene codificato
+    (stream_upload.py). encode_cmd e' il comando ffmpeg finale con il file di
+    uscita come ultimo argomento: il file viene scritto comunque, e la
+    validazione (_check_video_file) decide se chiudere la sessione.
+    La thumbnail si imposta dopo, con set_thumbnail().
     """
-    import hashlib
-    import os
-    import random
-    import textwrap
-    from datetime import datetime, timezone
-
-    # Seed unico per ogni run (time + entropy). Non dipende dalla memoria tra run.
-    stamp = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
-    entropy = os.urandom(16).hex()
-    seed_material = f"{stamp}-{entropy}-{os.getpid()}"
-    seed = int(hashlib.sha256(seed_material.encode("utf-8")).hexdigest()[:16], 16)
-    rng = random.Random(seed)
-
-    # ----------------------------
-    # VOCABOLARI (procedurali)
-    # ----------------------------
-    agencies = [
-        "Records Division", "Missing Persons Unit", "Evidence Control", "Night Dispatch",
-        "County Forensics", "Transit Police", "Hospital Security", "Incident Review Board",
-        "Cold Case Taskforce", "Internal Affairs", "Property & Storage", "Audio Lab"
-    ]
-
-    place_types = [
-        "motel", "train station", "hospital wing", "parking garage", "storage unit",
-        "public library", "paper mill", "cinema", "subway platform", "riverside trail",
-        "weather station", "county archive", "old courthouse", "service tunnel"
-    ]
-    place_adjs = [
-        "shuttered", "abandoned", "flooded", "sealed", "renovated", "quiet", "condemned",
-        "temporary", "off-limits", "unfinished", "unmarked", "windowless", "underground"
-    ]
-    neighborhoods = [
-        "north side", "east district", "old town", "industrial strip", "coastal road",
-        "rural outskirts", "downtown grid", "hillside blocks", "harbor line", "factory row"
-    ]
-
-    evidence_items = [
-        "cassette tape", "burned CD", "memory card", "disposable camera", "keycard",
-        "voicemail transcript", "radio log", "lab report", "polaroid", "door access record",
-        "evidence bag", "handwritten note", "pager", "receipt", "security export"
-    ]
-    evidence_verbs = [
-        "was tagged", "was sealed", "was logged", "was duplicated", "was misfiled",
-        "was re-labeled", "was re-sealed", "was transferred", "was archived", "was destroyed"
-    ]
-
-    anomalies = [
-        "a shadow with no source", "a timestamp that goes backwards", "breathing behind the mic",
-        "footsteps approaching the recorder", "a second voice that never speaks again",
-        "a reflection that shows another room", "a door that opens on a closed corridor",
-        "a name that shouldnâ€™t exist", "a camera angle from impossible distance",
-        "a fingerprint set that matches itself", "a file created tomorrow", "a call from a dead number"
-    ]
-
-    contradictions = [
-        "the report says one thing, the evidence says another",
-        "the timeline breaks in one place",
-        "every witness agreesâ€”on the wrong detail",
-        "the photo doesnâ€™t match the room",
-        "the audio contains no voices, only proximity",
-        "the access log shows entry, the camera shows nobody",
-        "the signature belongs to someone not on payroll",
-        "the file hash matches an older case, perfectly",
-        "the printout is dated next week",
-        "the metadata lists a device that was never manufactured"
-    ]
-
-    consequences = [
-        "the officer requested a transfer at sunrise",
-        "the guard quit without notice",
-        "the family received letters addressed to the missing person",
-        "the evidence room was re-locked and re-numbered",
-        "the entire shift was reassigned",
-        "the archive clerk stopped coming to work",
-        "the station closed early, once, and never explained why",
-        "the case number was sealed againâ€”under a new label",
-        "the tape was returned with fresh fingerprints",
-        "the report vanished from the system overnight"
-    ]
-
-    tones = [
-        "clinical", "confessional", "dispatch", "memo", "transcript", "casefile",
-        "foundfootage", "forensics", "redacted", "afteraction", "catalog", "witness"
-    ]
-
-    ctas = [
-        "Follow Deadpan Files. Another box is waiting.",
-        "Follow Deadpan Files. The next file has your city in it.",
-        "Follow Deadpan Files. This wasnâ€™t the last recording.",
-        "Follow Deadpan Files. The next case starts with a name youâ€™ll recognize.",
-        "Follow Deadpan Files. Weâ€™re opening the next drawer tonight.",
-        "Follow Deadpan Files for more archived horror."
-    ]
-
-    # nomi procedurali (combinazione enorme)
-    first_names = [
-        "Evan", "Noah", "Mason", "Liam", "Caleb", "Lucas", "Aiden", "Owen", "Miles", "Nate",
-        "Hannah", "Maya", "Ava", "Nina", "Claire", "Elena", "Lena", "Sofia", "Iris", "June"
-    ]
-    last_names = [
-        "Harper", "Caldwell", "Reyes", "Bennett", "Hughes", "Moreno", "Sullivan", "Park",
-        "Fletcher", "Sinclair", "Rowe", "Keller", "Vaughn", "Pierce", "Donovan", "Hale"
-    ]
-
-    def pick(pool: list[str]) -> str:
-        return rng.choice(pool)
-
-    def make_case_code() -> str:
-        return f"{rng.randint(1, 99):02d}-{rng.randint(1, 28):02d}-{rng.randint(10, 99)}"
-
-    def make_year() -> int:
-        return rng.choice([1987, 1991, 1994, 1998, 2001, 2006, 2011, 2016, 2019, 2021])
-
-    def make_time() -> str:
-        return f"{rng.randint(0, 4):02d}:{rng.choice([13, 17, 22, 31, 44, 58]):02d}"
-
-    def make_place() -> str:
-        return f"a {pick(place_adjs)} {pick(place_types)} on the {pick(neighborhoods)}"
-
-    def make_person() -> str:
-        return f"{pick(first_names)} {pick(last_names)}"
-
-    def tighten(s: str, max_len: int = 140) -> str:
-        s = " ".join(s.replace("â€”", ". ").replace("â€¦", "...").split())
-        if len(s) <= max_len:
-            return s
-        return textwrap.shorten(s, width=max_len, placeholder="...")
-
-    # ----------------------------
-    # COSTRUZIONE â€œFATTIâ€
-    # ----------------------------
-    agency = pick(agencies)
-    case_code = make_case_code()
-    year = make_year()
-    t = make_time()
-    place = make_place()
-    item = pick(evidence_items)
-    anomaly = pick(anomalies)
-    contradiction = pick(contradictions)
-    consequence = pick(consequences)
-    person = make_person()
-
-    # Hook: 2 frasi, sempre variabili
-    hook_patterns = [
-        "Case file {code} was sealed in {year}. It still keeps changing.",
-        "They archived {code} under {agency}. The metadata rewrote itself.",
-        "The call log says {t}. The recording begins before we answered.",
-        "We found a {item} in {place}. It was already labeled with our case number.",
-        "The report lists {person} as a witness. {person} died in {year}.",
-        "Footage from {place} is cleanâ€”until the last ten seconds."
-    ]
-    hook = tighten(pick(hook_patterns).format(
-        code=case_code, year=year, agency=agency, t=t, item=item, place=place, person=person
-    ), 170)
-
-    # â€œEvidence beatâ€ e â€œEscalation beatâ€
-    evidence_patterns = [
-        "The {item} {verb} and stored under {agency}. Then it moved shelves by itself.",
-        "Every frame shows {anomaly}. The room has no object that could cast it.",
-        "The access log shows a keycard swipe at {t}. The camera shows nobody entering.",
-        "The audio contains only {anomaly}. No words. No voices. Just proximity.",
-        "The phone placed seven calls after the official time of death. Same number. Same ring."
-    ]
-    evidence = tighten(pick(evidence_patterns).format(
-        item=item, verb=pick(evidence_verbs), agency=agency, anomaly=anomaly, t=t
-    ), 190)
-
-    escalation_patterns = [
-        "We checked again. {contradiction}.",
-        "Forensics flagged the file. {contradiction}.",
-        "When we enhanced the audio, the noise shaped into a second rhythm.",
-        "The timeline doesnâ€™t drift. It snaps.",
-        "The case appears in another archiveâ€”same hash, different year.",
-    ]
-    escalation = tighten(pick(escalation_patterns).format(contradiction=contradiction), 170)
-
-    # Twist + ending
-    twist_patterns = [
-        "Then the evidence did something it canâ€™t do: it addressed us by name.",
-        "The last frame shows the victim looking into the lensâ€”filmed from behind.",
-        "The whisper wasnâ€™t a word. It was a dateâ€”tomorrow.",
-        "The calls werenâ€™t from the victim. They were from the evidence room.",
-        "The signature belongs to an officer who never existed on payroll.",
-        "The fileâ€™s creation date is tomorrow. We verified the server clock.",
-    ]
-    twist = tighten(pick(twist_patterns), 170)
-
-    end_patterns = [
-        "At sunrise, {consequence}.",
-        "By morning, {consequence}.",
-        "After we logged it, {consequence}.",
-        "We sealed the drawer again. Two days later, the label changed.",
-        "We requested the original export. What we received was shorterâ€”missing one second."
-    ]
-    ending = tighten(pick(end_patterns).format(consequence=consequence), 190)
-
-    cta = pick(ctas)
+    import stream_upload
 
-    # ----------------------------
-    # 12 STRUTTURE DIVERSE
-    # ----------------------------
-    formats = []
-
-    formats.append(f"{hook} {evidence} {escalation} {twist} {ending} {cta}")
-
-    formats.append(
-        f"Night dispatch log â€” {agency}. {hook} "
-        f"Unit reports activity at {place}. {evidence} {twist} {ending} {cta}"
-    )
-
-    formats.append(
-        f"Transcript excerpt â€” case {case_code}. {hook} "
-        f"{evidence} {escalation} {twist} {cta}"
-    )
-
-    formats.append(
-        f"Archived memo from {agency}. Subject: {place}. "
-        f"{hook} {evidence} {ending} {cta}"
-    )
-
-    formats.append(
-        f"Found footage note. Seized item: {item}. Location: {place}. "
-        f"{hook} {evidence} {twist} {cta}"
-    )
-
-    formats.append(
-        f"Evidence catalog entry {case_code}. {item} â€” status: sealed. "
-        f"{hook} {escalation} {twist} {ending} {cta}"
-    )
-
-    formats.append(
-        f"Witness statement: {person}. {hook} "
-        f"{evidence} {twist} {ending} {cta}"
-    )
-
-    formats.append(
-        f"Forensics addendum. {hook} "
-        f"Anomaly observed: {anomaly}. {escalation} {twist} {cta}"
-    )
-
-    formats.append(
-        f"Redacted report. {hook} "
-        f"{evidence} [REDACTED]. {twist} {ending} {cta}"
+    out_path = Path(encode_cmd[-1])
+    creds = _get_oauth_credentials(
+        Path(token_file) if token_file else TOKEN_FILE,
+        Path(client_secret_file) if client_secret_file else CLIENT_SECRET_FILE,
     )
+    http = transport.request_http(creds, transport_name)
+    body = _video_body(title, description, tags, privacy_status)
 
-    formats.append(
-        f"After-action summary. {hook} "
-        f"{escalation} Outcome: {ending} {cta}"
-    )
-
-    formats.append(
-        f"Audio lab note. {hook} "
-        f"Source artifact: {item}. {evidence} {twist} {cta}"
-    )
-
-    formats.append(
-        f"Cold case brief. {hook} "
-        f"Primary contradiction: {contradiction}. {twist} {ending} {cta}"
-    )
+    try:
+        print("Inizio upload in streaming...")
+        response = stream_upload.encode_and_upload(
+            stream_upload.fragmented_pipe(encode_cmd),
+            out_path,
+            http,
+            body,
+            validate=lambda p: _check_video_file(p, expected_duration=expected_duration),
+            media_seconds=expected_duration,
+        )
+    except stream_upload.StreamUploadError as e:
+        msg = str(e)
+        print(f"âŒ Errore durante l'upload: {msg}")
+        reason = _limit_reason(msg)
+        if reason:
+            metrics.record_failure(reason)
+            if raise_on_limit:
+                raise UploadLimitExceeded(reason) from e
+            print("[YouTube] Limite di upload raggiunto per questo account.")
+            return ""
+        metrics.record_failure(f"http_{e.status}")
+        raise
 
-    # Scegli formato e â€œripulisciâ€ per TTS
-    script = pick(formats)
-    script = " ".join(script.replace("â€”", ". ").replace("â€¦", "...").split()).strip()
-
-    # ----------------------------
-    # TITOLI: tantissimi pattern + variabili
-    # ----------------------------
-    title_patterns = [
-        "The {item} That Rewrote The Case",
-        "The Case File That Kept Changing",
-        "The Footage From {place_type}",
-        "The Call From A Dead Number",
-        "The Evidence Room Incident",
-        "The Transcript With One Missing Second",
-        "The Night Dispatch Log They Wonâ€™t Explain",
-        "The Timestamp That Went Backwards",
-        "The Report Signed By Nobody",
-        "The Tape That Knew Tomorrow"
-    ]
-    title = pick(title_patterns).format(
-        item=item.title(),
-        place_type=pick(place_types).title(),
+    video_id = response["id"]
+    print(f"âœ… Upload completato. ID video: {video_id}")
+    return video_id
+
+
+def set_thumbnail(
+    video_id: str,
+    thumbnail_path: str | Path,
+    token_file: str | Path | None = None,
+    client_secret_file: str | Path | None = None,
+    transport_name: str | None = None,
+) -> None:
+    """Thumbnail per un video gia' caricato (upload in streaming)."""
+    youtube = _get_youtube_service(
+        Path(token_file) if token_file else TOKEN_FILE,
+        Path(client_secret_file) if client_secret_file else CLIENT_SECRET_FILE,
+        transport_name,
     )
-    title = tighten(title, 88)
-
-    # Descrizione: breve, â€œserialeâ€, monetizzabile
-    description = "\n".join([
-        hook,
-        evidence,
-        twist,
-        "",
-        "Deadpan Files â€” short true crime / horror case files.",
-        "New files drop automatically. Follow for the next report."
-    ])
-
-    # Tags: variabili, ma pulite
-    base_tags = [
-        "deadpan files", "true crime", "horror story", "mystery", "unexplained", "shorts",
-        "case file", "found footage", "evidence", "dispatch log", "creepy", "archived"
-    ]
-    # aggiungi 2-3 tag dinamici (sempre diversi)
-    dynamic_tags = [
-        item.lower(),
-        pick(place_types),
-        pick(["cctv", "voicemail", "audio tape", "cold case", "case report", "evidence room"]),
-    ]
-    tags = list(dict.fromkeys(base_tags + dynamic_tags))[:20]
-
-    return script, title, description, tags
+    _set_thumbnail(youtube, video_id, thumbnail_path)
 
 
 # ---------------------------------------------------------------------------
@@ -497,6 +403,7 @@ def synth_voice(text, output_path):
     from gtts import gTTS
     import subprocess as _subprocess
     import textwrap as _textwrap
+    from subtitles import generate_subtitles_txt_from_text
 
     text = (text or "").strip()
     if not text:
@@ -545,8 +452,11 @@ def synth_voice(text, output_path):
     for idx, chunk in enumerate(chunks, start=1):
         part_mp3 = tmp_dir / f"voice_part_{idx:02d}.mp3"
         print(f"[Monday/voice] Genero chunk {idx}/{len(chunks)} (len={len(chunk)})...")
-        tts = gTTS(text=chunk, lang="en", slow=False)
-        tts.save(str(part_mp3))
+        tts_timeout = float(os.getenv("TTS_TIMEOUT", "30") or "30")
+        supervise.call(
+            lambda: gTTS(text=chunk, lang="en", slow=False, timeout=tts_timeout).save(str(part_mp3)),
+            what="gtts",
+        )
         part_paths.append(part_mp3)
 
     concat_list = tmp_dir / "voice_concat.txt"
@@ -562,7 +472,9 @@ def synth_voice(text, output_path):
         str(tmp_mp3),
     ]
     print("[Monday/voice] Concateno i chunk audio con ffmpeg...")
-    _subprocess.run(cmd_concat, check=True)
+    p = supervise.run(cmd_concat, capture=False)
+    if p.returncode != 0:
+        raise _subprocess.CalledProcessError(p.returncode, cmd_concat)
 
     cmd_wav = [
         "ffmpeg", "-y",
@@ -572,7 +484,9 @@ def synth_voice(text, output_path):
         str(output_path),
     ]
     print("[Monday/voice] Converto l'audio in WAV 48 kHz mono...")
-    _subprocess.run(cmd_wav, check=True)
+    p = supervise.run(cmd_wav, capture=False)
+    if p.returncode != 0:
+        raise _subprocess.CalledProcessError(p.returncode, cmd_wav)
 
     for p in part_paths:
         try:
@@ -0,0 +1,204 @@
+"""
+Watch daemon per videos_to_upload/ e files_to_upload/.
+
+Invece di aspettare il cron (15/19/23 UTC), parte appena un file viene chiuso in
+scrittura o spostato dentro una delle cartelle:
+- videos_to_upload/ -> pipeline video (src/main.py), solo per i file che la
+  pipeline consuma davvero (voice/audio/video sorgente, subtitles, video-info)
+- files_to_upload/  -> bulk_mover.move_all()
+
+Linux: inotify (IN_CLOSE_WRITE | IN_MOVED_TO) via ctypes, zero dipendenze.
+Altrove (o WATCH_POLL=1): polling di size/mtime, un file e' "pronto" quando e'
+stabile per due giri consecutivi.
+Gli eventi sono raggruppati (debounce, WATCH_DEBOUNCE secondi): una cartella
+piena di copie lancia UN job, non uno per file.
+
+Uso:
+    python src/watcher.py
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import bulk_mover
+import config
+import main as pipeline
+
+
+SRC_DIR = Path(__file__).resolve().parent
+VIDEOS_DIR = pipeline.VIDEOS_DIR
+FILES_DIR = bulk_mover.resolve_folder(config.FILES_FOLDER)
+
+# Only these names start the video pipeline; its own outputs never retrigger it.
+VIDEO_TRIGGERS = {
+    *pipeline.AUDIO_CANDIDATES,
+    *pipeline.VIDEO_CANDIDATES,
+    "subtitles.txt",
+    "subtitles_wrapped.ass",
+    "video-info.txt",
+}
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+_EVENT = struct.Struct("iIII")
+
+
+def _ignored(name: str) -> bool:
+    return name.startswith(".") or name.endswith((".tmp", ".part", "~"))
+
+
+class _InotifyBackend:
+    def __init__(self, dirs: list[Path]):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._wd: dict[int, Path] = {}
+        for d in dirs:
+            wd = libc.inotify_add_watch(self._fd, os.fsencode(str(d)), IN_CLOSE_WRITE | IN_MOVED_TO)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {d}")
+            self._wd[wd] = d
+
+    def wait(self, timeout: float) -> list[tuple[Path, str]]:
+        ready, _, _ = select.select([self._fd], [], [], max(0.0, timeout))
+        if not ready:
+            return []
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events: list[tuple[Path, str]] = []
+        off = 0
+        while off + _EVENT.size <= len(data):
+            wd, mask, _cookie, length = _EVENT.unpack_from(data, off)
+            off += _EVENT.size
+            name = data[off:off + length].rstrip(b"\0").decode("utf-8", errors="replace")
+            off += length
+            if mask & IN_Q_OVERFLOW:
+                # Kernel queue overflowed: treat as "something changed everywhere".
+                events.extend((d, "") for d in self._wd.values())
+            elif wd in self._wd and name:
+                events.append((self._wd[wd], name))
+        return events
+
+
+class _PollingBackend:
+    def __init__(self, dirs: list[Path], interval: float = 2.0):
+        self._dirs = dirs
+        self._interval = interval
+        self._seen = {d: self._snapshot(d) for d in dirs}
+        self._changing: dict[tuple[Path, str], tuple[int, int]] = {}
+
+    @staticmethod
+    def _snapshot(d: Path) -> dict[str, tuple[int, int]]:
+        out: dict[str, tuple[int, int]] = {}
+        try:
+            for p in d.iterdir():
+                if p.is_file():
+                    st = p.stat()
+                    out[p.name] = (st.st_size, st.st_mtime_ns)
+        except OSError:
+            pass
+        return out
+
+    def wait(self, timeout: float) -> list[tuple[Path, str]]:
+        time.sleep(min(self._interval, max(0.0, timeout)))
+        events: list[tuple[Path, str]] = []
+        for d in self._dirs:
+            now = self._snapshot(d)
+            for name, sig in now.items():
+                key = (d, name)
+                if self._seen[d].get(name) == sig:
+                    continue
+                # Report only once size/mtime stopped moving ("closed for write").
+                if self._changing.get(key) == sig:
+                    events.append(key)
+                    self._changing.pop(key, None)
+                    self._seen[d][name] = sig
+                else:
+                    self._changing[key] = sig
+            for name in set(self._seen[d]) - set(now):
+                self._seen[d].pop(name, None)
+        return events
+
+
+def _make_backend(dirs: list[Path]):
+    if sys.platform.startswith("linux") and (os.getenv("WATCH_POLL", "0") or "0").strip() != "1":
+        try:
+            return _InotifyBackend(dirs)
+        except OSError as e:
+            print(f"[Monday] watcher: inotify non disponibile ({e}), uso il polling.")
+    return _PollingBackend(dirs, interval=float(os.getenv("WATCH_POLL_INTERVAL", "2") or "2"))
+
+
+def _relevant(d: Path, name: str) -> bool:
+    if not name:
+        return True
+    if _ignored(name):
+        return False
+    if d == VIDEOS_DIR:
+        return name in VIDEO_TRIGGERS
+    return True
+
+
+def _start_job(d: Path) -> subprocess.Popen:
+    if d == VIDEOS_DIR:
+        print("[Monday] watcher: nuovo input video -> avvio pipeline")
+        return subprocess.Popen([sys.executable, str(SRC_DIR / "main.py")])
+    print("[Monday] watcher: nuovi file -> bulk move")
+    return subprocess.Popen([sys.executable, str(SRC_DIR / "bulk_mover.py")])
+
+
+def run(debounce: float | None = None) -> None:
+    if debounce is None:
+        debounce = float(os.getenv("WATCH_DEBOUNCE", "5") or "5")
+
+    dirs = [VIDEOS_DIR, FILES_DIR]
+    for d in dirs:
+        d.mkdir(parents=True, exist_ok=True)
+
+    backend = _make_backend(dirs)
+    print(f"[Monday] watcher: {type(backend).__name__} su {', '.join(str(d) for d in dirs)}")
+
+    deadline: dict[Path, float] = {}
+    running: dict[Path, subprocess.Popen] = {}
+
+    while True:
+        now = time.monotonic()
+        timeout = min([t - now for t in deadline.values()] + [1.0])
+
+        for d, name in backend.wait(timeout):
+            if _relevant(d, name):
+                # Every new event pushes the deadline: one job per burst of files.
+                deadline[d] = time.monotonic() + debounce
+
+        for d, proc in list(running.items()):
+            if proc.poll() is not None:
+                print(f"[Monday] watcher: job {d.name} terminato (exit {proc.returncode})")
+                del running[d]
+
+        now = time.monotonic()
+        for d, t in list(deadline.items()):
+            # Files dropped while a job runs are picked up by the next one.
+            if t <= now and d not in running:
+                del deadline[d]
+                running[d] = _start_job(d)
+
+
+if __name__ == "__main__":
+    try:
+        run()
+    except KeyboardInterrupt:
+        pass